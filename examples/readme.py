@@ -39,7 +39,7 @@ async def main():
         await dev.async_turn_off(channel=0)
 
     # Close the manager and logout from http_api
-    manager.close()
+    await manager.async_close()
     await http_api_client.async_logout()
 
 
@@ -11,10 +11,68 @@ from meross_iot.model.constants import DEFAULT_MQTT_PORT, DEFAULT_MQTT_HOST, DEF
 from meross_iot.model.enums import OnlineStatus, Namespace
 from meross_iot.model.http.device import HttpDeviceInfo
 from meross_iot.model.plugin.hub import BatteryInfo
+from meross_iot.utilities.circuit_breaker import CircuitState
+from meross_iot.utilities.limiter import drop_on_overquota_var
 from meross_iot.utilities.network import extract_domain, extract_port
 
 _LOGGER = logging.getLogger(__name__)
 
+# Namespace declaration attribute for every namespace-based mixin function
+_MIXIN_FUNC_NAMESPACES_ATTR = {
+    "async_handle_push_notification": "_PUSH_NAMESPACES",
+    "async_handle_update": "_UPDATE_NAMESPACES",
+}
+
+
+class _MixinDispatchTable(object):
+    """
+    Mixin handlers of a device class for a given function, indexed by the namespace they handle.
+    Handlers of mixins that do not declare their namespaces are invoked for any namespace.
+    """
+    def __init__(self, all_handlers: List[Callable], handlers_by_namespace: Dict[Namespace, List[Callable]],
+                 default_handlers: List[Callable]):
+        self.all_handlers = all_handlers
+        self._handlers_by_namespace = handlers_by_namespace
+        self._default_handlers = default_handlers
+
+    def lookup(self, namespace: Union[Namespace, str]) -> List[Callable]:
+        handlers = self._handlers_by_namespace.get(namespace)
+        if handlers is None and isinstance(namespace, str) and namespace in Namespace._value2member_map_:
+            handlers = self._handlers_by_namespace.get(Namespace(namespace))
+        return handlers if handlers is not None else self._default_handlers
+
+    @classmethod
+    def compile(cls, device_class: type, func: str) -> "_MixinDispatchTable":
+        # Import this within the function scope to prevent circular dependency warnings.
+        from meross_iot.controller.mixins.utilities import DynamicFilteringMixin
+        namespaces_attr = _MIXIN_FUNC_NAMESPACES_ATTR.get(func)
+
+        # (handler, declared namespaces) in the same order of the direct base classes
+        entries = []
+        for clazz in device_class.__bases__:
+            if not issubclass(clazz, DynamicFilteringMixin):
+                continue
+            handler = getattr(clazz, func, None)
+            if handler is None:
+                continue
+            # Only trust declarations made by the class itself: a subclass overriding the handler might handle
+            # different namespaces than its parent.
+            declared = vars(clazz).get(namespaces_attr) if namespaces_attr is not None else None
+            entries.append((handler, None if declared is None else frozenset(declared)))
+
+        all_handlers = [handler for handler, _ in entries]
+        default_handlers = [handler for handler, declared in entries if declared is None]
+        handlers_by_namespace = {}
+        for namespace in set().union(*(declared for _, declared in entries if declared is not None)):
+            handlers_by_namespace[namespace] = [handler for handler, declared in entries
+                                                if declared is None or namespace in declared]
+        return cls(all_handlers=all_handlers, handlers_by_namespace=handlers_by_namespace,
+                   default_handlers=default_handlers)
+
+
+# (device class, mixin function) -> dispatch table
+_MIXIN_DISPATCH_TABLES: Dict[tuple, _MixinDispatchTable] = {}
+
 
 class BaseDevice(object):
     """
@@ -76,9 +134,11 @@ class BaseDevice(object):
             self._abilities = {}
         self._push_coros = []
         self._last_full_update_ts = None
+        self._index_listeners = []
 
         # Set default timeout value for command execution
-        self._timeout = DEFAULT_COMMAND_TIMEOUT
+        # None lets the manager pick the timeout (adaptive or DEFAULT_COMMAND_TIMEOUT)
+        self._timeout = None
 
     @property
     def cached_http_info(self) -> Optional[HttpDeviceInfo]:
@@ -143,10 +203,46 @@ class BaseDevice(object):
         else:
             _LOGGER.error(f"Coroutine {coro} was not registered as handler for this device")
 
+    def add_index_listener(self, listener: Callable[[BaseDevice], None]) -> None:
+        """
+        Registers a callable that gets invoked whenever an indexable attribute of this device
+        (name, type, online status) changes. This is used by the device registry to keep its lookup
+        indexes up to date.
+        :param listener: callable accepting the device as its only argument
+        :return:
+        """
+        if listener not in self._index_listeners:
+            self._index_listeners.append(listener)
+
+    def remove_index_listener(self, listener: Callable[[BaseDevice], None]) -> None:
+        """
+        Unregisters a listener previously registered via `add_index_listener()`
+        :param listener:
+        :return:
+        """
+        if listener in self._index_listeners:
+            self._index_listeners.remove(listener)
+
+    def _notify_index_listeners(self) -> None:
+        for l in self._index_listeners:
+            l(self)
+
+    def _update_online_status(self, status: OnlineStatus) -> None:
+        # Only bother the listeners when the status actually changes
+        old_status = self.online_status
+        self._online = status
+        if self.online_status != old_status:
+            self._notify_index_listeners()
+
     async def _fire_push_notification_event(self, namespace: Namespace, data: dict, device_internal_id: str):
+        kwargs = {"namespace": namespace, "data": data, "device_internal_id": device_internal_id}
+        if self._manager is not None:
+            # Let the manager fan the handlers out, bounding their concurrency and duration
+            await self._manager.push_dispatcher.async_run_handlers((c, (), kwargs) for c in self._push_coros)
+            return
         for c in self._push_coros:
             try:
-                await c(namespace=namespace, data=data, device_internal_id=device_internal_id)
+                await c(**kwargs)
             except Exception as e:
                 _LOGGER.exception(f"Error occurred while firing push notification event {namespace} with data: {data}")
 
@@ -207,6 +303,18 @@ class BaseDevice(object):
         """
         return self._online
 
+    @property
+    def circuit_state(self) -> CircuitState:
+        """
+        State of the circuit breaker guarding the commands sent to this device. Always CLOSED when the
+        manager has no circuit breaker.
+        :return:
+        """
+        breaker = self._manager.circuit_breaker if self._manager is not None else None
+        if breaker is None:
+            return CircuitState.CLOSED
+        return breaker.get_state(self.uuid)
+
     @property
     def channels(self) -> List[ChannelInfo]:
         """
@@ -220,7 +328,6 @@ class BaseDevice(object):
         # Careful with online  status: not all the devices might expose an online mixin.
         if hdevice.uuid != self.uuid:
             raise ValueError(f"Cannot update device ({self.uuid}) with HttpDeviceInfo for device id {hdevice.uuid}")
-        self._cached_http_info=hdevice
         self._cached_http_info = hdevice
         self._name = hdevice.dev_name
         self._channels = self._parse_channels(hdevice.channels)
@@ -228,35 +335,49 @@ class BaseDevice(object):
         self._fwversion = hdevice.fmware_version
         self._hwversion = hdevice.hdware_version
         self._online = hdevice.online_status
+        self._notify_index_listeners()
 
         # TODO: fire some sort of events to let users see changed data?
         return self
 
+    @classmethod
+    def _get_mixin_dispatch_table(cls, func: str) -> "_MixinDispatchTable":
+        table = _MIXIN_DISPATCH_TABLES.get((cls, func))
+        if table is None:
+            table = _MixinDispatchTable.compile(cls, func)
+            _MIXIN_DISPATCH_TABLES[(cls, func)] = table
+        return table
+
     async def async_call_mixin_visitor(self,func,*args,**kwargs):
-        # Import this within the function scope to prevent circular dependency warnings. 
-        from meross_iot.controller.mixins.utilities import DynamicFilteringMixin
         # Call the relevant function for each of the direct base classes. The use of __bases__ instead of __mro__ is intentional;
         # if we used MRO, we'd call the function for all potentially-obsoleted mixin parent classes (e.g. calling Toggle when we want ToggleX)
         # Calling bases avoids this problems: if the device has a given mixin, it'll be set as a direct parent class and thus get called. 
         # However, if the device is weird and the mixin inherits from multiple classes (e.g. the BBSolar lights), it'll call the single mixin
         # function, which has to deal with it. 
+        # The handlers are resolved once per device class (see _MixinDispatchTable).
+        handlers = self._get_mixin_dispatch_table(func).all_handlers
+        return await self._async_call_mixin_handlers(handlers, *args, **kwargs)
+
+    async def _async_dispatch_to_mixins(self, func: str, namespace: Namespace, data: dict) -> Optional[bool]:
+        # Only invoke the mixins that handle the given namespace
+        handlers = self._get_mixin_dispatch_table(func).lookup(namespace)
+        return await self._async_call_mixin_handlers(handlers, namespace, data)
+
+    async def _async_call_mixin_handlers(self, handlers, *args, **kwargs) -> Optional[bool]:
         returnStatus = None
-        for clazz in self.__class__.__bases__:
-            if issubclass(clazz,DynamicFilteringMixin):
-                try:
-                    visitor = getattr(clazz,func)
-                    mixinStatus = await visitor(self,*args,**kwargs)
-                    # Special case for functions which return bool - Warning, this is profoundly weird
-                    if isinstance(mixinStatus,bool):
-                        if returnStatus == None:
-                            returnStatus = mixinStatus
-                        else:
-                            returnStatus = returnStatus or mixinStatus
-                    _LOGGER.debug(f'Function: {func} called in {clazz} via {visitor}')
-                    
-                except AttributeError as e:
-                    _LOGGER.debug(f'Function: {func} not found in {clazz}: {e}')
-        
+        for visitor in handlers:
+            try:
+                mixinStatus = await visitor(self,*args,**kwargs)
+            except AttributeError as e:
+                # Mixins may fail to parse payloads lacking some of the attributes they expect: keep going with the others
+                _LOGGER.debug("Mixin function %s failed with AttributeError: %s", visitor, e)
+                continue
+            # Special case for functions which return bool - Warning, this is profoundly weird
+            if isinstance(mixinStatus,bool):
+                if returnStatus == None:
+                    returnStatus = mixinStatus
+                else:
+                    returnStatus = returnStatus or mixinStatus
         return returnStatus
 
     # These functions handle mixins which inherit from one or more other mixins to work correctly. Prior to this change, the async_handle_push_notification
@@ -266,7 +387,7 @@ class BaseDevice(object):
     async def async_handle_all_push_notifications(self, namespace: Namespace, data: dict) -> bool:
         _LOGGER.debug(f"MerossBaseDevice {self.name} handling notification {namespace}")
         # Notify all base classes
-        retStatus = await self.async_call_mixin_visitor("async_handle_push_notification",namespace,data)
+        retStatus = await self._async_dispatch_to_mixins("async_handle_push_notification",namespace,data)
         # However, we want to notify any registered event handler
         await self._fire_push_notification_event(namespace=namespace, data=data, device_internal_id=self.internal_id)
         return retStatus
@@ -281,7 +402,7 @@ class BaseDevice(object):
             self._mac_address = system.get('hardware', {}).get('macAddress', None)
 
         # Call the function for all mixins
-        retStatus = await self.async_call_mixin_visitor("async_handle_update",namespace,data)
+        retStatus = await self._async_dispatch_to_mixins("async_handle_update",namespace,data)
 
         await self._fire_push_notification_event(namespace=namespace, data=data, device_internal_id=self.internal_id)
         self._last_full_update_ts = time.time() * 1000
@@ -307,7 +428,14 @@ class BaseDevice(object):
         # However, we want to keep it within the MerossBaseDevice so that we expose a consistent
         # interface.
         """
-        await self.async_call_mixin_visitor("_async_request_update",*args,**kwargs)
+        # Let the drop_on_overquota preference flow down to every command issued by the update
+        drop_on_overquota = kwargs.pop('drop_on_overquota', None)
+        token = drop_on_overquota_var.set(drop_on_overquota) if drop_on_overquota is not None else None
+        try:
+            await self.async_call_mixin_visitor("_async_request_update",*args,**kwargs)
+        finally:
+            if token is not None:
+                drop_on_overquota_var.reset(token)
 
 
     def dismiss(self):
@@ -319,9 +447,10 @@ class BaseDevice(object):
         """
         Represents the default timeout that is applied to command execution against this device.
         Usually, every method allows to override this timeout via an appropriate timeout argument: that argument
-        takes precedence over this default.
+        takes precedence over this default. Unless set explicitly, the manager picks the timeout of every command:
+        in that case, DEFAULT_COMMAND_TIMEOUT is returned.
         """
-        return self._timeout
+        return self._timeout if self._timeout is not None else DEFAULT_COMMAND_TIMEOUT
 
     @default_command_timeout.setter
     def default_command_timeout(self, val: Union[float, int]):
@@ -334,19 +463,33 @@ class BaseDevice(object):
                                namespace: Namespace,
                                payload: dict,
                                timeout: Optional[float] = None,
+                               max_age: Optional[float] = None,
+                               replay_safe: bool = False
                                ) -> dict:
         if timeout is None:
-            to = self.default_command_timeout
+            to = self._timeout
         else:
             to = timeout
 
-        return await self._manager.async_execute_cmd(destination_device_uuid=self.uuid,
-                                                     method=method,
-                                                     namespace=namespace,
-                                                     payload=payload,
-                                                     timeout=to,
-                                                     mqtt_hostname=self.mqtt_host,
-                                                     mqtt_port=self.mqtt_port)
+        try:
+            result = await self._manager.async_execute_cmd(destination_device_uuid=self.uuid,
+                                                           method=method,
+                                                           namespace=namespace,
+                                                           payload=payload,
+                                                           timeout=to,
+                                                           mqtt_hostname=self.mqtt_host,
+                                                           mqtt_port=self.mqtt_port,
+                                                           max_age=max_age,
+                                                           replay_safe=replay_safe)
+        except Exception:
+            # The device might have applied the SET anyway: its next push notification must be dispatched
+            if method.upper() == "SET":
+                self._manager.state_fingerprints.invalidate(self.uuid, namespace)
+            raise
+        if method.upper() == "SET":
+            # The notification echoed back by the device repeats the state we are about to assume
+            self._manager.state_fingerprints.expect(self.uuid, namespace, payload)
+        return result
 
     def __repr__(self):
         basic_info = f"{self.name} ({self.type}, HW {self.hardware_version}, FW {self.firmware_version}, class: {self.__class__.__name__})"
@@ -464,7 +607,9 @@ class GenericSubDevice(BaseDevice):
                                method: str,
                                namespace: Namespace,
                                payload: dict,
-                               timeout: Optional[float] = None
+                               timeout: Optional[float] = None,
+                               max_age: Optional[float] = None,
+                               replay_safe: bool = False
                                ) -> dict:
         # Every command should be invoked via HUB?
         raise NotImplementedError("Subdevices should rely on Hub in order to send commands.")
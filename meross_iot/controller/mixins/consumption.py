@@ -25,11 +25,14 @@ class ConsumptionMixin(DynamicFilteringMixin):
     async def async_get_daily_power_consumption(self,
                                                 channel=0,
                                                 timeout: Optional[float] = None,
-                                                *args, **kwargs) -> List[dict]:
+                                                *args, max_age: Optional[float] = None,
+                                                **kwargs) -> List[dict]:
         """
         Returns the power consumption registered by this device.
 
         :param channel: channel to read data from
+        :param max_age: when set, consumption data retrieved by the manager within the last max_age seconds
+                        is returned without polling the device. Data retrieved on a previous day is never reused.
 
         :return: the historical consumption data
         """
@@ -37,7 +40,8 @@ class ConsumptionMixin(DynamicFilteringMixin):
         result = await self._execute_command(method="GET",
                                              namespace=Namespace.CONTROL_CONSUMPTION,
                                              payload={'channel': channel},
-                                             timeout=timeout)
+                                             timeout=timeout,
+                                             max_age=max_age)
         data = result.get('consumption')
 
         # Parse the json data into nice-python native objects
@@ -63,11 +67,14 @@ class ConsumptionXMixin(ConsumptionMixin):
     async def async_get_daily_power_consumption(self,
                                                 channel=0,
                                                 timeout: Optional[float] = None,
-                                                *args, **kwargs) -> List[dict]:
+                                                *args, max_age: Optional[float] = None,
+                                                **kwargs) -> List[dict]:
         """
         Returns the power consumption registered by this device.
 
         :param channel: channel to read data from
+        :param max_age: when set, consumption data retrieved by the manager within the last max_age seconds
+                        is returned without polling the device. Data retrieved on a previous day is never reused.
 
         :return: the historical consumption data
         """
@@ -75,7 +82,8 @@ class ConsumptionXMixin(ConsumptionMixin):
         result = await self._execute_command(method="GET",
                                              namespace=Namespace.CONTROL_CONSUMPTIONX,
                                              payload={'channel': channel},
-                                             timeout=timeout)
+                                             timeout=timeout,
+                                             max_age=max_age)
         data = result.get('consumptionx')
 
         # Parse the json data into nice-python native objects
@@ -10,6 +10,8 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class DiffuserLightMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.DIFFUSER_LIGHT,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
 
@@ -9,6 +9,8 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class DiffuserSprayMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.DIFFUSER_SPRAY,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
 
@@ -17,12 +17,15 @@ class SystemDndMixin(DynamicFilteringMixin):
     ## It looks like the DND mode update/change does not trigger any PUSH notification update.
     ## This means we won't catch any "DND mode change" via push notifications.
 
-    async def async_get_dnd_mode(self, timeout: Optional[float] = None, *args, **kwargs) -> DNDMode:
+    async def async_get_dnd_mode(self, timeout: Optional[float] = None, *args, max_age: Optional[float] = None,
+                                 **kwargs) -> DNDMode:
         """
         Polls the device and retrieves its DO-NOT-DISTURB mode.
         This method will actually refresh the cached DNDMode by issuing a MQTT message to the broker.
         You should avoid using this method when not strictly needed and cache the retrieved DND mode.
         :param timeout:
+        :param max_age: when set, a DND mode retrieved by the manager within the last max_age seconds is returned
+                        without polling the device
         :param args:
         :param kwargs:
         :return:
@@ -30,7 +33,8 @@ class SystemDndMixin(DynamicFilteringMixin):
         result = await self._execute_command(method="GET",
                                              namespace=Namespace.SYSTEM_DND_MODE,
                                              payload={},
-                                             timeout=timeout)
+                                             timeout=timeout,
+                                             max_age=max_age)
         res = DNDMode(result['DNDMode']['mode'])
         return res
 
@@ -3,7 +3,7 @@ from hashlib import md5
 import base64
 from Cryptodome.Cipher import AES
 from enum import Enum
-from typing import Dict
+from typing import Dict, Optional
 from meross_iot.controller.mixins.utilities import DynamicFilteringMixin
 from meross_iot.model.enums import Namespace
 
@@ -14,6 +14,61 @@ class EncryptionAlg(Enum):
     ECDHE256 = 0
 
 
+_BLOCK_SIZE = 16
+_ZERO_PADDING = bytes(_BLOCK_SIZE)
+
+
+class _CbcCipherContext(object):
+    """
+    AES-CBC cipher contexts of a device, with zero padding, reused across messages.
+    A CBC context carries the last ciphertext block over to the next message as its IV: rather than building a new
+    context for every message, the first block of every message is XORed with the difference between that carried
+    block and the wanted IV, which yields the very same output as a fresh context.
+    Plaintext and ciphertext go through buffers that are only reallocated when a larger message shows up.
+    """
+    def __init__(self, key: bytes):
+        self._encryptor = AES.new(key, AES.MODE_CBC, _ZERO_PADDING)
+        self._decryptor = AES.new(key, AES.MODE_CBC, _ZERO_PADDING)
+        self._encryptor_chain = _ZERO_PADDING
+        self._decryptor_chain = _ZERO_PADDING
+        self._input_buffer = bytearray(1024)
+        self._output_buffer = bytearray(1024)
+
+    def _get_buffers(self, size: int):
+        if len(self._input_buffer) < size:
+            self._input_buffer = bytearray(size)
+            self._output_buffer = bytearray(size)
+        return memoryview(self._input_buffer)[:size], memoryview(self._output_buffer)[:size]
+
+    @staticmethod
+    def _xor_first_block(view: memoryview, chain: bytes, iv: bytes) -> None:
+        if chain == iv:
+            return
+        mask = int.from_bytes(chain, "big") ^ int.from_bytes(iv, "big")
+        view[:_BLOCK_SIZE] = (int.from_bytes(view[:_BLOCK_SIZE], "big") ^ mask).to_bytes(_BLOCK_SIZE, "big")
+
+    def encrypt(self, data: bytes, iv: bytes) -> bytes:
+        # Zero padding always adds at least one byte, up to a whole block
+        size = len(data) + _BLOCK_SIZE - len(data) % _BLOCK_SIZE
+        plain, cipher = self._get_buffers(size)
+        plain[:len(data)] = data
+        plain[len(data):] = _ZERO_PADDING[:size - len(data)]
+        self._xor_first_block(plain, self._encryptor_chain, iv)
+        self._encryptor.encrypt(plain, output=cipher)
+        self._encryptor_chain = bytes(cipher[-_BLOCK_SIZE:])
+        return bytes(cipher)
+
+    def decrypt(self, data: bytes, iv: bytes) -> bytes:
+        if len(data) % _BLOCK_SIZE != 0:
+            raise ValueError("Data must be padded to 16 byte boundary in CBC mode")
+        _, plain = self._get_buffers(len(data))
+        self._decryptor.decrypt(data, output=plain)
+        self._xor_first_block(plain, self._decryptor_chain, iv)
+        if len(data) > 0:
+            self._decryptor_chain = data[-_BLOCK_SIZE:]
+        return bytes(plain)
+
+
 class EncryptionSuiteMixin(DynamicFilteringMixin):
     _execute_command: callable
     _DEFAULT_IV="0000000000000000".encode("utf8")
@@ -24,6 +79,7 @@ class EncryptionSuiteMixin(DynamicFilteringMixin):
                  **kwargs):
         super().__init__(device_uuid=device_uuid, manager=manager, **kwargs)
         self._encryption_key = None
+        self._encryption_context: Optional[_CbcCipherContext] = None
 
         if Namespace.SYSTEM_ENCRYPTION_ECDHE.value in self._abilities:
             self._encryption_alg = EncryptionAlg.ECDHE256
@@ -34,27 +90,13 @@ class EncryptionSuiteMixin(DynamicFilteringMixin):
     def filter(device_ability : str, device_name : str,**kwargs):
         return device_ability == Namespace.SYSTEM_ENCRYPTION.value
     
-    def _pad_to_16_bytes(self, data):
-        block_size = 16
-        pad_length = block_size - (len(data) % block_size)
-        padding = bytes([0] * pad_length)
-        return data + padding
-
-    def _ecdhe256_encrypt(self, message_data_bytes, iv=_DEFAULT_IV) -> str:
-        # Returns encrypted message in base64 encoded string.
-        padded_data = self._pad_to_16_bytes(message_data_bytes)
-        cipher = AES.new(self._encryption_key, AES.MODE_CBC, iv)
-        cipher.padding = 0
-        encrypted = cipher.encrypt(padded_data)
-        return base64.b64encode(encrypted).decode('utf-8')
+    def _ecdhe256_encrypt(self, message_data_bytes: bytes, iv=_DEFAULT_IV) -> bytes:
+        # Returns the encrypted message, base64 encoded.
+        return base64.b64encode(self._encryption_context.encrypt(message_data_bytes, iv))
 
     def _ecdhe256_decrypt(self, message_data_bytes: bytes, iv=_DEFAULT_IV) -> bytes:
         # Returns decrypted message bytes.
-        cipher = AES.new(self._encryption_key, AES.MODE_CBC, iv)
-        cipher.padding = 0
-        enc_bytes = base64.b64decode(message_data_bytes)
-        decrypted = cipher.decrypt(enc_bytes)
-        return decrypted
+        return self._encryption_context.decrypt(base64.b64decode(message_data_bytes), iv)
 
     def support_encryption(self) -> bool:
         return True
@@ -65,13 +107,23 @@ class EncryptionSuiteMixin(DynamicFilteringMixin):
     def set_encryption_key(self, uuid:str, mrskey: str, mac: str, *args, **kwargs):
         strtohash = uuid[3:22] + mrskey[1:9] + mac + mrskey[10:28]
         self._encryption_key = md5(strtohash.encode("utf8")).hexdigest().encode("utf8")
+        self._encryption_context = _CbcCipherContext(self._encryption_key)
 
-    def encrypt(self, message_data_bytes: bytes)->str:
+    def encrypt(self, message_data_bytes: bytes) -> str:
         """
         Encrypts the message into a base64 string
         :param message_data_bytes:
         :return:
         """
+        return self.encrypt_bytes(message_data_bytes).decode("utf-8")
+
+    def encrypt_bytes(self, message_data_bytes: bytes) -> bytes:
+        """
+        Encrypts the message into base64 encoded bytes, sparing the string round trip when the result is
+        sent over the network as is
+        :param message_data_bytes:
+        :return:
+        """
         if not self.is_encryption_key_set():
             raise ValueError("Encryption key is not set! Please invoke set_encryption_key first.")
 
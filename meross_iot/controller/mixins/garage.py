@@ -9,6 +9,8 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class GarageOpenerMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.GARAGE_DOOR_STATE, Namespace.GARAGE_DOOR_MULTIPLECONFIG)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _channels: List[ChannelInfo]
     _execute_command: callable
     check_full_update_done: callable
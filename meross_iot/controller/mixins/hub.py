@@ -13,6 +13,7 @@ class HubMixn(DynamicFilteringMixin):
         Namespace.HUB_TOGGLEX: 'togglex',
         Namespace.HUB_BATTERY: 'battery'
     }
+    _PUSH_NAMESPACES = tuple(__PUSH_MAP.keys())
 
     @staticmethod
     def filter(device_ability : str, device_name : str,**kwargs):
@@ -61,6 +62,7 @@ class HubMs100Mixin(DynamicFilteringMixin):
         Namespace.HUB_SENSOR_TEMPHUM: 'tempHum',
         Namespace.HUB_SENSOR_ALL: 'all'
     }
+    _PUSH_NAMESPACES = tuple(__PUSH_MAP.keys())
     _execute_command: callable
     get_subdevice: callable
     uuid: str
@@ -127,6 +129,7 @@ class HubMts100Mixin(DynamicFilteringMixin):
         Namespace.HUB_MTS100_MODE: 'mode',
         Namespace.HUB_MTS100_TEMPERATURE: 'temperature'
     }
+    _PUSH_NAMESPACES = tuple(__PUSH_MAP.keys())
     _execute_command: callable
     get_subdevice: callable
     uuid: str
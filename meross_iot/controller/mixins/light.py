@@ -15,6 +15,8 @@ class LightMixin(DynamicFilteringMixin):
     """
     Mixin class that enables light control.
     """
+    _PUSH_NAMESPACES = (Namespace.CONTROL_LIGHT,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
 
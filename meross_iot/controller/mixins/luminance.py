@@ -13,6 +13,8 @@ class LuminanceMixin(DynamicFilteringMixin):
     """
     Mixin class that enables luminance control for lights.
     """
+    _PUSH_NAMESPACES = (Namespace.CONTROL_LUMINANCE,)
+    _UPDATE_NAMESPACES = (Namespace.CONTROL_LUMINANCE,)
     _execute_command: callable
     check_full_update_done: callable
 
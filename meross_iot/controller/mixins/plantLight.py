@@ -15,6 +15,8 @@ class PlantLightMixin(ChannelRemappingMixin,LightMixin,ToggleXMixin,LuminanceMix
     """
     Mixin class that enables light control for BBSolar Smart Plant Lights.
     """
+    # The update handler is left undeclared, so that it still refreshes the channel status on every update
+    _PUSH_NAMESPACES = (Namespace.CONTROL_LUMINANCE, Namespace.CONTROL_TOGGLEX)
     _execute_command: callable
     check_full_update_done: callable
 
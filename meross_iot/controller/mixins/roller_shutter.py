@@ -8,6 +8,7 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class RollerShutterTimerMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.ROLLER_SHUTTER_STATE, Namespace.ROLLER_SHUTTER_POSITION)
     _execute_command: callable
     check_full_update_done: callable
     uuid: str
@@ -115,11 +116,13 @@ class RollerShutterTimerMixin(DynamicFilteringMixin):
         await self.async_fetch_config()
         await self.async_fetch_position()
 
-    async def async_fetch_config(self, timeout: Optional[float] = None, *args, **kwargs) -> None:
+    async def async_fetch_config(self, timeout: Optional[float] = None, *args, max_age: Optional[float] = None,
+                                 **kwargs) -> None:
         data = await self._execute_command(method="GET",
                                     namespace=Namespace.ROLLER_SHUTTER_CONFIG,
                                     payload={},
-                                    timeout=timeout)
+                                    timeout=timeout,
+                                    max_age=max_age)
         config = data.get('config')
         for d in config:
             channel = d['channel']
@@ -23,18 +23,23 @@ class SystemRuntimeMixin(DynamicFilteringMixin):
     def filter(device_ability : str, device_name : str,**kwargs):
         return device_ability == Namespace.SYSTEM_RUNTIME.value
     
-    async def async_update_runtime_info(self, timeout: Optional[float] = None, *args, **kwargs) -> dict:
+    async def async_update_runtime_info(self, timeout: Optional[float] = None, *args, max_age: Optional[float] = None,
+                                        **kwargs) -> dict:
         """
         Polls the device to gather the latest runtime information for this device.
         Note that the returned value might vary with the time as Meross could add/remove/change runtime information
         in the future.
 
+        :param max_age: when set, runtime information retrieved by the manager within the last max_age seconds
+                        is returned without polling the device
+
         :return: a `dict` object containing the runtime information provided by the Meross device
         """
         result = await self._execute_command(method="GET",
                                              namespace=Namespace.SYSTEM_RUNTIME,
                                              payload={},
-                                             timeout=timeout)
+                                             timeout=timeout,
+                                             max_age=max_age)
         data = result.get('runtime')
         self._runtime_info = data
         return data
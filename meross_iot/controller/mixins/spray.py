@@ -8,6 +8,8 @@ _LOGGER = logging.getLogger(__name__)
 
 
 class SprayMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.CONTROL_SPRAY,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
     #async_handle_update: Callable[[Namespace, dict], Awaitable]
@@ -31,7 +31,10 @@ class SystemAllMixin(DynamicFilteringMixin):
 
 
 class SystemOnlineMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.SYSTEM_ONLINE,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _online: OnlineStatus
+    _update_online_status: callable
     #async_handle_update: Callable[[Namespace, dict], Awaitable]
 
     def __init__(self, device_uuid: str,
@@ -49,7 +52,7 @@ class SystemOnlineMixin(DynamicFilteringMixin):
         if namespace == Namespace.SYSTEM_ALL:
             online_data = data.get('all').get('system').get('online')
             status = OnlineStatus(int(online_data.get("status")))
-            self._online = status
+            self._update_online_status(status)
             locally_handled = True
 
         return locally_handled
@@ -66,7 +69,7 @@ class SystemOnlineMixin(DynamicFilteringMixin):
                 locally_handled = False
             else:
                 status = OnlineStatus(int(payload.get("status")))
-                self._online = status
+                self._update_online_status(status)
                 locally_handled = True
 
         # Always call the parent handler when done with local specific logic. This gives the opportunity to all
@@ -132,6 +132,8 @@ class ThermostatState:
 
 
 class ThermostatModeMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.CONTROL_THERMOSTAT_MODE,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
     _thermostat_state_by_channel: Dict[int, ThermostatState]
@@ -262,6 +264,8 @@ class ThermostatModeMixin(DynamicFilteringMixin):
         self._update_mode(mode_data)
 
 class ThermostatModeBMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.CONTROL_THERMOSTAT_MODEB,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
     _thermostat_state_by_channel: Dict[int, ThermostatState]
@@ -7,6 +7,8 @@ from meross_iot.controller.mixins.utilities import DynamicFilteringMixin
 _LOGGER = logging.getLogger(__name__)
 
 class ToggleMixin(DynamicFilteringMixin):
+    _PUSH_NAMESPACES = (Namespace.CONTROL_TOGGLE,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     #async_handle_update: Callable[[Namespace, dict], Awaitable]
 
@@ -81,6 +83,8 @@ class ToggleXMixin(ToggleMixin):
     This mixin is implemented by devices that support ToggleX operation, such as smart switches
     and smart bulbs.
     """
+    _PUSH_NAMESPACES = (Namespace.CONTROL_TOGGLEX,)
+    _UPDATE_NAMESPACES = (Namespace.SYSTEM_ALL,)
     _execute_command: callable
     check_full_update_done: callable
     #async_handle_update: Callable[[Namespace, dict], Awaitable]
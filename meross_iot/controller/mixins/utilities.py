@@ -2,6 +2,12 @@ from typing import List
 from meross_iot.controller.device import ChannelInfo
 
 class DynamicFilteringMixin(object):
+    # Namespaces handled by the async_handle_push_notification/async_handle_update methods defined by this very class.
+    # The device only invokes those methods for the declared namespaces. When a mixin does not declare them, its
+    # handlers are invoked for every namespace.
+    _PUSH_NAMESPACES = None
+    _UPDATE_NAMESPACES = None
+
     # Filter device based on user-provided input. We presently match on the ability and name, but
     # may provide additional parameters in kwargs.
     # Returns true if filter matches, false if not
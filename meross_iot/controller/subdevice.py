@@ -22,7 +22,8 @@ class Ms100Sensor(GenericSubDevice):
         self.__humidity = {}
         self.__samples = []
 
-    async def _execute_command(self, method: str, namespace: Namespace, payload: dict, timeout: Optional[float] = None) -> dict:
+    async def _execute_command(self, method: str, namespace: Namespace, payload: dict, timeout: Optional[float] = None,
+                               max_age: Optional[float] = None, replay_safe: bool = False) -> dict:
         raise NotImplementedError("This method should never be called directly for subdevices.")
 
     async def async_handle_push_notification(self, namespace: Namespace, data: dict) -> bool:
@@ -30,17 +31,17 @@ class Ms100Sensor(GenericSubDevice):
         if namespace == Namespace.HUB_ONLINE:
             update_element = self._prepare_push_notification_data(data=data, filter_accessor='online')
             if update_element is not None:
-                self._online = OnlineStatus(update_element.get('status', -1))
+                self._update_online_status(OnlineStatus(update_element.get('status', -1)))
                 locally_handled = True
         return locally_handled
 
     async def async_handle_subdevice_notification(self, namespace: Namespace, data: dict) -> bool:
         locally_handled = False
         if namespace == Namespace.HUB_ONLINE:
-            self._online = OnlineStatus(data.get('online', {}).get('status', -1))
+            self._update_online_status(OnlineStatus(data.get('online', {}).get('status', -1)))
             self._last_active_time = data.get('online', {}).get('lastActiveTime')
         elif namespace == Namespace.HUB_SENSOR_ALL:
-            self._online = OnlineStatus(data.get('online', {}).get('status', -1))
+            self._update_online_status(OnlineStatus(data.get('online', {}).get('status', -1)))
             self.__temperature.update(data.get('temperature', {}))
             self.__humidity.update(data.get('humidity', {}))
             locally_handled = True
@@ -149,7 +150,8 @@ class Mts100v3Valve(GenericSubDevice):
         self._last_active_time = None
         self.__adjust = {}
 
-    async def _execute_command(self, method: str, namespace: Namespace, payload: dict, timeout: Optional[float] = None) -> dict:
+    async def _execute_command(self, method: str, namespace: Namespace, payload: dict, timeout: Optional[float] = None,
+                               max_age: Optional[float] = None, replay_safe: bool = False) -> dict:
         raise NotImplementedError("This method should never be called directly for subdevices.")
 
     async def async_handle_push_notification(self, namespace: Namespace, data: dict) -> bool:
@@ -157,18 +159,18 @@ class Mts100v3Valve(GenericSubDevice):
         if namespace == Namespace.HUB_ONLINE:
             update_element = self._prepare_push_notification_data(data=data, filter_accessor='online')
             if update_element is not None:
-                self._online = OnlineStatus(update_element.get('status', -1))
+                self._update_online_status(OnlineStatus(update_element.get('status', -1)))
                 locally_handled = True
         return locally_handled
 
     async def async_handle_subdevice_notification(self, namespace: Namespace, data: dict) -> bool:
         locally_handled = False
         if namespace == Namespace.HUB_ONLINE:
-            self._online = OnlineStatus(data.get('online', {}).get('status', -1))
+            self._update_online_status(OnlineStatus(data.get('online', {}).get('status', -1)))
             self._last_active_time = data.get('online', {}).get('lastActiveTime')
         elif namespace == Namespace.HUB_MTS100_ALL:
             self._schedule_b_mode = data.get('scheduleBMode')
-            self._online = OnlineStatus(data.get('online', {}).get('status', -1))
+            self._update_online_status(OnlineStatus(data.get('online', {}).get('status', -1)))
             self._last_active_time = data.get('online', {}).get('lastActiveTime')
             self.__togglex.update(data.get('togglex', {}))
             self.__timeSync = data.get('timeSync', {})
@@ -371,12 +373,16 @@ class Mts100v3Valve(GenericSubDevice):
         # Update local state
         self.__temperature['currentSet'] = target_temp
 
-    async def async_get_adjust(self, timeout: Optional[float] = None, *args, **kwargs) -> Optional[float]:
+    async def async_get_adjust(self, timeout: Optional[float] = None, *args, max_age: Optional[float] = None,
+                               **kwargs) -> Optional[float]:
         """
+        :param max_age: when set, an adjust value retrieved by the manager within the last max_age seconds
+                        is returned without polling the hub
         :return:
         """
         res = await self._hub._execute_command(method="GET", namespace=Namespace.HUB_MTS100_ADJUST,
-                                               payload={'adjust': [{"id": self.subdevice_id}]}, timeout=timeout)
+                                               payload={'adjust': [{"id": self.subdevice_id}]}, timeout=timeout,
+                                               max_age=max_age)
         if res is None:
             return None
 
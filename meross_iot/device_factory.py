@@ -1,5 +1,8 @@
+import hashlib
+import itertools
+import json
 import logging
-from typing import Optional
+from typing import Optional, Dict, List, Iterable
 import inspect
 import sys
 import pkgutil
@@ -32,6 +35,15 @@ _SUBDEVICE_MAPPING = {
 _dynamic_types = {}
 dynamic_plugins = {}
 
+# Ability namespace -> mixins whose filter matches that ability, regardless of the device type.
+# Built once by _load_mixins().
+_ability_mixin_index: Dict[str, List[type]] = {}
+# Mixins that do not match any known ability on their own: their filter depends on the device type
+# (e.g. ChannelRemappingMixin implementations), so they are evaluated against every device.
+_device_type_plugins: List[type] = []
+
+_type_cache_stats = {"hits": 0, "misses": 0}
+
 
 def _caclulate_device_type_name(device_type: str, hardware_version: str, firmware_version: str) -> str:
     """
@@ -44,16 +56,35 @@ def _caclulate_device_type_name(device_type: str, hardware_version: str, firmwar
     return f"{device_type}:{hardware_version}:{firmware_version}"
 
 
-def _lookup_cached_type(device_type: str, hardware_version: str, firmware_version: str) -> Optional[type]:
+def _calculate_abilities_fingerprint(device_abilities: dict) -> str:
+    """
+    Calculates a canonical hash of the given ability set: devices reporting the same abilities get the same value,
+    regardless of the order in which the abilities were reported.
+    :param device_abilities:
+    :return:
+    """
+    canonical = json.dumps(device_abilities, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def _lookup_cached_type(device_type: str, abilities_fingerprint: str) -> Optional[type]:
     """
-    Returns the cached dynamic type for the specific device, if any was already built for that one.
+    Returns the cached dynamic type for the specific device, if any was already built for that ability set.
     :param device_type:
-    :param hardware_version:
-    :param firmware_version:
+    :param abilities_fingerprint: fingerprint of the device abilities, see _calculate_abilities_fingerprint()
     :return:
     """
-    lookup_string = _caclulate_device_type_name(device_type, hardware_version, firmware_version).strip(":")
-    return _dynamic_types.get(lookup_string)
+    return _dynamic_types.get((abilities_fingerprint, device_type))
+
+
+def get_type_cache_stats() -> dict:
+    """
+    Returns the hit/miss counters of the dynamic type cache, along with the number of cached types
+    """
+    return {"hits": _type_cache_stats["hits"],
+            "misses": _type_cache_stats["misses"],
+            "size": len(set(_dynamic_types.values()))}
+
 
 def _load_mixins(packageName = "meross_iot.controller.mixins"):
     # Only do this once.
@@ -73,66 +104,67 @@ def _load_mixins(packageName = "meross_iot.controller.mixins"):
                 if issubclass(obj,DynamicFilteringMixin):
                     dynamic_plugins[name] = obj
 
-def _add_classes_for_ability(device_ability : str,device_type : str, mixin_classes):
-     # Load dynamic modules - if required.
-    _load_mixins()
-    loadedClasses = False
-    for name,clazz in dynamic_plugins.items():
-        _LOGGER.debug(f'Testing mixin: {name} for {device_type}')
-        # Try filtering
-        if clazz.filter(device_ability,device_type) == True:
-            shouldAdd = True
-
-            # Some devices will expose the same ability like Tooggle and ToogleX. This loop confirms that we prefer the X version.
-            for existingClass in mixin_classes:
-                if clazz == existingClass:
-                    # We don't want to add the same class multiple times. In the case we do (due to an overly-permissive filter)
-                    # Drop out of this loop and carry on to the next plugin
-                    shouldAdd = False 
-                    # Lie and say we were successful on the return status
-                    loadedClasses = True 
-                else:
-                    # We need to first test if a we already have a subclassed mixin cached. This means the X version has already been found.
-                    if issubclass(existingClass,clazz):
-                        shouldAdd = False
-                        continue
-                    # We prefer the X version by testing if we have any parent classes of class returned by _dynamic_filter
-                    if issubclass(clazz,existingClass):
-                        # Erase old class
-                        mixin_classes.remove(existingClass)
-                        shouldAdd = True
-                        break
-            if shouldAdd: # Just add
-                mixin_classes.append(clazz)
-                _LOGGER.debug(f'Loaded mixin: {name} for {device_type}')
-
-                loadedClasses = True
+    # Index the plugins by the abilities they match, so that building a type does not require
+    # to test every plugin against every ability.
+    for clazz in dynamic_plugins.values():
+        matched = False
+        for namespace in Namespace:
+            if clazz.filter(namespace.value, None) == True:
+                _ability_mixin_index.setdefault(namespace.value, []).append(clazz)
+                matched = True
+        if not matched:
+            _device_type_plugins.append(clazz)
 
-    return loadedClasses
 
-    """ 
-    def _add_mixin_class(clazz, mixin_classes):
-    shouldAdd = True
+def _candidate_plugins(device_ability: str) -> Iterable[type]:
+    _load_mixins()
+    indexed = _ability_mixin_index.get(device_ability)
+    if indexed is None and device_ability not in Namespace._value2member_map_:
+        # The ability is not known to this library: some plugin might still match it
+        return dynamic_plugins.values()
+    return itertools.chain(indexed or (), _device_type_plugins)
+
 
+def _add_mixin_class(clazz: type, mixin_classes: List[type]) -> bool:
     # Some devices will expose the same ability like Tooggle and ToogleX. This confirms that we prefer the X version.
     for existingClass in mixin_classes:
-            # We need to first test if a we already have a subclassed mixin cached. This means the X version has already been found.
-            if issubclass(existingClass,clazz):
-                shouldAdd = False
-                continue
-            # We prefer the X version by testing if we have any parent classes of class returned by _dynamic_filter
-            if issubclass(clazz,existingClass):
-                # Erase old class
-                mixin_classes.remove(existingClass)
-                shouldAdd = True
-                break
-    if shouldAdd: # Just add
-        mixin_classes.add(clazz)
-        loadedClasses = True
+        # We don't want to add the same class multiple times (due to an overly-permissive filter)
+        if clazz == existingClass:
+            return True
+        # We need to first test if a we already have a subclassed mixin cached. This means the X version has already been found.
+        if issubclass(existingClass, clazz):
+            return False
+        # We prefer the X version by testing if we have any parent classes of class returned by _dynamic_filter
+        if issubclass(clazz, existingClass):
+            # Erase old class
+            mixin_classes.remove(existingClass)
+            break
+    mixin_classes.append(clazz)
+    return True
+
+
+def _add_classes_for_ability(device_ability : str,device_type : str, mixin_classes):
+    loadedClasses = False
+    for clazz in _candidate_plugins(device_ability):
+        # Filters are still evaluated against the actual device type: the index only narrows down the candidates
+        if clazz.filter(device_ability,device_type) == True:
+            _LOGGER.debug(f'Loaded mixin: {clazz.__name__} for {device_type}')
+            loadedClasses = _add_mixin_class(clazz, mixin_classes) or loadedClasses
+    return loadedClasses
 
-    return shouldAdd
+
+def _dynamic_filter(device_ability: str, device_type: str) -> Optional[type]:
     """
-    
+    Returns the mixin implementing the given ability for the given device type, if any.
+    When more mixins match, the most specific one (e.g. ToggleX over Toggle) is returned.
+    :param device_ability:
+    :param device_type:
+    :return:
+    """
+    mixin_classes = []
+    _add_classes_for_ability(device_ability, device_type, mixin_classes)
+    return mixin_classes[0] if len(mixin_classes) > 0 else None
+
 
 def _build_cached_type(type_string: str, device_abilities: dict, base_class: type,device_type : str) -> type:
     """
@@ -144,10 +176,6 @@ def _build_cached_type(type_string: str, device_abilities: dict, base_class: typ
     """
     # Build a specific type at runtime by mixing plugins on-demand
     mixin_classes = list()
-    # Add plugins via filtering
-    _load_mixins()
-    # We run through each plugin and try filtering on it until it matches. This allows us to prevent scanning to
-    # check if we've already loaded a plugin
     for device_ability in device_abilities:
         _add_classes_for_ability(device_ability,device_type,mixin_classes)
 
@@ -176,14 +204,15 @@ def build_meross_device_from_abilities(http_device_info: HttpDeviceInfo,
     _LOGGER.debug(f"Building managed device for {http_device_info.dev_name} ({http_device_info.uuid}). "
                   f"Reported abilities: {device_abilities}")
 
-    # Check if we already have cached type for that device kind.
-    cached_type = _lookup_cached_type(http_device_info.device_type,
-                                      http_device_info.hdware_version,
-                                      http_device_info.fmware_version)
-    if cached_type is None:
-        _LOGGER.debug(f"Could not find any cached type for {http_device_info.device_type},"
-                      f"{http_device_info.hdware_version},"
-                      f"{http_device_info.fmware_version}. It will be generated.")
+    # Check if we already have cached type for that ability set.
+    fingerprint = _calculate_abilities_fingerprint(device_abilities)
+    cached_type = _lookup_cached_type(http_device_info.device_type, fingerprint)
+    if cached_type is not None:
+        _type_cache_stats["hits"] += 1
+    else:
+        _type_cache_stats["misses"] += 1
+        _LOGGER.debug(f"Could not find any cached type for {http_device_info.device_type} "
+                      f"with abilities fingerprint {fingerprint}. It will be generated.")
         device_type_name = _caclulate_device_type_name(http_device_info.device_type,
                                                        http_device_info.hdware_version,
                                                        http_device_info.fmware_version)
@@ -207,7 +236,13 @@ def build_meross_device_from_abilities(http_device_info: HttpDeviceInfo,
                                          device_abilities=device_abilities,
                                          base_class=base_class,
                                          device_type = http_device_info.device_type)
-        _dynamic_types[device_type_name] = cached_type
+
+        # Devices of different types may still end up with the very same mixins: share one class among them.
+        for (other_fingerprint, _), other_type in _dynamic_types.items():
+            if other_fingerprint == fingerprint and other_type.__bases__ == cached_type.__bases__:
+                cached_type = other_type
+                break
+        _dynamic_types[(fingerprint, http_device_info.device_type)] = cached_type
 
     #component = cached_type(device_uuid=http_device_info.uuid, manager=manager, **http_device_info.to_dict())
     component = cached_type(device_uuid=http_device_info.uuid, manager=manager, http_device_info=http_device_info)
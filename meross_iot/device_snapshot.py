@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional, Dict
+
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+_LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def _json_default(x):
+    if isinstance(x, datetime):
+        return x.isoformat()
+    if isinstance(x, OnlineStatus):
+        return x.value
+    return 'Not-Serializable'
+
+
+class DeviceSnapshot(object):
+    """
+    On-disk snapshot of the abilities and HTTP info of the known devices, keyed by device uuid.
+    The discovery relies on it to skip the SYSTEM_ABILITY round trip for devices whose firmware and hardware
+    versions did not change since the snapshot was taken.
+    The snapshot is kept in memory and written atomically to disk, only when its content has changed.
+    """
+    def __init__(self, filename: str):
+        self._filename = filename
+        self._devices: Optional[Dict[str, dict]] = None
+        self._dirty = False
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def _get_devices(self) -> Dict[str, dict]:
+        if self._devices is None:
+            self._devices = self._read()
+        return self._devices
+
+    def _read(self) -> Dict[str, dict]:
+        try:
+            with open(self._filename, "rt") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            _LOGGER.debug("Device snapshot %s not found, starting from an empty one", self._filename)
+            return {}
+        except (OSError, ValueError):
+            _LOGGER.warning("Device snapshot %s could not be read and will be ignored", self._filename)
+            return {}
+
+        if not isinstance(data, dict) or data.get('version') != SNAPSHOT_FORMAT_VERSION:
+            _LOGGER.warning("Device snapshot %s has an unsupported format version and will be ignored", self._filename)
+            return {}
+        return data.get('devices', {})
+
+    def lookup_abilities(self, device_info: HttpDeviceInfo) -> Optional[dict]:
+        """
+        Returns the abilities recorded for the given device, provided that its firmware and hardware
+        versions match the ones reported by the HTTP API.
+        :param device_info: device info reported by the HTTP API
+        :return: the abilities dict, or None when the snapshot holds no valid abilities for the device
+        """
+        entry = self._get_devices().get(device_info.uuid)
+        if entry is None:
+            return None
+        if entry.get('firmwareVersion') != device_info.fmware_version or \
+                entry.get('hardwareVersion') != device_info.hdware_version:
+            _LOGGER.info("Device %s (%s) changed firmware/hardware version since the last snapshot, "
+                         "its abilities will be fetched again.", device_info.dev_name, device_info.uuid)
+            self.remove(device_info.uuid)
+            return None
+        return entry.get('abilities')
+
+    def update(self, device_info: HttpDeviceInfo, abilities: dict) -> None:
+        """
+        Records the abilities and HTTP info of the given device.
+        :param device_info: device info reported by the HTTP API
+        :param abilities: abilities reported by the device
+        """
+        # Round-trip the info through json, so that it can be compared with the stored one
+        info = json.loads(json.dumps(device_info.to_dict(), default=_json_default))
+        entry = {
+            'firmwareVersion': device_info.fmware_version,
+            'hardwareVersion': device_info.hdware_version,
+            'abilities': abilities,
+            'info': info
+        }
+        devices = self._get_devices()
+        if devices.get(device_info.uuid) != entry:
+            devices[device_info.uuid] = entry
+            self._dirty = True
+
+    def remove(self, device_uuid: str) -> None:
+        if self._get_devices().pop(device_uuid, None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        """
+        Writes the snapshot to disk if it changed. The file is replaced atomically, so that a crash
+        while writing never leaves a truncated snapshot behind.
+        """
+        if not self._dirty:
+            return
+        data = {'version': SNAPSHOT_FORMAT_VERSION, 'devices': self._get_devices()}
+        directory = os.path.dirname(os.path.abspath(self._filename))
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, prefix=".meross-snapshot-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wt") as f:
+                json.dump(data, f, default=_json_default)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_filename, self._filename)
+        except BaseException:
+            os.unlink(tmp_filename)
+            raise
+        self._dirty = False
+        _LOGGER.debug("Device snapshot written to %s", self._filename)
@@ -16,6 +16,7 @@ class ErrorBudgetManager:
         dev_budget = self._devices_budget.get(device_uuid)
         if dev_budget is None:
             dev_budget = ErrorBudget(self._max_errors, datetime.utcnow())
+            self._devices_budget[device_uuid] = dev_budget
 
         # Re-init the error budget if window expired
         if datetime.utcnow() > (dev_budget.window_start + self._window):
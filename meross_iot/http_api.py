@@ -13,7 +13,7 @@ import uuid
 from datetime import datetime
 from typing import Optional, List
 
-from aiohttp import ClientSession
+from aiohttp import ClientSession, TCPConnector
 
 from meross_iot.model.credentials import MerossCloudCreds
 # Appears to be used as a part of the signature algorithm as constant "salt" (kinda useless)
@@ -37,6 +37,7 @@ _MODULE_VERSION = current_version()
 _DEFAULT_UA_HEADER = f"MerossIOT/{_MODULE_VERSION}"
 _DEFAULT_APP_TYPE = "MerossIOT"
 _DEFAULT_LOG_IDENTIFIER = '%030x' % random.randrange(16 ** 30) + str(uuid.uuid4())
+_DNS_CACHE_TTL = 300
 
 
 class MerossHttpClient(object):
@@ -51,7 +52,8 @@ class MerossHttpClient(object):
                  ua_header: str = _DEFAULT_UA_HEADER,
                  app_type: str = _DEFAULT_APP_TYPE,
                  app_version: str = _MODULE_VERSION,
-                 log_identifier: str = _DEFAULT_LOG_IDENTIFIER):
+                 log_identifier: str = _DEFAULT_LOG_IDENTIFIER,
+                 reuse_http_session: bool = False):
         """
         Http library client constructor
         :param cloud_credentials: Credentials object to use for authentication
@@ -60,6 +62,8 @@ class MerossHttpClient(object):
         :param app_type: String used to discriminate the app type. The default value is auto-generated by the library.
         :param app_version: String used to discriminate the app version. The default value is auto-generated by the library.
         :param log_identifier: String used to log the app client usage. The default value is auto-generated by the library.
+        :param reuse_http_session: When set, the client keeps a long-lived HTTP session (with DNS caching and
+            connection reuse) across API calls. In that case, the client must be closed via `async_close()`.
         """
         self._cloud_creds = cloud_credentials
         self._enable_proxy = False
@@ -72,7 +76,36 @@ class MerossHttpClient(object):
         self._app_type = app_type
         self._app_version = app_version
         self._api_url = cloud_credentials.domain
+        self._reuse_http_session = reuse_http_session
+        self._session: Optional[ClientSession] = None
 
+    def _get_session(self) -> Optional[ClientSession]:
+        """
+        Returns the long-lived session to use for API calls, if enabled.
+        When session reuse is disabled, None is returned and every call uses its own session.
+        """
+        if not self._reuse_http_session:
+            return None
+        # The session is lazily built, as it has to be created within a running event loop
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(use_dns_cache=True, ttl_dns_cache=_DNS_CACHE_TTL)
+            self._session = ClientSession(connector=connector)
+        return self._session
+
+    async def async_close(self) -> None:
+        """
+        Closes the long-lived HTTP session, if any. The client can still be used afterwards:
+        a new session will be created when needed.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> MerossHttpClient:
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.async_close()
 
     @property
     def stats(self) -> HttpStatsCounter:
@@ -98,6 +131,7 @@ class MerossHttpClient(object):
                                        log_identifier: str = _DEFAULT_LOG_IDENTIFIER,
                                        auto_retry_on_bad_domain: bool=True,
                                        mfa_code: string = None,
+                                       reuse_http_session: bool = False,
                                        *args, **kwargs) -> MerossHttpClient:
         """
         Builds a MerossHttpClient using username/password combination.
@@ -113,6 +147,7 @@ class MerossHttpClient(object):
         :param log_identifier: Log identifier to use
         :param auto_retry_on_bad_domain: when set, it enables auto-retry when BadDomain exception occurs.
         :param mfa_code: multi-factor authentication code (optional)
+        :param reuse_http_session: when set, the returned client keeps a long-lived HTTP session across API calls
 
         :return: an instance of `MerossHttpClient`
         """
@@ -142,7 +177,8 @@ class MerossHttpClient(object):
                                 ua_header=ua_header,
                                 app_type=app_type,
                                 app_version=app_version,
-                                log_identifier=log_identifier)
+                                log_identifier=log_identifier,
+                                reuse_http_session=reuse_http_session)
 
     @classmethod
     async def async_from_cloud_creds(cls,
@@ -152,6 +188,7 @@ class MerossHttpClient(object):
                                      app_type: str = _DEFAULT_APP_TYPE,
                                      app_version: str = _MODULE_VERSION,
                                      log_identifier: str = _DEFAULT_LOG_IDENTIFIER,
+                                     reuse_http_session: bool = False,
                                      *args,
                                      **kwargs) -> MerossHttpClient:
         """
@@ -162,6 +199,7 @@ class MerossHttpClient(object):
         :param app_type: String used to discriminate the app type. The default value is auto-generated by the library.
         :param app_version: String used to discriminate the app version. The default value is auto-generated by the library.
         :param log_identifier: String used to log the app client usage. The default value is auto-generated by the library.
+        :param reuse_http_session: When set, the returned client keeps a long-lived HTTP session across API calls
         :return:
         """
 
@@ -179,7 +217,8 @@ class MerossHttpClient(object):
                                 ua_header=ua_header,
                                 app_type=app_type,
                                 app_version=app_version,
-                                log_identifier=log_identifier)
+                                log_identifier=log_identifier,
+                                reuse_http_session=reuse_http_session)
 
     @classmethod
     async def async_login(cls,
@@ -294,7 +333,8 @@ class MerossHttpClient(object):
                                         app_type: str = _DEFAULT_APP_TYPE,
                                         app_version: str = _MODULE_VERSION,
                                         ua_header: str = _DEFAULT_UA_HEADER,
-                                        stats_counter: HttpStatsCounter = None
+                                        stats_counter: HttpStatsCounter = None,
+                                        session: Optional[ClientSession] = None
                                         ) -> dict:
         nonce = _generate_nonce(16)
         timestamp_millis = int(round(time.time() * 1000))
@@ -339,54 +379,68 @@ class MerossHttpClient(object):
             log_payload['params'] = 'XXXX-MASKED-XXXX'
 
         _LOGGER.debug(f"Performing HTTP request against {url}, headers: {headers}, post data: {payload}")
-        async with ClientSession() as session:
-            async with session.post(url, json=payload, headers=headers, proxy=http_proxy) as response:
-                _LOGGER.debug(f"Response Status Code: {response.status}")
-                # Check if that is ok.
-                if response.status != 200:
-                    if stats_counter is not None:
-                        stats_counter.notify_http_request(request_url=url,
-                                                          method="post",
-                                                          http_response_code=response.status,
-                                                          api_response_code=None)
-                    raise AuthenticatedPostException("Failed request to API. Response code: %s" % str(response.status))
-
-                # Save returned value
-                jsondata = await response.json()
-                code = jsondata.get('apiStatus')
-
-                error = None
-                try:
-                    error = ErrorCodes(code)
-                except ValueError as e:
-                    raise AuthenticatedPostException(f"Unknown/Unhandled response code received from API. "
-                                                     f"Response was: {jsondata}")
-                finally:
-                    # Keep track of the stats
-                    if stats_counter is not None:
-                        stats_counter.notify_http_request(request_url=url,
-                                                          method="post",
-                                                          http_response_code=response.status,
-                                                          api_response_code=ErrorCodes.CODE_GENERIC_ERROR if error is None else error)
-                    if error is None:
-                        _LOGGER.error(f"Could not parse error code {code}.")
-                    elif error == ErrorCodes.CODE_NO_ERROR:
-                        return jsondata.get("data")
-                    elif error in (ErrorCodes.CODE_TOKEN_EXPIRED, ErrorCodes.CODE_TOKEN_ERROR):
-                        raise TokenExpiredException("The provided token has expired")
-                    elif error == ErrorCodes.CODE_TOO_MANY_TOKENS:
-                        raise TooManyTokensException("You have issued too many tokens without logging out and your "
-                                                     "account might have been temporarly disabled.")
-                    elif error in [ErrorCodes.CODE_WRONG_CREDENTIALS, ErrorCodes.CODE_UNEXISTING_ACCOUNT]:
-                        raise BadLoginException("Invalid username/Password combination")
-                    elif error == ErrorCodes.CODE_REDIRECT_REGION:
-                        api_domain = jsondata.get("data").get("domain")
-                        mqtt_domain = jsondata.get("data").get("mqttDomain")
-                        raise BadDomainException(f"Invalid URL/API Endpoint used. Use: {api_domain} instead.", api_domain, mqtt_domain)
-                    else:
-                        _LOGGER.error(f"Received non-ok API status code: {error.name}. "
-                                      f"Failed request to API. Response was: {jsondata}")
-                        raise HttpApiError(error)
+        if session is None:
+            async with ClientSession() as session:
+                return await cls._async_post_and_parse(session=session, url=url, payload=payload, headers=headers,
+                                                       http_proxy=http_proxy, stats_counter=stats_counter)
+        return await cls._async_post_and_parse(session=session, url=url, payload=payload, headers=headers,
+                                               http_proxy=http_proxy, stats_counter=stats_counter)
+
+    @classmethod
+    async def _async_post_and_parse(cls,
+                                    session: ClientSession,
+                                    url: str,
+                                    payload: dict,
+                                    headers: dict,
+                                    http_proxy: Optional[str],
+                                    stats_counter: Optional[HttpStatsCounter]) -> dict:
+        async with session.post(url, json=payload, headers=headers, proxy=http_proxy) as response:
+            _LOGGER.debug(f"Response Status Code: {response.status}")
+            # Check if that is ok.
+            if response.status != 200:
+                if stats_counter is not None:
+                    stats_counter.notify_http_request(request_url=url,
+                                                      method="post",
+                                                      http_response_code=response.status,
+                                                      api_response_code=None)
+                raise AuthenticatedPostException("Failed request to API. Response code: %s" % str(response.status))
+
+            # Save returned value
+            jsondata = await response.json()
+            code = jsondata.get('apiStatus')
+
+            error = None
+            try:
+                error = ErrorCodes(code)
+            except ValueError as e:
+                raise AuthenticatedPostException(f"Unknown/Unhandled response code received from API. "
+                                                 f"Response was: {jsondata}")
+            finally:
+                # Keep track of the stats
+                if stats_counter is not None:
+                    stats_counter.notify_http_request(request_url=url,
+                                                      method="post",
+                                                      http_response_code=response.status,
+                                                      api_response_code=ErrorCodes.CODE_GENERIC_ERROR if error is None else error)
+                if error is None:
+                    _LOGGER.error(f"Could not parse error code {code}.")
+                elif error == ErrorCodes.CODE_NO_ERROR:
+                    return jsondata.get("data")
+                elif error in (ErrorCodes.CODE_TOKEN_EXPIRED, ErrorCodes.CODE_TOKEN_ERROR):
+                    raise TokenExpiredException("The provided token has expired")
+                elif error == ErrorCodes.CODE_TOO_MANY_TOKENS:
+                    raise TooManyTokensException("You have issued too many tokens without logging out and your "
+                                                 "account might have been temporarly disabled.")
+                elif error in [ErrorCodes.CODE_WRONG_CREDENTIALS, ErrorCodes.CODE_UNEXISTING_ACCOUNT]:
+                    raise BadLoginException("Invalid username/Password combination")
+                elif error == ErrorCodes.CODE_REDIRECT_REGION:
+                    api_domain = jsondata.get("data").get("domain")
+                    mqtt_domain = jsondata.get("data").get("mqttDomain")
+                    raise BadDomainException(f"Invalid URL/API Endpoint used. Use: {api_domain} instead.", api_domain, mqtt_domain)
+                else:
+                    _LOGGER.error(f"Received non-ok API status code: {error.name}. "
+                                  f"Failed request to API. Response was: {jsondata}")
+                    raise HttpApiError(error)
 
     async def async_logout(self,
                            *args,
@@ -405,7 +459,8 @@ class MerossHttpClient(object):
                                                                   ua_header=self._ua_header,
                                                                   app_type=self._app_type,
                                                                   app_version=self._app_version,
-                                                                  stats_counter=self._stats_counter)
+                                                                  stats_counter=self._stats_counter,
+                                                                  session=self._get_session())
         self._cloud_creds = None
         _LOGGER.info("Logout succeeded.")
         return result
@@ -426,7 +481,8 @@ class MerossHttpClient(object):
                                                                   ua_header=self._ua_header,
                                                                   app_type=self._app_type,
                                                                   app_version=self._app_version,
-                                                                  stats_counter=self._stats_counter)
+                                                                  stats_counter=self._stats_counter,
+                                                                  session=self._get_session())
         return result
 
     @classmethod
@@ -482,7 +538,8 @@ class MerossHttpClient(object):
                                                                   ua_header=self._ua_header,
                                                                   app_type=self._app_type,
                                                                   app_version=self._app_version,
-                                                                  stats_counter=self._stats_counter)
+                                                                  stats_counter=self._stats_counter,
+                                                                  session=self._get_session())
         return [HttpDeviceInfo.from_dict(x) for x in result]
 
     async def async_list_hub_subdevices(self,
@@ -504,7 +561,8 @@ class MerossHttpClient(object):
                                                                   ua_header=self._ua_header,
                                                                   app_type=self._app_type,
                                                                   app_version=self._app_version,
-                                                                  stats_counter=self._stats_counter)
+                                                                  stats_counter=self._stats_counter,
+                                                                  session=self._get_session())
         return [HttpSubdeviceInfo.from_dict(x) for x in result]
 
     def set_http_proxy(self, proxy_url: str):
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from typing import Optional, Dict, Union
+
+from aiohttp import ClientSession, TCPConnector, ClientTimeout, ServerDisconnectedError
+
+_LOGGER = logging.getLogger(__name__)
+
+_DEFAULT_HEADERS = {"Content-Type": "application/json"}
+
+
+class LanHttpTransport(object):
+    """
+    Long-lived HTTP transport used to send commands to the devices over the local LAN.
+    A single pooled connector keeps the connections to each device IP alive across commands, while
+    a per-device semaphore caps the number of concurrent requests sent to the same device.
+    """
+
+    def __init__(self,
+                 max_concurrent_requests_per_device: int = 1,
+                 max_connections: int = 100,
+                 keepalive_timeout: float = 15.0):
+        """
+        Constructor
+        :param max_concurrent_requests_per_device: maximum number of in-flight requests towards the same device IP.
+                                                   Meross devices tend to choke on parallel requests, so
+                                                   this defaults to 1.
+        :param max_connections: maximum number of connections kept by the pool across all the devices
+        :param keepalive_timeout: seconds an idle connection is kept open before being released
+        """
+        if max_concurrent_requests_per_device < 1:
+            raise ValueError("max_concurrent_requests_per_device must be a positive number")
+        self._max_concurrent_requests_per_device = max_concurrent_requests_per_device
+        self._max_connections = max_connections
+        self._keepalive_timeout = keepalive_timeout
+        self._session: Optional[ClientSession] = None
+        self._device_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._closing_tasks = set()
+
+    def _get_session(self) -> ClientSession:
+        # The session is lazily built, as it has to be created within a running event loop
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(limit=self._max_connections,
+                                     limit_per_host=self._max_concurrent_requests_per_device,
+                                     keepalive_timeout=self._keepalive_timeout)
+            self._session = ClientSession(connector=connector, headers=_DEFAULT_HEADERS)
+        return self._session
+
+    def _get_semaphore(self, device_ip: str) -> asyncio.Semaphore:
+        sem = self._device_semaphores.get(device_ip)
+        if sem is None:
+            sem = asyncio.Semaphore(self._max_concurrent_requests_per_device)
+            self._device_semaphores[device_ip] = sem
+        return sem
+
+    async def async_post(self, device_ip: str, data: Union[bytes, str], timeout: float,
+                         idempotent: bool = False) -> str:
+        """
+        Posts the given data to the /config endpoint of the device and returns the response body.
+        The timeout covers both the time spent waiting for a free slot and the HTTP request itself.
+        :param device_ip: LAN IP address of the target device
+        :param data: message to send
+        :param timeout: maximum time in seconds to wait for the response
+        :param idempotent: when set, the request is sent again, once, if the device drops the pooled connection.
+                           Must only be set for requests that can safely be executed twice, e.g. GET commands.
+        :return: the response body, as text
+        """
+        body = await self.async_post_raw(device_ip=device_ip, data=data, timeout=timeout, idempotent=idempotent)
+        return body.decode("utf8")
+
+    async def async_post_raw(self, device_ip: str, data: Union[bytes, str], timeout: float,
+                             idempotent: bool = False) -> bytes:
+        """
+        Same as async_post(), but returns the raw response body, without decoding it
+        """
+        return await asyncio.wait_for(self._async_post(device_ip=device_ip, data=data, timeout=timeout,
+                                                       idempotent=idempotent), timeout)
+
+    async def _async_post(self, device_ip: str, data: Union[bytes, str], timeout: float, idempotent: bool) -> bytes:
+        url = f"http://{device_ip}/config"
+        async with self._get_semaphore(device_ip):
+            session = self._get_session()
+            try:
+                async with session.post(url, data=data, timeout=ClientTimeout(total=timeout)) as response:
+                    return await response.read()
+            except ServerDisconnectedError:
+                # The device might have silently dropped the idle keep-alive connection we tried to reuse.
+                # Retry once, on a fresh connection, unless the device might have already executed the request.
+                if not idempotent:
+                    raise
+                _LOGGER.debug("Device %s dropped the pooled connection, retrying with a new one", device_ip)
+                async with session.post(url, data=data, timeout=ClientTimeout(total=timeout)) as response:
+                    return await response.read()
+
+    async def async_close(self) -> None:
+        """
+        Closes the pooled connections
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def close(self) -> None:
+        """
+        Releases the pooled connections without waiting for them to be closed. Prefer awaiting `async_close()`.
+        When invoked within a running event loop, the connector is closed by a task scheduled on that loop.
+        """
+        if self._session is not None and not self._session.closed:
+            connector = self._session.connector
+            self._session.detach()
+            if connector is not None:
+                closing = connector.close()
+                if asyncio.iscoroutine(closing):
+                    self._schedule_close(closing)
+        self._session = None
+
+    def _schedule_close(self, closing) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop is running: complete the closure right away
+            try:
+                asyncio.run(closing)
+            except Exception:
+                _LOGGER.debug("Error occurred while closing the LAN HTTP connector", exc_info=True)
+            return
+        task = loop.create_task(closing)
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
@@ -1,41 +1,45 @@
 import asyncio
 import functools
+import itertools
 import json
 import logging
-import random
 import ssl
-import string
 import sys
 from asyncio import Future, AbstractEventLoop
 from asyncio import TimeoutError
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
-from hashlib import md5
-from time import time
-from typing import Optional, List, TypeVar, Iterable, Callable, Awaitable, Tuple, Union, Any
+from time import time, monotonic
+from typing import Optional, List, TypeVar, Iterable, Callable, Awaitable, Tuple, Union, Any, Dict
 
 import paho.mqtt.client as mqtt
-from aiohttp import ClientSession
 
 from meross_iot.controller.device import BaseDevice, HubDevice, GenericSubDevice
+from meross_iot.device_snapshot import DeviceSnapshot
 from meross_iot.device_factory import (
     build_meross_device_from_abilities,
     build_meross_subdevice,
     build_meross_device_from_known_types,
 )
 from meross_iot.error_budget import ErrorBudgetManager
+from meross_iot.subscriptions import PushSubscription, PushSubscriptionRegistry
+from meross_iot.transport_selector import TransportSelector, HedgingStats
 from meross_iot.http_api import MerossHttpClient
+from meross_iot.lan_transport import LanHttpTransport
 from meross_iot.model.constants import DEFAULT_COMMAND_TIMEOUT, DEFAULT_MQTT_PORT
 from meross_iot.model.enums import Namespace, OnlineStatus
 from meross_iot.model.exception import (
     CommandTimeoutError,
     CommandError,
-    UnknownDeviceType
+    UnknownDeviceType,
+    RateLimitExceeded,
+    MqttConnectionLostError
 )
 from meross_iot.model.http.device import HttpDeviceInfo
 from meross_iot.model.http.subdevice import HttpSubdeviceInfo
 from meross_iot.model.push.factory import parse_push_notification
 from meross_iot.model.push.generic import GenericPushNotification
+from meross_iot.mqtt_transport import MqttTransportMode, AsyncioMqttLoopAdapter
 from meross_iot.model.push.online import OnlinePushNotification
 from meross_iot.model.push.unbind import UnbindPushNotification
 from meross_iot.utilities.mqtt import (
@@ -46,8 +50,20 @@ from meross_iot.utilities.mqtt import (
     verify_message_signature,
     device_uuid_from_push_notification,
     build_device_request_topic,
+    MqttMessageBuilder,
 )
+from meross_iot.utilities.dispatcher import PushDispatcher, HandlerStats
+from meross_iot.utilities.event_stream import EventStream, StreamOverflowPolicy
+from meross_iot.utilities.ingestion import IngestionQueue, IngestionOverflowPolicy, IngestionStats
+from meross_iot.utilities.pending import PendingCommandTable
+from meross_iot.utilities.circuit_breaker import CircuitBreaker
+from meross_iot.utilities.timeouts import AdaptiveTimeouts, Transport
+from meross_iot.utilities.limiter import RateLimiter, OverLimitPolicy, drop_on_overquota_var
 from meross_iot.utilities.network import extract_domain
+from meross_iot.utilities.response_cache import ResponseCache
+from meross_iot.utilities.state_changes import StateChangeStats, StateFingerprints
+from meross_iot.utilities.singleflight import SingleFlight
+from meross_iot.utilities.stats import ApiCounter, ApiStatsResult, DiscoveryStats
 
 logging.basicConfig(
     format="%(levelname)s:%(message)s", level=logging.INFO, stream=sys.stdout
@@ -55,14 +71,13 @@ logging.basicConfig(
 _LOGGER = logging.getLogger(__name__)
 
 _CONNECTION_DROP_UPDATE_SCHEDULE_INTERVAL = 2
+_DEFAULT_HEDGE_DELAY = 0.5
 
 T = TypeVar("T", bound=BaseDevice)  # Declare type variable
 ManagerPushNotificationHandlerType = Callable[[GenericPushNotification, List[BaseDevice], 'MerossManager'], Awaitable]
 
 _PENDING_FUTURES: List["DelayedCoroFutureHandler"] = []
 
-_DEFAULT_HEADERS = {"Content-Type": "application/json"}
-
 
 def _mqtt_key_from_domain_port(domain: str, port: int) -> str:
     return f"{domain}:{port}"
@@ -72,6 +87,8 @@ class TransportMode(Enum):
     MQTT_ONLY = 0
     LAN_HTTP_FIRST = 1
     LAN_HTTP_FIRST_ONLY_GET = 2
+    AUTO = 3  # Every command goes through the transport with the lowest expected latency for the target device
+    HEDGED = 4  # Like LAN_HTTP_FIRST, but GET commands are also sent via MQTT when the LAN answer is late
 
 
 class MqttConnectionStatus(Enum):
@@ -95,6 +112,25 @@ class MerossManager(object):
             loop: Optional[AbstractEventLoop] = None,
             mqtt_override_server: Optional[Tuple[str, int]] = None,
             auto_discovery_on_connection: bool = True,
+            lan_max_concurrent_requests_per_device: int = 1,
+            rate_limiter: Optional[RateLimiter] = None,
+            coalesce_get_commands: bool = True,
+            response_cache: Optional[ResponseCache] = None,
+            discovery_concurrency: int = 10,
+            snapshot_path: Optional[str] = None,
+            ingestion_queue_size: int = 10000,
+            ingestion_overflow_policy: IngestionOverflowPolicy = IngestionOverflowPolicy.DROP_OLDEST,
+            mqtt_transport_mode: MqttTransportMode = MqttTransportMode.THREADED,
+            replay_commands_on_reconnect: bool = False,
+            replay_ttl: float = 30.0,
+            circuit_breaker: Optional[CircuitBreaker] = None,
+            adaptive_timeouts: Optional[AdaptiveTimeouts] = None,
+            transport_selector: Optional[TransportSelector] = None,
+            hedge_delay: Optional[float] = None,
+            max_concurrent_push_handlers: int = 16,
+            push_handler_timeout: Optional[float] = None,
+            slow_push_handler_threshold: float = 1.0,
+            state_fingerprints: Optional[StateFingerprints] = None,
             *args,
             **kwords,
     ) -> None:
@@ -114,6 +150,53 @@ class MerossManager(object):
                                      obtained via HTTP API, and port 443 will be used.
         :param auto_discovery_on_connection: (Optional) When set instructs the manager to issue a discovery as soon as
                                              the mqtt connection is established against the MQTT broker (defaults to True)
+        :param lan_max_concurrent_requests_per_device: (Optional) Maximum number of concurrent LAN HTTP requests
+                                                       sent to the same device (defaults to 1)
+        :param rate_limiter: (Optional) RateLimiter that guards the commands sent to the MQTT broker. When None
+                             (default), no rate limit is applied.
+        :param coalesce_get_commands: (Optional) When set (default), identical GET commands issued concurrently
+                                      to the same device share a single in-flight request.
+        :param response_cache: (Optional) ResponseCache holding the responses to idempotent GET commands. Cached
+                               responses are only returned to callers that pass a `max_age`. When None, a
+                               ResponseCache with the default settings is used.
+        :param discovery_concurrency: (Optional) Maximum number of devices that the discovery queries at the same
+                                      time, for ability fetches, hub subdevice listings and hub updates (defaults to 10)
+        :param snapshot_path: (Optional) Path of the device snapshot file. When set, the abilities of the discovered
+                              devices are stored there and reused by later discoveries, as long as the device
+                              firmware and hardware versions do not change.
+        :param ingestion_queue_size: (Optional) Maximum number of push notifications received from the MQTT broker
+                                     waiting to be handled by the event loop (defaults to 10000)
+        :param ingestion_overflow_policy: (Optional) Which push notification is discarded when the ingestion queue
+                                          is full (defaults to DROP_OLDEST)
+        :param mqtt_transport_mode: (Optional) When set to ASYNCIO, the MQTT clients are driven by the event loop
+                                    instead of running their own network thread (defaults to THREADED)
+        :param replay_commands_on_reconnect: (Optional) When the connection to the MQTT broker drops, the in-flight
+                                             commands sent through it fail right away with MqttConnectionLostError.
+                                             When this parameter is set, GET commands (and commands flagged as
+                                             replay_safe) are instead parked and sent again as soon as the connection
+                                             is restored (defaults to False)
+        :param replay_ttl: (Optional) Maximum time in seconds a command is parked waiting for the connection to be
+                           restored, before failing with MqttConnectionLostError (defaults to 30)
+        :param circuit_breaker: (Optional) CircuitBreaker that rejects right away the commands to devices that are
+                                offline or repeatedly timed out. When None (default), commands are never rejected.
+        :param adaptive_timeouts: (Optional) AdaptiveTimeouts deriving the timeout of the commands that do not
+                                  specify one from the round-trip times observed for every device and transport.
+                                  When None (default), such commands time out after DEFAULT_COMMAND_TIMEOUT seconds
+                                  (1 second for LAN attempts).
+        :param transport_selector: (Optional) TransportSelector picking the transport of the commands issued with
+                                   TransportMode.AUTO. When None, a TransportSelector with default settings is used.
+        :param hedge_delay: (Optional) seconds to wait for the LAN answer to a GET command issued with
+                            TransportMode.HEDGED, before sending it via MQTT as well. When None (default), the 90th
+                            percentile of the LAN latency of the device is used.
+        :param max_concurrent_push_handlers: (Optional) maximum number of push notification handlers, both manager
+                                             and device ones, running at the same time (defaults to 16)
+        :param push_handler_timeout: (Optional) seconds after which a push notification handler is cancelled.
+                                     When None (default), handlers are never cancelled.
+        :param slow_push_handler_threshold: (Optional) push notification handlers running longer than this number of
+                                            seconds are logged as slow (defaults to 1)
+        :param state_fingerprints: (Optional) StateFingerprints detecting the push notifications that repeat the
+                                   previous payload of the same device and namespace. When None, a StateFingerprints
+                                   that detects them without suppressing their dispatching to the devices is used.
         """
 
         # Store local attributes
@@ -122,17 +205,45 @@ class MerossManager(object):
         self._auto_reconnect = auto_reconnect
         self._ca_cert = ca_cert
         self._app_id, self._client_id = generate_client_and_app_id()
-        self._pending_messages_futures = {}
         self._device_registry = DeviceRegistry()
         self._push_coros = []
+        self._push_subscriptions = PushSubscriptionRegistry()
+        self._event_streams = PushSubscriptionRegistry()
+        self._open_event_streams = set()
         self._mqtt_skip_validation = mqtt_skip_cert_validation
         self._mqtt_clients = {}
         self._mqtt_connected_and_subscribed = {}
+        self._mqtt_transport_mode = mqtt_transport_mode
+        self._mqtt_loop_adapters = {}
         self._auto_discovery_on_connection = auto_discovery_on_connection
+        if discovery_concurrency < 1:
+            raise ValueError("discovery_concurrency must be at least 1")
+        self._discovery_concurrency = discovery_concurrency
+        self._last_discovery_stats: Optional[DiscoveryStats] = None
+        self._device_snapshot = DeviceSnapshot(snapshot_path) if snapshot_path is not None else None
 
         # By default, assume MQTT-Only transport mode
         self._default_transport_mode = TransportMode.MQTT_ONLY
         self._error_budget_manager = ErrorBudgetManager()
+        self._lan_transport = LanHttpTransport(
+            max_concurrent_requests_per_device=lan_max_concurrent_requests_per_device)
+
+        # Rate limiting and API stats
+        self._rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self._api_counter = ApiCounter()
+        self._circuit_breaker = circuit_breaker
+        self._adaptive_timeouts = adaptive_timeouts
+        self._transport_selector = transport_selector if transport_selector is not None else TransportSelector()
+        self._hedge_delay = hedge_delay
+        self._hedging_stats = HedgingStats()
+        self._state_fingerprints = state_fingerprints if state_fingerprints is not None else StateFingerprints()
+
+        # Single-flight coalescing of identical concurrent GET commands
+        self._coalesce_get_commands = coalesce_get_commands
+        self._get_single_flight = SingleFlight()
+
+        # Cache of the responses to idempotent GET commands
+        self._response_cache = response_cache if response_cache is not None else ResponseCache()
 
         # Default proxy setup
         self._enable_proxy = False
@@ -144,12 +255,31 @@ class MerossManager(object):
         self._mqtt_looper_task = None
         self._loop = asyncio.get_event_loop() if loop is None else loop
 
+        # Commands waiting for their ACK, along with their deadlines
+        self._pending_commands = PendingCommandTable(loop=self._loop)
+        self._replay_commands_on_reconnect = replay_commands_on_reconnect
+        self._replay_ttl = replay_ttl
+        self._replayed_commands = 0
+
+        # Push notifications are processed in order for every device, concurrently across devices
+        self._push_dispatcher = PushDispatcher(loop=self._loop,
+                                               max_concurrent_handlers=max_concurrent_push_handlers,
+                                               handler_timeout=push_handler_timeout,
+                                               slow_handler_threshold=slow_push_handler_threshold)
+
+        # Messages received by the paho-mqtt thread are handed over to the event loop in batches
+        self._ingestion_queue = IngestionQueue(loop=self._loop,
+                                               consumer=self._on_ingested_message,
+                                               max_size=ingestion_queue_size,
+                                               overflow_policy=ingestion_overflow_policy)
+
         # Prepare MQTT info
         self._mqtt_password = generate_mqtt_password(user_id=self._cloud_creds.user_id, key=self._cloud_creds.key)
         self._client_response_topic = build_client_response_topic(
             user_id=self._cloud_creds.user_id, app_id=self._app_id
         )
         self._user_topic = build_client_user_topic(user_id=self._cloud_creds.user_id)
+        self._message_builder = MqttMessageBuilder(from_topic=self._client_response_topic, key=self._cloud_creds.key)
         self._override_mqtt_server = mqtt_override_server
 
     @property
@@ -169,6 +299,88 @@ class MerossManager(object):
     def default_transport_mode(self, value: TransportMode) -> None:
         self._default_transport_mode = value
 
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return self._rate_limiter
+
+    @property
+    def pending_commands(self) -> PendingCommandTable:
+        """Commands sent via MQTT that are waiting for their ACK"""
+        return self._pending_commands
+
+    @property
+    def replayed_commands_count(self) -> int:
+        """Number of commands sent again after the connection to the MQTT broker was restored"""
+        return self._replayed_commands
+
+    @property
+    def ingestion_stats(self) -> IngestionStats:
+        """Counters of the queue handing over MQTT messages from the paho-mqtt thread to the event loop"""
+        return self._ingestion_queue.stats
+
+    @property
+    def transport_selector(self) -> TransportSelector:
+        """Per-device LAN/MQTT statistics and transport choices"""
+        return self._transport_selector
+
+    @property
+    def push_dispatcher(self) -> PushDispatcher:
+        """Dispatcher running the push notification handlers"""
+        return self._push_dispatcher
+
+    def get_push_handler_stats(self) -> Dict[str, HandlerStats]:
+        """Latency and outcome counters of the push notification handlers, keyed by handler name"""
+        return self._push_dispatcher.get_handler_stats()
+
+    @property
+    def hedging_stats(self) -> HedgingStats:
+        """Counters of the GET commands issued with TransportMode.HEDGED"""
+        return self._hedging_stats
+
+    @property
+    def adaptive_timeouts(self) -> Optional[AdaptiveTimeouts]:
+        return self._adaptive_timeouts
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        return self._circuit_breaker
+
+    @property
+    def state_fingerprints(self) -> StateFingerprints:
+        return self._state_fingerprints
+
+    def get_state_change_stats(self) -> Dict[str, StateChangeStats]:
+        """
+        Returns, for every namespace, how many push notifications repeated the previous payload of the same device
+        and how many of them were not dispatched to the devices
+        """
+        return self._state_fingerprints.get_stats()
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        return self._response_cache
+
+    def get_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
+        """Returns the statistics of the messages sent to the MQTT broker within the given time window"""
+        return self._api_counter.get_api_stats(time_window=time_window)
+
+    def get_delayed_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
+        """Returns the statistics of the messages delayed by the rate limiter within the given time window"""
+        return self._api_counter.get_delayed_api_stats(time_window=time_window)
+
+    def get_dropped_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
+        """Returns the statistics of the messages dropped by the rate limiter within the given time window"""
+        return self._api_counter.get_dropped_api_stats(time_window=time_window)
+
+    def get_coalesced_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
+        """Returns the statistics of the GET commands served by an identical in-flight command"""
+        return self._api_counter.get_coalesced_api_stats(time_window=time_window)
+
+    @property
+    def coalesced_commands_count(self) -> int:
+        """Total number of GET commands that have been served by an identical in-flight command"""
+        return self._get_single_flight.coalesced_calls
+
     def _get_client_from_domain_port(self, client: mqtt.Client) -> Tuple[Optional[str], Optional[int]]:
         for k, v in self._mqtt_clients.items():
             if v == client:
@@ -193,8 +405,19 @@ class MerossManager(object):
                 _LOGGER.info("Proxy configuration set for newly created client")
                 client.proxy_set(proxy_type=self._proxy_type, proxy_addr=self._proxy_addr, proxy_port=self._proxy_port)
             self._mqtt_clients[dict_key] = client
+            if self._mqtt_transport_mode == MqttTransportMode.ASYNCIO:
+                self._mqtt_loop_adapters[dict_key] = AsyncioMqttLoopAdapter(client=client,
+                                                                            loop=self._loop,
+                                                                            auto_reconnect=self._auto_reconnect)
         # Init the client
-        if not client.is_connected():
+        adapter = self._mqtt_loop_adapters.get(dict_key)
+        if adapter is not None and not client.is_connected():
+            # The event loop drives the client: the connection attempt is shared among the concurrent callers
+            conn_evt = self._mqtt_connected_and_subscribed.setdefault(dict_key, asyncio.Event())
+            _LOGGER.debug("MQTT client connecting to %s:%d", domain, port)
+            await adapter.async_connect(host=domain, port=port, keepalive=30)
+            await conn_evt.wait()
+        elif not client.is_connected():
             conn_evt = self._mqtt_connected_and_subscribed.get(dict_key)  # type: asyncio.Event
             if conn_evt is None:
                 conn_evt = asyncio.Event()
@@ -265,7 +488,108 @@ class MerossManager(object):
                 f"Coroutine function {coro} was not registered as handler for this device"
             )
 
+    def subscribe_push_notifications(
+            self,
+            coro: ManagerPushNotificationHandlerType,
+            namespaces: Optional[Union[Namespace, str, Iterable[Union[Namespace, str]]]] = None,
+            device_uuids: Optional[Union[str, Iterable[str]]] = None,
+            device_types: Optional[Union[str, Iterable[str]]] = None,
+            device_classes: Optional[Union[type, Iterable[type]]] = None,
+            changes_only: bool = False
+    ) -> PushSubscription:
+        """
+        Registers a coroutine so that it gets invoked only for the push notifications matching all the given filters.
+        Unlike the handlers registered via register_push_notification_handler_coroutine(), the coroutine is not
+        invoked at all for the other notifications.
+        :param coro: coroutine-function, with the same signature of the manager push notification handlers
+        :param namespaces: namespaces of the notifications to receive
+        :param device_uuids: uuids of the devices whose notifications are received
+        :param device_types: types of the devices whose notifications are received (e.g. "mss310")
+        :param device_classes: classes (e.g. ToggleXMixin) the devices whose notifications are received must be
+                               instances of
+        :param changes_only: when set, the coroutine is not invoked for the notifications repeating the previous
+                             payload of the same device and namespace, and receives a `state_change` keyword argument
+                             (StateChange) describing the changed fields otherwise
+        :return: the subscription, to be passed to unsubscribe_push_notifications()
+        """
+        if not asyncio.iscoroutinefunction(coro):
+            raise ValueError("The coro parameter must be a coroutine function")
+        return self._push_subscriptions.subscribe(coro, namespaces=namespaces, device_uuids=device_uuids,
+                                                  device_types=device_types, device_classes=device_classes,
+                                                  changes_only=changes_only)
+
+    def unsubscribe_push_notifications(self, subscription: PushSubscription) -> None:
+        """
+        Cancels a subscription returned by subscribe_push_notifications()
+        """
+        if not self._push_subscriptions.unsubscribe(subscription):
+            _LOGGER.error(f"Subscription {subscription} is not active")
+
+    @property
+    def push_subscriptions(self) -> PushSubscriptionRegistry:
+        """Filtered push notification subscriptions, e.g. to inspect their counts"""
+        return self._push_subscriptions
+
+    def events(
+            self,
+            namespaces: Optional[Union[Namespace, str, Iterable[Union[Namespace, str]]]] = None,
+            device_uuids: Optional[Union[str, Iterable[str]]] = None,
+            device_types: Optional[Union[str, Iterable[str]]] = None,
+            device_classes: Optional[Union[type, Iterable[type]]] = None,
+            max_size: int = 1000,
+            overflow_policy: StreamOverflowPolicy = StreamOverflowPolicy.DROP_OLDEST,
+            changes_only: bool = False
+    ) -> EventStream:
+        """
+        Opens a stream of the push notifications matching all the given filters, to be consumed via
+        `async for push_notification in stream`. Notifications are buffered once the devices have handled them:
+        a slow consumer never delays the device state updates, it only lags behind (see EventStream.stats) and,
+        once its buffer is full, loses notifications according to the overflow policy.
+        The stream must be closed (or used as an async context manager) when no longer needed.
+        :param namespaces: namespaces of the notifications to receive
+        :param device_uuids: uuids of the devices whose notifications are received
+        :param device_types: types of the devices whose notifications are received (e.g. "mss310")
+        :param device_classes: classes (e.g. ToggleXMixin) the devices whose notifications are received must be
+                               instances of
+        :param max_size: maximum number of notifications buffered by the stream
+        :param overflow_policy: what to do with the notifications that do not fit the buffer
+        :param changes_only: when set, the notifications repeating the previous payload of the same device and
+                             namespace are not streamed
+        :return: the event stream
+        """
+        subscription = None
+
+        def _on_close(stream: EventStream) -> None:
+            self._event_streams.unsubscribe(subscription)
+            self._open_event_streams.discard(stream)
+
+        event_stream = EventStream(max_size=max_size, overflow_policy=overflow_policy, on_close=_on_close)
+        subscription = self._event_streams.subscribe(event_stream.publish, namespaces=namespaces,
+                                                     device_uuids=device_uuids, device_types=device_types,
+                                                     device_classes=device_classes, changes_only=changes_only)
+        self._open_event_streams.add(event_stream)
+        return event_stream
+
     def close(self):
+        """
+        Stops the manager. The pooled LAN connections are released in background: prefer awaiting async_close()
+        when running within the event loop.
+        """
+        self._stop()
+        # Release the pooled LAN connections
+        _LOGGER.debug("Closing LAN HTTP transport...")
+        self._lan_transport.close()
+
+    async def async_close(self):
+        """
+        Stops the manager and waits for the pooled LAN connections to be closed.
+        This is the recommended way of shutting the manager down.
+        """
+        self._stop()
+        _LOGGER.debug("Closing LAN HTTP transport...")
+        await self._lan_transport.async_close()
+
+    def _stop(self):
         _LOGGER.info("Manager stop requested.")
         _LOGGER.debug("Canceling pending futures...")
         for f in _PENDING_FUTURES:
@@ -274,8 +598,16 @@ class MerossManager(object):
 
         # Disconnect from all mqtt clients
         _LOGGER.debug("Disconnecting MQTT clients...")
-        for client in self._mqtt_clients.values():
-            client.disconnect()
+        for key, client in self._mqtt_clients.items():
+            adapter = self._mqtt_loop_adapters.get(key)
+            if adapter is not None:
+                adapter.stop()
+            else:
+                client.disconnect()
+
+        # Let the event stream consumers terminate
+        for event_stream in list(self._open_event_streams):
+            event_stream.close()
 
     def find_devices(
             self,
@@ -343,9 +675,12 @@ class MerossManager(object):
 
         :return: A list of discovered device, which implement `BaseDevice`
         """
+        stats = DiscoveryStats()
         if cached_http_device_list is None:
             _LOGGER.info(f"\n\n------- Triggering Manager Discovery, filter_device: [{meross_device_uuid}] -------")
+            phase_start = monotonic()
             http_devices = await self._http_client.async_list_devices()
+            stats.notify_phase_duration("http_device_list", monotonic() - phase_start)
         else:
             _LOGGER.info(
                 f"\n\n------- Triggering Manager Discovery (using cached http device list), filter_device: [{meross_device_uuid}] -------")
@@ -375,14 +710,6 @@ class MerossManager(object):
             f"The following devices are new to me: {discovered_new_http_devices}"
         )
 
-        enrolled_devices = []
-        for d in discovered_new_http_devices:
-            dev = await self._async_enroll_new_http_dev(d)
-            enrolled_devices.append(dev)
-        for hdevice, ldevice in already_known_http_devices.items():
-            dev = await ldevice.update_from_http_state(hdevice)
-            enrolled_devices.append(dev)
-
         _LOGGER.debug(
             f"Updating %d known devices form HTTPINFO and fetching "
             f"data from %d newly discovered devices...",
@@ -390,27 +717,46 @@ class MerossManager(object):
             len(discovered_new_http_devices)
         )
 
+        enrolled_devices = await self._async_run_discovery_phase(
+            phase="new_devices_enrollment",
+            items=discovered_new_http_devices,
+            coro_factory=lambda d: self._async_enroll_new_http_dev(d, stats=stats),
+            stats=stats)
+        enrolled_devices.extend(await self._async_run_discovery_phase(
+            phase="known_devices_update",
+            items=list(already_known_http_devices.items()),
+            coro_factory=lambda item: self._async_update_known_http_dev(hdevice=item[0], ldevice=item[1]),
+            stats=stats))
+
         _LOGGER.info(f"Fetch and update done")
 
-        hubs = []
+        hubs = [d for d in enrolled_devices if isinstance(d, HubDevice)]
+
+        async def _list_and_enroll_subdevices(hub: HubDevice) -> List[GenericSubDevice]:
+            subdevs = await self._http_client.async_list_hub_subdevices(hub_id=hub.uuid)
+            return [await self._async_enroll_new_http_subdev(subdevice_info=sd,
+                                                             hub=hub,
+                                                             hub_reported_abilities=hub.abilities) for sd in subdevs]
+
         enrolled_subdevices = []
-        for d in enrolled_devices:
-            if isinstance(d, HubDevice):
-                hubs.append(d)
-                subdevs = await self._http_client.async_list_hub_subdevices(
-                    hub_id=d.uuid
-                )
-                for sd in subdevs:
-                    dev = await self._async_enroll_new_http_subdev(
-                        subdevice_info=sd,
-                        hub=d,
-                        hub_reported_abilities=d.abilities)
-                    enrolled_subdevices.append(dev)
+        for subdevs in await self._async_run_discovery_phase(phase="hub_subdevices_listing",
+                                                             items=hubs,
+                                                             coro_factory=_list_and_enroll_subdevices,
+                                                             stats=stats):
+            enrolled_subdevices.extend(subdevs)
 
         # We need to update the state of hubs in order to refresh subdevices online status
         if update_subdevice_status:
-            for h in hubs:
-                await h.async_update(drop_on_overquota=False)
+            await self._async_run_discovery_phase(phase="hub_updates",
+                                                  items=hubs,
+                                                  coro_factory=lambda h: h.async_update(drop_on_overquota=False),
+                                                  stats=stats)
+
+        self._save_device_snapshot()
+
+        stats.notify_done()
+        self._last_discovery_stats = stats
+        _LOGGER.info(str(stats))
         _LOGGER.info(f"\n------- Manager Discovery ended -------\n")
 
         res = []
@@ -418,6 +764,37 @@ class MerossManager(object):
         res.extend(enrolled_subdevices)
         return res
 
+    @property
+    def last_discovery_stats(self) -> Optional[DiscoveryStats]:
+        """Timing breakdown of the latest completed discovery, None if no discovery has completed yet"""
+        return self._last_discovery_stats
+
+    async def _async_run_discovery_phase(self,
+                                         phase: str,
+                                         items: List[Any],
+                                         coro_factory: Callable[[Any], Awaitable[Any]],
+                                         stats: DiscoveryStats) -> List[Any]:
+        """
+        Runs the given coroutine against every item, with at most `discovery_concurrency` of them running at the
+        same time. A failure only affects the item that caused it: it is logged and its result is discarded.
+        :return: the results that are not None, in the same order of the items
+        """
+        semaphore = asyncio.Semaphore(self._discovery_concurrency)
+
+        async def _run(item):
+            async with semaphore:
+                try:
+                    return await coro_factory(item)
+                except Exception:
+                    _LOGGER.exception("Discovery phase %s failed for %s", phase, item)
+                    stats.notify_failure(phase)
+                    return None
+
+        phase_start = monotonic()
+        results = await asyncio.gather(*[_run(item) for item in items])
+        stats.notify_phase_duration(phase, monotonic() - phase_start)
+        return [r for r in results if r is not None]
+
     async def _async_enroll_new_http_subdev(
             self,
             subdevice_info: HttpSubdeviceInfo,
@@ -447,13 +824,39 @@ class MerossManager(object):
         """
         pass
 
+    def _save_device_snapshot(self) -> None:
+        if self._device_snapshot is None:
+            return
+        try:
+            self._device_snapshot.save()
+        except OSError:
+            _LOGGER.exception("Failed to write the device snapshot to %s", self._device_snapshot.filename)
+
+    async def _async_update_known_http_dev(self, hdevice: HttpDeviceInfo, ldevice: BaseDevice) -> BaseDevice:
+        if self._device_snapshot is not None:
+            if ldevice.firmware_version == hdevice.fmware_version and ldevice.hardware_version == hdevice.hdware_version:
+                self._device_snapshot.update(device_info=hdevice, abilities=ldevice.abilities)
+            else:
+                # The abilities we know were reported by a different firmware: do not reuse them on next start
+                self._device_snapshot.remove(hdevice.uuid)
+        # The discovery may update the device state, e.g. its online status
+        self._state_fingerprints.invalidate(hdevice.uuid)
+        return await ldevice.update_from_http_state(hdevice)
+
     async def _async_enroll_new_http_dev(
-            self, device_info: HttpDeviceInfo
+            self, device_info: HttpDeviceInfo, stats: Optional[DiscoveryStats] = None
     ) -> Optional[BaseDevice]:
-        # If the device is online, try to query the device for its abilities.
         device = None
         abilities = None
-        if device_info.online_status == OnlineStatus.ONLINE:
+
+        # Reuse the abilities recorded in the snapshot, unless the device firmware has changed since then
+        if self._device_snapshot is not None:
+            abilities = self._device_snapshot.lookup_abilities(device_info)
+            if stats is not None:
+                stats.notify_snapshot_lookup(hit=abilities is not None)
+
+        # If the device is online, try to query the device for its abilities.
+        if abilities is None and device_info.online_status == OnlineStatus.ONLINE:
             try:
                 res_abilities = await self.async_execute_cmd(
                     destination_device_uuid=device_info.uuid,
@@ -464,6 +867,8 @@ class MerossManager(object):
                     mqtt_port=DEFAULT_MQTT_PORT
                 )
                 abilities = res_abilities.get("ability")
+                if abilities is not None and self._device_snapshot is not None:
+                    self._device_snapshot.update(device_info=device_info, abilities=abilities)
             except CommandTimeoutError:
                 _LOGGER.warning(
                     f"Device %s (%s) is online, but timeout occurred "
@@ -514,13 +919,22 @@ class MerossManager(object):
         _LOGGER.info("Disconnection detected. Reason: %s" % str(rc))
 
         # When a disconnection occurs, we need to set "unavailable" status.
-        asyncio.run_coroutine_threadsafe(
-            self._notify_connection_drop(), loop=self._loop
-        )
+        self._loop.call_soon_threadsafe(self._notify_connection_drop)
 
         conn_evt = self._mqtt_connected_and_subscribed.get(userdata) # type: asyncio.Event
         conn_evt.clear()
 
+        # The ACKs to the in-flight commands sent through this broker can no longer arrive
+        self._loop.call_soon_threadsafe(self._abort_pending_commands, userdata)
+
+    def _abort_pending_commands(self, broker: str) -> None:
+        aborted = self._pending_commands.abort(
+            broker=broker,
+            exception_factory=lambda c: MqttConnectionLostError(message=f"{c.method} {c.namespace}",
+                                                                target_device_uuid=c.target_device_uuid))
+        if aborted > 0:
+            _LOGGER.warning("Connection to %s lost: %d in-flight commands aborted", broker, aborted)
+
     def _on_unsubscribe(self):
         # NOTE! This method is called by the paho-mqtt thread, thus any invocation to the
         # asyncio platform must be scheduled via `self._loop.call_soon_threadsafe()` method.
@@ -633,20 +1047,19 @@ class MerossManager(object):
             # If the message is a PUSHACK/GETACK/ERROR, check if there is any pending command waiting for it and, if so,
             # resolve its future
             message_id = header.get("messageId")
-            future = self._pending_messages_futures.get(message_id)
-            if future is not None:
+            pending_command = self._pending_commands.pop(message_id)
+            if pending_command is not None:
+                future = pending_command.future
                 _LOGGER.debug("Found a pending command waiting for response message")
                 if message_method == "ERROR":
                     err = CommandError(error_payload=message.get('payload'))
                     if not self._loop.is_closed():
-                        self._loop.call_soon_threadsafe(_handle_future, future, None, err)
+                        self._ingestion_queue.put((future, None, err), droppable=False)
                     else:
                         _LOGGER.warning("Could not return message %s to caller as the event loop has been closed already", message)
                 elif message_method in ("SETACK", "GETACK"):
                     if not self._loop.is_closed():
-                        self._loop.call_soon_threadsafe(
-                            _handle_future, future, message, None
-                        )  # future.set_exception
+                        self._ingestion_queue.put((future, message, None), droppable=False)
                     else:
                         _LOGGER.warning("Could not return message %s to caller as the event loop has been closed already", message)
                 else:
@@ -654,7 +1067,6 @@ class MerossManager(object):
                         f"Unhandled message method {message_method}. Please report it to the developer."
                         f"raw_msg: {msg}"
                     )
-                del self._pending_messages_futures[message_id]
         # Check case 3: PUSH notification.
         # Again, here we don't check the source topic, we trust that's legitimate.
         elif (
@@ -674,13 +1086,12 @@ class MerossManager(object):
                 _LOGGER.error(
                     "Push notification parsing failed. That message won't be dispatched."
                 )
-            else:
-                asyncio.run_coroutine_threadsafe(
-                    self._handle_and_dispatch_push_notification(
-                        parsed_push_notification
-                    ),
-                    loop=self._loop,
-                )
+            elif self._loop.is_closed():
+                _LOGGER.warning("Could not dispatch push notification %s as the event loop has been closed already",
+                                parsed_push_notification)
+            elif not self._ingestion_queue.put(parsed_push_notification):
+                _LOGGER.warning("Ingestion queue is full: push notification %s has been discarded",
+                                parsed_push_notification)
         else:
             _LOGGER.warning(
                 f"The current implementation of this library does not handle messages received on topic "
@@ -689,6 +1100,15 @@ class MerossManager(object):
                 "works. Contact the developer if that happens!"
             )
 
+    def _on_ingested_message(self, item) -> None:
+        # Runs within the event loop, for every message handed over by the paho-mqtt thread
+        if isinstance(item, GenericPushNotification):
+            self._push_dispatcher.submit(item.originating_device_uuid, self._handle_and_dispatch_push_notification,
+                                         item)
+        else:
+            future, result, error = item
+            _handle_future(future, result, error)
+
     async def _async_dispatch_push_notification(
             self, push_notification: GenericPushNotification
     ) -> bool:
@@ -749,9 +1169,21 @@ class MerossManager(object):
                 self._device_registry.relinquish_device(
                     device_internal_id=d.internal_id
                 )
+            self._state_fingerprints.forget(push_notification.originating_device_uuid)
+            if self._device_snapshot is not None:
+                self._device_snapshot.remove(push_notification.originating_device_uuid)
+                self._save_device_snapshot()
             return True
         return False
 
+    def _invalidate_cached_responses(self, push_notification: GenericPushNotification) -> None:
+        device_uuid = push_notification.originating_device_uuid
+        if isinstance(push_notification, (OnlinePushNotification, UnbindPushNotification)):
+            # The device went offline/online or has been unbound: nothing we cached can be trusted anymore.
+            self._response_cache.invalidate(device_uuid=device_uuid)
+        else:
+            self._response_cache.invalidate(device_uuid=device_uuid, namespace=push_notification.namespace)
+
     async def _handle_and_dispatch_push_notification(
             self, push_notification: GenericPushNotification
     ) -> None:
@@ -762,22 +1194,46 @@ class MerossManager(object):
         :param push_notification:
         :return:
         """
-        # Dispatching
-        handled_device = await self._async_dispatch_push_notification(
-            push_notification=push_notification
-        )
+        # Any cached response for the same device and namespace is now outdated
+        self._invalidate_cached_responses(push_notification)
+        if self._circuit_breaker is not None and isinstance(push_notification, OnlinePushNotification):
+            try:
+                status = OnlineStatus(push_notification.status)
+            except ValueError:
+                status = OnlineStatus.UNKNOWN
+            self._circuit_breaker.notify_online_status(device_uuid=push_notification.originating_device_uuid,
+                                                       status=status)
+
+        # Dispatching, unless the notification would not change the device state
+        state_change = self._state_fingerprints.check(push_notification)
+        suppressed = self._state_fingerprints.suppress_unchanged and state_change.suppressible
+        if suppressed:
+            _LOGGER.debug(f"Push notification {push_notification.namespace} of "
+                          f"{push_notification.originating_device_uuid} is unchanged: skipping its dispatching")
+            handled_device = True
+        else:
+            handled_device = await self._async_dispatch_push_notification(
+                push_notification=push_notification
+            )
 
         # Notify any listener that registered explicitly to push_notification
         target_devs = self._device_registry.find_all_by(
             device_uuids=(push_notification.originating_device_uuid,)
         )
 
-        for handler in self._push_coros:
-            try:
-                await handler(push_notification, target_devs, self)
-            except Exception as e:
-                _LOGGER.exception(f"Uncaught error occurred while executing push notification "
-                                  f"handler {handler} for {push_notification}")
+        # Event streams only buffer the notification, so they never wait for their consumers
+        for subscription in self._event_streams.match(push_notification, target_devs):
+            if state_change.changed or not subscription.changes_only:
+                subscription.handler(push_notification)
+
+        args = (push_notification, target_devs, self)
+        calls = [(handler, args, {}) for handler in self._push_coros]
+        for subscription in self._push_subscriptions.match(push_notification, target_devs):
+            if not subscription.changes_only:
+                calls.append((subscription.handler, args, {}))
+            elif state_change.changed:
+                calls.append((subscription.handler, args, {"state_change": state_change}))
+        await self._push_dispatcher.async_run_handlers(calls)
 
         # Handling post-dispatching
         handled_post = await self._async_handle_push_notification_post_dispatching(
@@ -798,8 +1254,11 @@ class MerossManager(object):
             method: str,
             namespace: Union[Namespace, str],
             payload: dict,
-            timeout: float = DEFAULT_COMMAND_TIMEOUT,
-            override_transport_mode: TransportMode = None
+            timeout: Optional[float] = None,
+            override_transport_mode: TransportMode = None,
+            drop_on_overquota: Optional[bool] = None,
+            max_age: Optional[float] = None,
+            replay_safe: bool = False
     ):
         """
         This method sends a command to the device, locally via HTTP or via the MQTT Meross broker.
@@ -810,14 +1269,115 @@ class MerossManager(object):
         :param method: Can be GET/SET
         :param namespace: Command namespace
         :param payload: A dict containing the payload to be sent
-        :param timeout: Maximum time interval in seconds to wait for the command-answer
+        :param timeout: Maximum time interval in seconds to wait for the command-answer. When None, the timeout is
+                        derived from the adaptive timeouts of the manager, if any, or defaults to
+                        DEFAULT_COMMAND_TIMEOUT.
         :param override_transport_mode: when set, overrides the manager transport mode
+        :param drop_on_overquota: when set, overrides the rate limiter policy for this command. True drops the
+                                  command if over quota, False delays it.
+        :param max_age: when set, a cached response to an identical GET command is returned, provided that it is
+                        not older than max_age seconds. Only namespaces configured in the response cache are cached.
+        :param replay_safe: when set, the command can safely be sent again after a connection drop, as GET commands
+                            are. Only relevant when the manager replays commands on reconnection.
         :return:
         """
 
+        namespace_val = namespace.value if isinstance(namespace, Namespace) else namespace
+        cmd_kwargs = dict(mqtt_hostname=mqtt_hostname,
+                          mqtt_port=mqtt_port,
+                          destination_device_uuid=destination_device_uuid,
+                          method=method,
+                          namespace=namespace,
+                          payload=payload,
+                          timeout=timeout,
+                          override_transport_mode=override_transport_mode,
+                          drop_on_overquota=drop_on_overquota,
+                          replay_safe=replay_safe)
+
+        if method.upper() != "GET":
+            result = await self._async_execute_guarded_cmd(**cmd_kwargs)
+            if result is not None and method.upper() == "SET":
+                # The device state for this namespace has changed: drop any cached response
+                self._response_cache.invalidate(device_uuid=destination_device_uuid, namespace=namespace_val)
+            return result
+
+        if max_age is not None:
+            cached = self._response_cache.get(device_uuid=destination_device_uuid, namespace=namespace_val,
+                                              payload=payload, max_age=max_age)
+            if cached is not None:
+                _LOGGER.debug("Serving %s-%s command to %s from cache", method, namespace_val, destination_device_uuid)
+                return cached
+
+        if not self._coalesce_get_commands:
+            return await self._async_execute_get_cmd(**cmd_kwargs)
+
+        # Identical GETs issued concurrently to the same device share a single in-flight request
+        key = (destination_device_uuid, namespace_val, json.dumps(payload, sort_keys=True))
+        if self._get_single_flight.is_in_flight(key):
+            _LOGGER.debug("Coalescing %s-%s command to %s with the one already in flight", method, namespace_val,
+                          destination_device_uuid)
+            self._api_counter.notify_coalesced_call(device_uuid=destination_device_uuid, namespace=namespace_val,
+                                                    method=method)
+        try:
+            return await self._get_single_flight.async_do(key=key,
+                                                          coro_factory=lambda: self._async_execute_get_cmd(**cmd_kwargs),
+                                                          timeout=timeout)
+        except TimeoutError:
+            # Only raised to callers that gave up waiting for an in-flight command issued by someone else
+            raise CommandTimeoutError(message=f"{method} {namespace_val}", target_device_uuid=destination_device_uuid,
+                                      timeout=timeout)
+
+    async def _async_execute_get_cmd(self, destination_device_uuid: str, namespace: Union[Namespace, str],
+                                     payload: dict, **kwargs):
+        issued_at = monotonic()
+        result = await self._async_execute_guarded_cmd(destination_device_uuid=destination_device_uuid, namespace=namespace,
+                                               payload=payload, **kwargs)
+        self._response_cache.put(device_uuid=destination_device_uuid, namespace=namespace, payload=payload,
+                                 response=result, issued_at=issued_at)
+        return result
+
+    async def _async_execute_guarded_cmd(self, destination_device_uuid: str, **kwargs):
+        breaker = self._circuit_breaker
+        if breaker is None:
+            return await self._async_execute_cmd(destination_device_uuid=destination_device_uuid, **kwargs)
+
+        # Raises CircuitOpenError when the device is known to be unreachable
+        breaker.before_call(destination_device_uuid)
+        try:
+            result = await self._async_execute_cmd(destination_device_uuid=destination_device_uuid, **kwargs)
+        except CommandTimeoutError:
+            breaker.notify_failure(destination_device_uuid)
+            raise
+        except CommandError:
+            # The device answered, although with an error
+            breaker.notify_success(destination_device_uuid)
+            raise
+        except BaseException:
+            breaker.notify_aborted(destination_device_uuid)
+            raise
+        if result is None:
+            # The command was dropped by the rate limiter and never reached the device
+            breaker.notify_aborted(destination_device_uuid)
+        else:
+            breaker.notify_success(destination_device_uuid)
+        return result
+
+    async def _async_execute_cmd(
+            self,
+            mqtt_hostname: str,
+            mqtt_port: int,
+            destination_device_uuid: str,
+            method: str,
+            namespace: Union[Namespace, str],
+            payload: dict,
+            timeout: Optional[float],
+            override_transport_mode: Optional[TransportMode],
+            drop_on_overquota: Optional[bool],
+            replay_safe: bool = False
+    ):
         # Only attempt local http communication if enabled via configuration.
         transport_mode = override_transport_mode if override_transport_mode is not None else self._default_transport_mode
-        attempt_lan = transport_mode == TransportMode.LAN_HTTP_FIRST or transport_mode == TransportMode.LAN_HTTP_FIRST_ONLY_GET and method.upper() == 'GET'
+        attempt_lan = transport_mode in (TransportMode.LAN_HTTP_FIRST, TransportMode.AUTO, TransportMode.HEDGED) or transport_mode == TransportMode.LAN_HTTP_FIRST_ONLY_GET and method.upper() == 'GET'
         if attempt_lan:
             # Check if the LocalIP is available for the given device
             device = self._device_registry.lookup_base_by_uuid(destination_device_uuid)
@@ -830,15 +1390,102 @@ class MerossManager(object):
             elif self._error_budget_manager.is_out_of_budget(destination_device_uuid):
                 _LOGGER.debug("Cannot issue command via LAN (http) against device with uuid %s as the device has no more error budget left.", destination_device_uuid)
                 attempt_lan = False
+            if transport_mode == TransportMode.AUTO:
+                selection = self._transport_selector.select(destination_device_uuid, lan_available=attempt_lan)
+                attempt_lan = selection.transport == Transport.LAN_HTTP
+            if attempt_lan and transport_mode == TransportMode.HEDGED and method.upper() == 'GET':
+                # Only GET commands are idempotent, hence safe to be sent twice
+                return await self._async_execute_hedged_cmd(device_ip=device.lan_ip,
+                                                             mqtt_hostname=mqtt_hostname,
+                                                             mqtt_port=mqtt_port,
+                                                             destination_device_uuid=destination_device_uuid,
+                                                             method=method,
+                                                             namespace=namespace,
+                                                             payload=payload,
+                                                             timeout=timeout,
+                                                             drop_on_overquota=drop_on_overquota,
+                                                             replay_safe=replay_safe)
             if attempt_lan:
                 try:
                     # In case we succeed here, return the data we got.
                     # Otherwise, try again with MQTT.
-                    _LOGGER.debug("Sending %s-%s command via HTTP to %s via %s", method, str(namespace), destination_device_uuid, device.lan_ip)
-                    return await self._async_execute_cmd_http(device_ip=device.lan_ip,destination_device_uuid=destination_device_uuid,method=method,namespace=namespace,payload=payload,timeout=min(timeout, 1.0))
+                    return await self._async_execute_lan_cmd(device_ip=device.lan_ip,
+                                                             destination_device_uuid=destination_device_uuid,
+                                                             method=method,
+                                                             namespace=namespace,
+                                                             payload=payload,
+                                                             timeout=timeout)
                 except Exception as e:
                     _LOGGER.exception("An error occurred while attempting to send a message over internal LAN to device %s. Retrying with MQTT transport.", destination_device_uuid)
-                    self._error_budget_manager.notify_error(destination_device_uuid)
+
+        return await self._async_execute_mqtt_cmd(mqtt_hostname=mqtt_hostname,
+                                                  mqtt_port=mqtt_port,
+                                                  destination_device_uuid=destination_device_uuid,
+                                                  method=method,
+                                                  namespace=namespace,
+                                                  payload=payload,
+                                                  timeout=timeout,
+                                                  drop_on_overquota=drop_on_overquota,
+                                                  replay_safe=replay_safe)
+
+    async def _async_execute_lan_cmd(self,
+                                     device_ip: str,
+                                     destination_device_uuid: str,
+                                     method: str,
+                                     namespace: Union[Namespace, str],
+                                     payload: dict,
+                                     timeout: Optional[float]):
+        _LOGGER.debug("Sending %s-%s command via HTTP to %s via %s", method, str(namespace), destination_device_uuid, device_ip)
+        lan_timeout = self._get_command_timeout(destination_device_uuid, Transport.LAN_HTTP, timeout)
+        start = monotonic()
+        try:
+            result = await self._async_execute_cmd_http(device_ip=device_ip,destination_device_uuid=destination_device_uuid,method=method,namespace=namespace,payload=payload,timeout=lan_timeout)
+        except asyncio.CancelledError:
+            # Cancellations (e.g. of the slower leg of a hedged command) are not LAN errors. Python 3.7 still
+            # derives CancelledError from Exception.
+            raise
+        except Exception as e:
+            self._notify_transport_failure(destination_device_uuid, Transport.LAN_HTTP,
+                                           timed_out=isinstance(e, TimeoutError))
+            self._error_budget_manager.notify_error(destination_device_uuid)
+            raise
+        self._notify_transport_success(destination_device_uuid, Transport.LAN_HTTP, monotonic() - start)
+        return result
+
+    async def _async_execute_mqtt_cmd(self,
+                                      mqtt_hostname: str,
+                                      mqtt_port: int,
+                                      destination_device_uuid: str,
+                                      method: str,
+                                      namespace: Union[Namespace, str],
+                                      payload: dict,
+                                      timeout: Optional[float],
+                                      drop_on_overquota: Optional[bool],
+                                      replay_safe: bool = False):
+        # Enforce the rate limits on the traffic sent to the MQTT broker
+        if drop_on_overquota is None:
+            drop_on_overquota = drop_on_overquota_var.get()
+        policy, delay = self._rate_limiter.check_limits(device_uuid=destination_device_uuid,
+                                                        drop_on_overquota=drop_on_overquota)
+        if policy is not None:
+            namespace_val = namespace.value if isinstance(namespace, Namespace) else namespace
+            if policy == OverLimitPolicy.DELAY:
+                _LOGGER.debug("Rate limit exceeded: delaying %s-%s command to %s by %.3fs", method, namespace_val,
+                              destination_device_uuid, delay)
+                self._api_counter.notify_delayed_call(device_uuid=destination_device_uuid, namespace=namespace_val,
+                                                      method=method)
+                await asyncio.sleep(delay)
+            elif policy == OverLimitPolicy.DROP:
+                _LOGGER.warning("Rate limit exceeded: dropping %s-%s command to %s", method, namespace_val,
+                                destination_device_uuid)
+                self._api_counter.notify_dropped_call(device_uuid=destination_device_uuid, namespace=namespace_val,
+                                                      method=method)
+                return None
+            else:
+                self._api_counter.notify_dropped_call(device_uuid=destination_device_uuid, namespace=namespace_val,
+                                                      method=method)
+                raise RateLimitExceeded(target_device_uuid=destination_device_uuid, namespace=namespace_val,
+                                        method=method)
 
         # Retrieve the mqtt client for the given domain:port broker
         if self._override_mqtt_server is not None:
@@ -854,7 +1501,106 @@ class MerossManager(object):
                                                    method=method,
                                                    namespace=namespace,
                                                    payload=payload,
-                                                   timeout=timeout)
+                                                   timeout=self._get_command_timeout(destination_device_uuid,
+                                                                                     Transport.MQTT, timeout),
+                                                   replay_safe=replay_safe)
+
+    async def _async_execute_hedged_cmd(self,
+                                        device_ip: str,
+                                        mqtt_hostname: str,
+                                        mqtt_port: int,
+                                        destination_device_uuid: str,
+                                        method: str,
+                                        namespace: Union[Namespace, str],
+                                        payload: dict,
+                                        timeout: Optional[float],
+                                        drop_on_overquota: Optional[bool],
+                                        replay_safe: bool = False):
+        """
+        Sends the command over LAN and, unless the device answers within the hedge delay, over MQTT as well.
+        The first successful answer is returned, while the other request is cancelled.
+        """
+        self._hedging_stats.commands += 1
+        lan_task = asyncio.ensure_future(self._async_execute_lan_cmd(device_ip=device_ip,
+                                                                     destination_device_uuid=destination_device_uuid,
+                                                                     method=method,
+                                                                     namespace=namespace,
+                                                                     payload=payload,
+                                                                     timeout=timeout))
+        mqtt_task = None
+        try:
+            await asyncio.wait({lan_task}, timeout=self._get_hedge_delay(destination_device_uuid))
+            if lan_task.done() and lan_task.exception() is None:
+                self._hedging_stats.lan_wins += 1
+                return lan_task.result()
+
+            _LOGGER.debug("No LAN answer from device %s within the hedge delay: sending the command via MQTT too",
+                          destination_device_uuid)
+            self._hedging_stats.hedges_sent += 1
+            mqtt_task = asyncio.ensure_future(self._async_execute_mqtt_cmd(mqtt_hostname=mqtt_hostname,
+                                                                           mqtt_port=mqtt_port,
+                                                                           destination_device_uuid=destination_device_uuid,
+                                                                           method=method,
+                                                                           namespace=namespace,
+                                                                           payload=payload,
+                                                                           timeout=timeout,
+                                                                           drop_on_overquota=drop_on_overquota,
+                                                                           replay_safe=replay_safe))
+            pending = {mqtt_task} if lan_task.done() else {lan_task, mqtt_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        continue
+                    # A command dropped by the rate limiter only wins when there is nothing else to wait for
+                    if task is mqtt_task and task.result() is None and pending:
+                        continue
+                    if task is lan_task:
+                        self._hedging_stats.lan_wins += 1
+                    else:
+                        self._hedging_stats.mqtt_wins += 1
+                    return task.result()
+            # Both the requests failed: report the MQTT error, as the LAN one is a mere optimization
+            return mqtt_task.result()
+        finally:
+            for task in (lan_task, mqtt_task):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Mark the exception of the loser as retrieved
+                    task.exception()
+
+    def _get_hedge_delay(self, device_uuid: str) -> float:
+        if self._hedge_delay is not None:
+            return self._hedge_delay
+        p90 = self._transport_selector.get_stats(device_uuid, Transport.LAN_HTTP).get_latency_percentile(90)
+        return p90 if p90 is not None else _DEFAULT_HEDGE_DELAY
+
+    def _get_command_timeout(self, device_uuid: str, transport: Transport, timeout: Optional[float]) -> float:
+        """
+        Returns the effective timeout of a command sent to the given device over the given transport.
+        An explicit timeout always applies to MQTT commands, while LAN attempts are capped by the LAN timeout, so
+        that there is time left for the MQTT fallback.
+        """
+        if self._adaptive_timeouts is None:
+            timeout = DEFAULT_COMMAND_TIMEOUT if timeout is None else timeout
+            return min(timeout, 1.0) if transport == Transport.LAN_HTTP else timeout
+        adaptive_timeout = self._adaptive_timeouts.get_timeout(device_uuid, transport)
+        if timeout is None:
+            return adaptive_timeout
+        return min(timeout, adaptive_timeout) if transport == Transport.LAN_HTTP else timeout
+
+    def _notify_transport_success(self, device_uuid: str, transport: Transport, rtt: float) -> None:
+        if self._adaptive_timeouts is not None:
+            self._adaptive_timeouts.notify_rtt(device_uuid, transport, rtt)
+        self._transport_selector.notify_success(device_uuid, transport, rtt)
+
+    def _notify_transport_failure(self, device_uuid: str, transport: Transport, timed_out: bool) -> None:
+        if timed_out and self._adaptive_timeouts is not None:
+            self._adaptive_timeouts.notify_timeout(device_uuid, transport)
+        self._transport_selector.notify_failure(device_uuid, transport)
 
     async def _async_execute_cmd_http(self,
                                       device_ip: str,
@@ -868,26 +1614,27 @@ class MerossManager(object):
         message, message_id = self._build_mqtt_message(method, namespace, payload, destination_device_uuid)
         device: BaseDevice = self._device_registry.lookup_base_by_uuid(destination_device_uuid)
 
-        async with ClientSession() as session:
-            message_data = message_id
-            decrypt_response = False
-            if device.support_encryption():
-                # Ensure we have correctly set the encryption key. If not, set it right away
-                if not device.is_encryption_key_set():
-                    device.set_encryption_key(uuid=device.uuid, mrskey=self._cloud_creds.key, mac=device.mac_address)
-                # Encrypt the data
-                message_data = device.encrypt(message)
-                decrypt_response = True
+        message_data = message
+        decrypt_response = False
+        if device.support_encryption():
+            # Ensure we have correctly set the encryption key. If not, set it right away
+            if not device.is_encryption_key_set():
+                device.set_encryption_key(uuid=device.uuid, mrskey=self._cloud_creds.key, mac=device.mac_address)
+            # Encrypt the data
+            message_data = device.encrypt_bytes(message)
+            decrypt_response = True
 
-            async with session.post(f"http://{device_ip}/config", data=message_data, timeout=timeout, headers=_DEFAULT_HEADERS) as response:
-                response_data = await response.text("utf8")
+        # Only GETs are sent again when the device drops the connection: it might have already applied a SET
+        response_data = await self._lan_transport.async_post_raw(device_ip=device_ip, data=message_data,
+                                                                 timeout=timeout,
+                                                                 idempotent=method.upper() == "GET")
 
-            if decrypt_response:
-                response_data = device.decrypt(response_data.encode("utf8")).decode("utf8")
-                response_data = response_data.rstrip('\0')
+        if decrypt_response:
+            # Decrypted responses are zero padded
+            response_data = device.decrypt(response_data).rstrip(b'\0')
 
-            data = json.loads(response_data)
-            return data.get("payload")
+        data = json.loads(response_data)
+        return data.get("payload")
 
     async def async_execute_cmd_client(self,
                                        client: mqtt.Client,
@@ -895,34 +1642,81 @@ class MerossManager(object):
                                        method: str,
                                        namespace: Namespace,
                                        payload: dict,
-                                       timeout: float = 10.0):
-        # Send the message over the network
-        # Build the mqtt message we will send to the broker
-        message, message_id = self._build_mqtt_message(method, namespace, payload, destination_device_uuid)
-
-        # Create a future and perform the send/waiting to a task
-        fut = self._loop.create_future()
-        self._pending_messages_futures[message_id] = fut
-        response = await self._async_send_and_wait_ack(
-            client=client,
-            future=fut,
-            target_device_uuid=destination_device_uuid,
-            message=message,
-            timeout=timeout
-        )
-        return response.get("payload")
+                                       timeout: float = 10.0,
+                                      replay_safe: bool = False):
+        namespace_val = namespace.value if isinstance(namespace, Namespace) else namespace
+        self._api_counter.notify_api_call(device_uuid=destination_device_uuid, namespace=namespace_val, method=method)
+
+        domain, port = self._get_client_from_domain_port(client=client)
+        broker = _mqtt_key_from_domain_port(domain=domain, port=port) if domain is not None else None
+        replayable = self._replay_commands_on_reconnect and broker is not None and \
+            (method.upper() == "GET" or replay_safe)
+
+        while True:
+            # Send the message over the network
+            # Build the mqtt message we will send to the broker
+            message, message_id = self._build_mqtt_message(method, namespace, payload, destination_device_uuid)
+
+            # Create a future and perform the send/waiting to a task. The pending command table fails the future
+            # when the timeout expires, or when the connection to the broker drops.
+            fut = self._loop.create_future()
+            self._pending_commands.register(message_id=message_id, future=fut, timeout=timeout,
+                                            target_device_uuid=destination_device_uuid, method=method,
+                                            namespace=namespace_val, broker=broker)
+            try:
+                start = monotonic()
+                response = await self._async_send_and_wait_ack(
+                    client=client,
+                    future=fut,
+                    target_device_uuid=destination_device_uuid,
+                    message=message,
+                    timeout=timeout
+                )
+                self._notify_transport_success(destination_device_uuid, Transport.MQTT, monotonic() - start)
+                return response.get("payload")
+            except MqttConnectionLostError as e:
+                self._notify_transport_failure(destination_device_uuid, Transport.MQTT, timed_out=False)
+                if not replayable:
+                    raise
+                await self._async_wait_for_reconnection(broker=broker, error=e)
+                _LOGGER.info("Connection to %s restored, sending %s-%s command to %s again", broker, method,
+                             namespace_val, destination_device_uuid)
+                self._replayed_commands += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Same scope as the LAN failures, so that the transports are compared fairly
+                self._notify_transport_failure(destination_device_uuid, Transport.MQTT,
+                                               timed_out=isinstance(e, CommandTimeoutError))
+                raise
+            finally:
+                # Whatever happened (ACK, timeout, error or cancellation), the command is no longer in flight
+                self._pending_commands.discard(message_id)
+
+    async def _async_wait_for_reconnection(self, broker: str, error: MqttConnectionLostError) -> None:
+        conn_evt = self._mqtt_connected_and_subscribed.get(broker)  # type: asyncio.Event
+        if conn_evt is None:
+            raise error
+        _LOGGER.info("Parking command %s to %s until the connection to %s is restored", error.message,
+                     error.target_device_uuid, broker)
+        try:
+            await asyncio.wait_for(conn_evt.wait(), self._replay_ttl)
+        except TimeoutError:
+            _LOGGER.warning("Connection to %s was not restored within %.1fs: command %s to %s dropped", broker,
+                            self._replay_ttl, error.message, error.target_device_uuid)
+            raise error
 
     async def _async_send_and_wait_ack(
             self, client: mqtt.Client, future: Future, target_device_uuid: str, message: bytes, timeout: float,
     ):
         if not client.is_connected():
-            raise Exception("MQTT client not connected.")
+            raise MqttConnectionLostError(message="MQTT client not connected.", target_device_uuid=target_device_uuid)
 
         client.publish(
             topic=build_device_request_topic(target_device_uuid), payload=message
         )
         try:
-            return await asyncio.wait_for(future, timeout)
+            return await future
         except TimeoutError as e:
             domain, port = self._get_client_from_domain_port(client=client)
             _LOGGER.error(
@@ -938,10 +1732,11 @@ class MerossManager(object):
                 str(message), str(target_device_uuid), domain, port, e.error_payload)
             raise
 
-    async def _notify_connection_drop(self):
+    def _notify_connection_drop(self):
+        # The synthetic offline notifications go through the device lanes, after the pushes already queued there
         for d in self._device_registry.find_all_by():
             pushn = OnlinePushNotification(originating_device_uuid=d.uuid, raw_data={'online': {'status': -1}})
-            await self._handle_and_dispatch_push_notification(pushn)
+            self._push_dispatcher.submit(d.uuid, self._handle_and_dispatch_push_notification, pushn)
 
     def _build_mqtt_message(self, method: str, namespace: Union[Namespace, str], payload: dict, destination_device_uuid: str):
         """
@@ -952,48 +1747,9 @@ class MerossManager(object):
         :param payload:
         :param destination_device_uuid:
 
-        :return:
+        :return: the serialized message and its message id
         """
-
-        # Generate a random 16 byte string
-        randomstring = "".join(
-            random.SystemRandom().choice(string.ascii_uppercase + string.digits)
-            for _ in range(16)
-        )
-
-        # Hash it as md5
-        md5_hash = md5()
-        md5_hash.update(randomstring.encode("utf8"))
-        messageId = md5_hash.hexdigest().lower()
-        timestamp = int(round(time()))
-
-        # Hash the messageId, the key and the timestamp
-        md5_hash = md5()
-        strtohash = "%s%s%s" % (messageId, self._cloud_creds.key, timestamp)
-        md5_hash.update(strtohash.encode("utf8"))
-        signature = md5_hash.hexdigest().lower()
-
-        if not isinstance(namespace, Namespace) and not isinstance(namespace, str):
-            raise ValueError("Namespace parameter must be a Namespace enum or a string.")
-        namespace_val = namespace.value if isinstance(namespace, Namespace) else namespace
-
-        data = {
-            "header": {
-                "from": self._client_response_topic,
-                "messageId": messageId,  # Example: "122e3e47835fefcd8aaf22d13ce21859"
-                "method": method,  # Example: "GET",
-                "namespace": namespace_val,  # Example: "Appliance.System.All",
-                "payloadVersion": 1,
-                "sign": signature,  # Example: "b4236ac6fb399e70c3d61e98fcb68b74",
-                "timestamp": timestamp,
-                "triggerSrc": "Android",
-                "uuid": destination_device_uuid
-            },
-            "payload": payload,
-        }
-
-        strdata = json.dumps(data,separators=(',', ':'))
-        return strdata.encode("utf-8"), messageId
+        return self._message_builder.build(method, namespace, payload, destination_device_uuid)
 
     def set_proxy(self, proxy_type, proxy_addr, proxy_port):
         self._enable_proxy = True
@@ -1024,6 +1780,23 @@ class DeviceRegistry(object):
     def __init__(self):
         self._devices_by_internal_id = {}
 
+        # Secondary indexes. Every index bucket maps internal_id -> device, so that
+        # lookups, insertions and removals are O(1).
+        self._base_devices_by_uuid = {}
+        self._devices_by_uuid = {}
+        self._devices_by_type = {}
+        self._devices_by_name = {}
+        self._devices_by_online_status = {}
+        self._devices_by_class = {}
+
+        # Keeps track of the keys each device has been indexed with, so we can move it around when those change
+        self._indexed_keys = {}
+
+        # Enrollment sequence number of every device: lookups return the devices in enrollment order, whatever
+        # the order of the index buckets they have been collected from
+        self._enrollment_seq = itertools.count()
+        self._enrollment_order = {}
+
     def clear(self) -> None:
         """Clear all the registered devices"""
         ids = [devid for devid in self._devices_by_internal_id]
@@ -1058,7 +1831,10 @@ class DeviceRegistry(object):
         # Dismiss the device
         _LOGGER.debug(f"Disposing resources for {dev.name} ({dev.uuid})")
         dev.dismiss()
+        dev.remove_index_listener(self._on_device_index_changed)
+        self._unindex_device(dev)
         del self._devices_by_internal_id[device_internal_id]
+        del self._enrollment_order[device_internal_id]
         _LOGGER.info(f"Device {dev.name} ({dev.uuid}) removed from registry")
 
     def enroll_device(self, device: BaseDevice):
@@ -1072,23 +1848,91 @@ class DeviceRegistry(object):
                 f"Adding device {device.name} ({device.internal_id}) to registry."
             )
             self._devices_by_internal_id[device.internal_id] = device
+            self._enrollment_order[device.internal_id] = next(self._enrollment_seq)
+            self._index_device(device)
+            device.add_index_listener(self._on_device_index_changed)
+
+    def _on_device_index_changed(self, device: BaseDevice) -> None:
+        self._reindex_device(device)
+
+        # The online status of subdevices depends on the one of their hub
+        if isinstance(device, HubDevice):
+            for subdev in device.get_subdevices():
+                self._reindex_device(subdev)
+
+    @staticmethod
+    def _add_to_bucket(index: dict, key, device: BaseDevice) -> None:
+        bucket = index.get(key)
+        if bucket is None:
+            bucket = {}
+            index[key] = bucket
+        bucket[device.internal_id] = device
+
+    @staticmethod
+    def _remove_from_bucket(index: dict, key, device: BaseDevice) -> None:
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.pop(device.internal_id, None)
+        if len(bucket) == 0:
+            del index[key]
+
+    def _index_device(self, device: BaseDevice) -> None:
+        keys = (device.uuid, device.type, device.name, device.online_status)
+        self._indexed_keys[device.internal_id] = keys
+        uuid, dev_type, name, online_status = keys
+
+        if not isinstance(device, GenericSubDevice):
+            self._add_to_bucket(self._base_devices_by_uuid, uuid, device)
+        self._add_to_bucket(self._devices_by_uuid, uuid, device)
+        self._add_to_bucket(self._devices_by_type, dev_type, device)
+        self._add_to_bucket(self._devices_by_name, name, device)
+        self._add_to_bucket(self._devices_by_online_status, online_status, device)
+        for clazz in type(device).__mro__:
+            self._add_to_bucket(self._devices_by_class, clazz, device)
+
+    def _unindex_device(self, device: BaseDevice) -> None:
+        keys = self._indexed_keys.pop(device.internal_id, None)
+        if keys is None:
+            return
+        uuid, dev_type, name, online_status = keys
+
+        self._remove_from_bucket(self._base_devices_by_uuid, uuid, device)
+        self._remove_from_bucket(self._devices_by_uuid, uuid, device)
+        self._remove_from_bucket(self._devices_by_type, dev_type, device)
+        self._remove_from_bucket(self._devices_by_name, name, device)
+        self._remove_from_bucket(self._devices_by_online_status, online_status, device)
+        for clazz in type(device).__mro__:
+            self._remove_from_bucket(self._devices_by_class, clazz, device)
+
+    def _reindex_device(self, device: BaseDevice) -> None:
+        old_keys = self._indexed_keys.get(device.internal_id)
+        if old_keys is None:
+            # The device does not belong to this registry
+            return
+        if old_keys == (device.uuid, device.type, device.name, device.online_status):
+            return
+        self._unindex_device(device)
+        self._index_device(device)
 
     def lookup_by_id(self, device_id: str) -> Optional[BaseDevice]:
         return self._devices_by_internal_id.get(device_id)
 
     def lookup_base_by_uuid(self, device_uuid: str) -> Optional[BaseDevice]:
-        res = list(
-            filter(
-                lambda d: d.uuid == device_uuid and not isinstance(d, GenericSubDevice),
-                self._devices_by_internal_id.values(),
-            )
-        )
-        if len(res) > 1:
-            raise ValueError(f"Multiple devices found for device_uuid {device_uuid}")
-        elif len(res) == 1:
-            return res[0]
-        else:
+        bucket = self._base_devices_by_uuid.get(device_uuid)
+        if bucket is None:
             return None
+        if len(bucket) > 1:
+            raise ValueError(f"Multiple devices found for device_uuid {device_uuid}")
+        return next(iter(bucket.values()))
+
+    def _union_buckets(self, index: dict, keys: Tuple) -> dict:
+        if len(keys) == 1:
+            return index.get(keys[0], {})
+        res = {}
+        for k in keys:
+            res.update(index.get(k, {}))
+        return res
 
     def find_all_by(
             self,
@@ -1100,45 +1944,38 @@ class DeviceRegistry(object):
             online_status: Optional[OnlineStatus] = None,
             exclude_classes: Optional[Iterable[type]] = None
     ) -> List[BaseDevice]:
-
-        def filter_by_type(dev: Any):
-            for t in device_class:
-                if isinstance(dev, t):
-                    return True
-            return False
-
-        def filter_by_excluded_type(dev: Any):
-            for t in exclude_classes:
-                if isinstance(dev, t):
-                    return False
-            return True
-
-        # Look by Internal UUIDs
+        # Collect the index buckets matching every requested filter
+        candidates = []
         if internal_ids is not None:
-            res = filter(
-                lambda d: d.internal_id in internal_ids,
-                self._devices_by_internal_id.values(),
-            )
-        else:
-            res = self._devices_by_internal_id.values()
-
+            ids = (internal_ids,) if isinstance(internal_ids, str) else tuple(internal_ids)
+            candidates.append({i: self._devices_by_internal_id[i] for i in ids if i in self._devices_by_internal_id})
         if device_uuids is not None:
-            res = filter(lambda d: d.uuid in device_uuids, res)
+            uuids = (device_uuids,) if isinstance(device_uuids, str) else tuple(device_uuids)
+            candidates.append(self._union_buckets(self._devices_by_uuid, uuids))
         if device_type is not None:
-            res = filter(lambda d: d.type == device_type, res)
+            candidates.append(self._devices_by_type.get(device_type, {}))
         if online_status is not None:
-            res = filter(lambda d: d.online_status == online_status, res)
+            candidates.append(self._devices_by_online_status.get(online_status, {}))
         if device_class is not None:
-            if isinstance(device_class, type):
-                res = filter(lambda d: isinstance(d, device_class), res)
-            elif isinstance(device_class, Iterable):
-                res = filter(filter_by_type, res)
+            classes = (device_class,) if isinstance(device_class, type) else tuple(device_class)
+            candidates.append(self._union_buckets(self._devices_by_class, classes))
         if device_name is not None:
-            res = filter(lambda d: d.name == device_name, res)
+            candidates.append(self._devices_by_name.get(device_name, {}))
+
+        # Logical AND: scan the smallest bucket and probe the others
+        if len(candidates) == 0:
+            res = list(self._devices_by_internal_id.values())
+        else:
+            candidates.sort(key=len)
+            smallest, others = candidates[0], candidates[1:]
+            res = [d for devid, d in smallest.items() if all(devid in o for o in others)]
+            res.sort(key=lambda d: self._enrollment_order[d.internal_id])
+
         if exclude_classes is not None:
-            res = filter(filter_by_excluded_type, res)
+            excluded = self._union_buckets(self._devices_by_class, tuple(exclude_classes))
+            res = [d for d in res if d.internal_id not in excluded]
 
-        return list(res)
+        return res
 
 
 def _handle_future(future: Future, result: object, exception: Exception):
@@ -15,6 +15,21 @@ class MqttError(Exception):
         self._message = message
 
 
+class MqttConnectionLostError(MqttError):
+    def __init__(self, message: str, target_device_uuid: str):
+        super().__init__(message=message)
+        self.message = message
+        self.target_device_uuid = target_device_uuid
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, target_device_uuid: str, reason: str, retry_after: float):
+        super().__init__(f"Circuit of device {target_device_uuid} is open ({reason}): command was not sent")
+        self.target_device_uuid = target_device_uuid
+        self.reason = reason
+        self.retry_after = retry_after
+
+
 class CommandError(Exception):
     def __init__(self, error_payload: dict):
         super().__init__()
@@ -22,4 +37,12 @@ class CommandError(Exception):
 
 
 class UnknownDeviceType(Exception):
-    pass
\ No newline at end of file
+    pass
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, target_device_uuid: str, namespace: str, method: str):
+        super().__init__(f"Rate limit exceeded: {method} {namespace} to device {target_device_uuid} was not sent")
+        self.target_device_uuid = target_device_uuid
+        self.namespace = namespace
+        self.method = method
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import ssl
+from asyncio import AbstractEventLoop
+from enum import Enum
+from typing import Optional
+
+import paho.mqtt.client as mqtt
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MqttTransportMode(Enum):
+    """
+    Describes how the MQTT clients of the manager perform their network I/O
+    """
+    THREADED = 0  # Every client runs its own paho-mqtt network thread (default)
+    ASYNCIO = 1  # The client sockets are driven by the asyncio event loop, no additional thread is spawned
+
+
+class AsyncioMqttLoopAdapter(object):
+    """
+    Drives a paho-mqtt client from the asyncio event loop, in place of the paho-mqtt network thread.
+    The client socket is watched via loop.add_reader()/loop.add_writer(), while keep-alive and
+    reconnections are handled by a periodic timer. As a result, every paho-mqtt callback runs within the event loop.
+    """
+    def __init__(self,
+                 client: mqtt.Client,
+                 loop: AbstractEventLoop,
+                 auto_reconnect: bool = True,
+                 misc_interval: float = 1.0,
+                 reconnect_min_delay: float = 1.0,
+                 reconnect_max_delay: float = 120.0):
+        """
+        Constructor
+        :param client: paho-mqtt client to drive. Its socket callbacks are overridden by the adapter.
+        :param loop: event loop driving the client
+        :param auto_reconnect: when True, the adapter reconnects the client when the connection drops
+        :param misc_interval: interval, in seconds, of the timer handling keep-alive and reconnections
+        :param reconnect_min_delay: minimum delay, in seconds, between reconnection attempts
+        :param reconnect_max_delay: maximum delay, in seconds, between reconnection attempts
+        """
+        self._client = client
+        self._loop = loop
+        self._auto_reconnect = auto_reconnect
+        self._misc_interval = misc_interval
+        self._reconnect_min_delay = reconnect_min_delay
+        self._reconnect_max_delay = reconnect_max_delay
+        self._reconnect_delay = reconnect_min_delay
+        self._next_reconnect_at = 0.0
+
+        self._fd: Optional[int] = None
+        self._misc_timer: Optional[asyncio.TimerHandle] = None
+        self._connect_future: Optional[asyncio.Future] = None
+        self._stopped = False
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    @property
+    def client(self) -> mqtt.Client:
+        return self._client
+
+    async def async_connect(self, host: str, port: int, keepalive: int = 60) -> None:
+        """
+        Connects the client to the broker. The blocking part of the connection (name resolution, TCP and TLS
+        handshakes) runs in the default executor. Concurrent invocations share the same connection attempt, while
+        the invocation is a no-op when the client socket is open already.
+        :param host: broker hostname
+        :param port: broker port
+        :param keepalive: MQTT keep-alive interval, in seconds
+        """
+        self._stopped = False
+        if self._connect_future is None:
+            if self._client.socket() is not None:
+                return
+            self._connect_future = self._loop.run_in_executor(None, self._client.connect, host, port, keepalive)
+        future = self._connect_future
+        try:
+            await asyncio.shield(future)
+        finally:
+            if future.done() and self._connect_future is future:
+                self._connect_future = None
+        self._schedule_misc()
+
+    def stop(self) -> None:
+        """
+        Disconnects the client and stops driving it. Reconnections are no longer attempted.
+        """
+        self._stopped = True
+        if self._misc_timer is not None:
+            self._misc_timer.cancel()
+            self._misc_timer = None
+        self._client.disconnect()
+        # Try to flush the DISCONNECT packet right away, as the loop might be stopped shortly
+        if self._client.want_write():
+            self._client.loop_write()
+
+    def _call_in_loop(self, func, *args) -> None:
+        # paho-mqtt invokes the socket callbacks from the executor thread while connecting
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            func(*args)
+        else:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _on_socket_open(self, client, userdata, sock) -> None:
+        self._call_in_loop(self._register_socket, sock.fileno(), sock)
+
+    def _on_socket_close(self, client, userdata, sock) -> None:
+        # The socket is closed right after this callback returns: rely on the fd number, which is still valid
+        self._call_in_loop(self._unregister_socket, sock.fileno())
+
+    def _on_socket_register_write(self, client, userdata, sock) -> None:
+        self._call_in_loop(self._register_write, sock.fileno())
+
+    def _on_socket_unregister_write(self, client, userdata, sock) -> None:
+        self._call_in_loop(self._unregister_write, sock.fileno())
+
+    def _register_socket(self, fd: int, sock) -> None:
+        self._fd = fd
+        self._loop.add_reader(fd, self._on_readable, sock)
+        self._schedule_misc()
+
+    def _unregister_socket(self, fd: int) -> None:
+        self._loop.remove_reader(fd)
+        self._loop.remove_writer(fd)
+        if self._fd == fd:
+            self._fd = None
+
+    def _register_write(self, fd: int) -> None:
+        # The socket is writable most of the times: rather than watching it, flush the outgoing packets as soon as
+        # the loop gets control back (paho-mqtt must not write from within its own callbacks), and only watch the
+        # socket when they could not be sent entirely.
+        if fd == self._fd:
+            self._loop.call_soon(self._flush, fd)
+
+    def _flush(self, fd: int) -> None:
+        if fd != self._fd:
+            return
+        self._client.loop_write()
+        if self._fd == fd and self._client.want_write():
+            self._loop.add_writer(fd, self._client.loop_write)
+
+    def _unregister_write(self, fd: int) -> None:
+        if fd == self._fd:
+            self._loop.remove_writer(fd)
+
+    def _on_readable(self, sock) -> None:
+        rc = self._client.loop_read()
+        # TLS sockets may hold already decrypted records the selector is not aware of: consume them as well
+        while rc == mqtt.MQTT_ERR_SUCCESS and isinstance(sock, ssl.SSLSocket) and \
+                self._client.socket() is sock and sock.pending() > 0:
+            rc = self._client.loop_read()
+
+    def _schedule_misc(self) -> None:
+        if self._misc_timer is None and not self._stopped:
+            self._misc_timer = self._loop.call_later(self._misc_interval, self._on_misc_timer)
+
+    def _on_misc_timer(self) -> None:
+        self._misc_timer = None
+        if self._stopped:
+            return
+        rc = self._client.loop_misc()
+        if rc != mqtt.MQTT_ERR_SUCCESS and self._auto_reconnect and self._connect_future is None and \
+                self._loop.time() >= self._next_reconnect_at:
+            self._reconnect()
+        self._schedule_misc()
+
+    def _reconnect(self) -> None:
+        _LOGGER.info("MQTT connection lost, reconnecting...")
+        future = self._loop.run_in_executor(None, self._client.reconnect)
+        self._connect_future = future
+
+        def _on_done(f: asyncio.Future) -> None:
+            if self._connect_future is f:
+                self._connect_future = None
+            if f.cancelled() or f.exception() is not None:
+                _LOGGER.warning("MQTT reconnection failed, retrying in %.1fs: %s",
+                                self._reconnect_delay, None if f.cancelled() else f.exception())
+                self._next_reconnect_at = self._loop.time() + self._reconnect_delay
+                self._reconnect_delay = min(self._reconnect_delay * 2, self._reconnect_max_delay)
+            else:
+                self._reconnect_delay = self._reconnect_min_delay
+
+        future.add_done_callback(_on_done)
@@ -0,0 +1,193 @@
+import itertools
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.generic import GenericPushNotification
+
+
+def _namespace_value(namespace: Union[Namespace, str]) -> str:
+    return namespace.value if isinstance(namespace, Namespace) else namespace
+
+
+def _as_frozenset(values, normalize=None) -> Optional[FrozenSet]:
+    if values is None:
+        return None
+    if isinstance(values, (str, Namespace, type)):
+        values = (values,)
+    return frozenset(normalize(v) if normalize is not None else v for v in values)
+
+
+class PushSubscription(object):
+    """
+    A push notification handler, along with the filters restricting the notifications it receives.
+    Every filter left to None matches anything; filters are ANDed together.
+    """
+    def __init__(self,
+                 subscription_id: int,
+                 handler: Callable[..., Awaitable],
+                 namespaces: Optional[FrozenSet[str]],
+                 device_uuids: Optional[FrozenSet[str]],
+                 device_types: Optional[FrozenSet[str]],
+                 device_classes: Optional[FrozenSet[type]],
+                 changes_only: bool = False):
+        self.subscription_id = subscription_id
+        self.handler = handler
+        self.namespaces = namespaces
+        self.device_uuids = device_uuids
+        self.device_types = device_types
+        self.device_classes = device_classes
+        self.changes_only = changes_only
+        self.active = True
+
+    def matches(self, namespace: str, device_uuid: str, target_devices: List) -> bool:
+        if self.namespaces is not None and namespace not in self.namespaces:
+            return False
+        if self.device_uuids is not None and device_uuid not in self.device_uuids:
+            return False
+        if self.device_types is not None and not any(d.type in self.device_types for d in target_devices):
+            return False
+        if self.device_classes is not None and \
+                not any(isinstance(d, tuple(self.device_classes)) for d in target_devices):
+            return False
+        return True
+
+    def __repr__(self):
+        return f"PushSubscription(id={self.subscription_id}, handler={getattr(self.handler, '__qualname__', self.handler)}, " \
+               f"namespaces={self.namespaces}, device_uuids={self.device_uuids}, device_types={self.device_types}, " \
+               f"device_classes={self.device_classes}, changes_only={self.changes_only})"
+
+
+class PushSubscriptionRegistry(object):
+    """
+    Index of the filtered push notification subscriptions.
+    Every subscription is indexed by its most selective filter only (device uuid, then namespace, then device type,
+    then device class), so that routing a notification only probes the buckets of its device uuid, namespace, device
+    types and the classes in the MRO of its devices, plus the subscriptions not filtering at all. The remaining filters
+    are then checked on those candidates alone. Buckets are dicts keyed by subscription id, so that unsubscribing
+    costs O(1) per key.
+    """
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._subscriptions: Dict[int, PushSubscription] = {}
+        self._by_device_uuid: Dict[str, Dict[int, PushSubscription]] = {}
+        self._by_namespace: Dict[str, Dict[int, PushSubscription]] = {}
+        self._by_device_type: Dict[str, Dict[int, PushSubscription]] = {}
+        self._by_device_class: Dict[type, Dict[int, PushSubscription]] = {}
+        # Device classes (dynamically built by the device factory) -> indexed classes within their MRO
+        self._indexed_bases: Dict[type, Tuple[type, ...]] = {}
+        self._unindexed: Dict[int, PushSubscription] = {}
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def _get_index(self, subscription: PushSubscription):
+        if subscription.device_uuids is not None:
+            return self._by_device_uuid, subscription.device_uuids
+        if subscription.namespaces is not None:
+            return self._by_namespace, subscription.namespaces
+        if subscription.device_types is not None:
+            return self._by_device_type, subscription.device_types
+        if subscription.device_classes is not None:
+            return self._by_device_class, subscription.device_classes
+        return None, None
+
+    def _get_indexed_bases(self, device_class: type) -> Tuple[type, ...]:
+        bases = self._indexed_bases.get(device_class)
+        if bases is None:
+            bases = tuple(c for c in device_class.__mro__ if c in self._by_device_class)
+            self._indexed_bases[device_class] = bases
+        return bases
+
+    def subscribe(self,
+                  handler: Callable[..., Awaitable],
+                  namespaces: Optional[Union[Namespace, str, Iterable[Union[Namespace, str]]]] = None,
+                  device_uuids: Optional[Union[str, Iterable[str]]] = None,
+                  device_types: Optional[Union[str, Iterable[str]]] = None,
+                  device_classes: Optional[Union[type, Iterable[type]]] = None,
+                  changes_only: bool = False) -> PushSubscription:
+        """
+        Registers a handler for the push notifications matching all the given filters
+        :param handler: coroutine function, with the same signature of the manager push notification handlers
+        :param namespaces: namespaces of the notifications to receive
+        :param device_uuids: uuids of the devices whose notifications are received
+        :param device_types: types of the devices whose notifications are received (e.g. "mss310")
+        :param device_classes: classes (e.g. mixins) the devices whose notifications are received must be instances of
+        :param changes_only: when set, the notifications repeating the previous payload of the same device and
+                             namespace are not delivered
+        :return: the subscription, to be passed to unsubscribe()
+        """
+        subscription = PushSubscription(subscription_id=next(self._ids),
+                                        handler=handler,
+                                        namespaces=_as_frozenset(namespaces, _namespace_value),
+                                        device_uuids=_as_frozenset(device_uuids),
+                                        device_types=_as_frozenset(device_types),
+                                        device_classes=_as_frozenset(device_classes),
+                                        changes_only=changes_only)
+        self._subscriptions[subscription.subscription_id] = subscription
+        index, keys = self._get_index(subscription)
+        if index is None:
+            self._unindexed[subscription.subscription_id] = subscription
+        else:
+            if index is self._by_device_class and not keys.issubset(index.keys()):
+                self._indexed_bases.clear()
+            for key in keys:
+                index.setdefault(key, {})[subscription.subscription_id] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription: PushSubscription) -> bool:
+        """
+        Removes the given subscription
+        :return: False if the subscription was not active
+        """
+        if self._subscriptions.pop(subscription.subscription_id, None) is None:
+            return False
+        subscription.active = False
+        index, keys = self._get_index(subscription)
+        if index is None:
+            del self._unindexed[subscription.subscription_id]
+        else:
+            for key in keys:
+                bucket = index[key]
+                del bucket[subscription.subscription_id]
+                if len(bucket) == 0:
+                    del index[key]
+                    if index is self._by_device_class:
+                        self._indexed_bases.clear()
+        return True
+
+    def match(self, push_notification: GenericPushNotification, target_devices: List) -> List[PushSubscription]:
+        """
+        Returns the subscriptions matching the given notification, in subscription order
+        """
+        if len(self._subscriptions) == 0:
+            return []
+        namespace = _namespace_value(push_notification.namespace)
+        device_uuid = push_notification.originating_device_uuid
+        candidates = {}
+        for bucket in (self._by_device_uuid.get(device_uuid), self._by_namespace.get(namespace), self._unindexed):
+            if bucket:
+                candidates.update(bucket)
+        if self._by_device_type:
+            for device in target_devices:
+                bucket = self._by_device_type.get(device.type)
+                if bucket:
+                    candidates.update(bucket)
+        if self._by_device_class:
+            for device_class in {type(device) for device in target_devices}:
+                for base in self._get_indexed_bases(device_class):
+                    candidates.update(self._by_device_class[base])
+        return [s for _, s in sorted(candidates.items()) if s.matches(namespace, device_uuid, target_devices)]
+
+    def get_subscription_counts(self) -> Dict[str, Union[int, Dict[str, int]]]:
+        """
+        Returns the number of active subscriptions: overall, per indexed device uuid, namespace, device type and
+        device class name, and the number of subscriptions that are not indexed (no filter at all)
+        """
+        return {
+            "total": len(self._subscriptions),
+            "by_device_uuid": {k: len(v) for k, v in self._by_device_uuid.items()},
+            "by_namespace": {k: len(v) for k, v in self._by_namespace.items()},
+            "by_device_type": {k: len(v) for k, v in self._by_device_type.items()},
+            "by_device_class": {k.__name__: len(v) for k, v in self._by_device_class.items()},
+            "unindexed": len(self._unindexed),
+        }
@@ -0,0 +1,209 @@
+import logging
+from collections import deque
+from enum import Enum
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+from meross_iot.utilities.timeouts import Transport
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SelectionReason(Enum):
+    """
+    Why a transport has been picked for a command
+    """
+    LAN_UNAVAILABLE = "LAN_UNAVAILABLE"  # The device has no LAN IP, or it ran out of LAN error budget
+    EXPLORING = "EXPLORING"  # Not enough samples have been collected for one of the transports yet
+    LOWER_COST = "LOWER_COST"  # The transport has the lowest expected latency
+    PROBE = "PROBE"  # The transport is not the best one, but it has not been measured for a while
+
+
+class TransportStats(object):
+    """
+    Success rate and latency statistics of a device over a transport
+    """
+    def __init__(self, window: int, success_alpha: float):
+        self._success_alpha = success_alpha
+        self.latencies = deque(maxlen=window)
+        self.success_rate = 1.0
+        self.successes = 0
+        self.failures = 0
+        self.last_attempt = 0.0
+
+    @property
+    def samples(self) -> int:
+        return self.successes + self.failures
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        if len(self.latencies) < 1:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+    def get_latency_percentile(self, percentile: int) -> Optional[float]:
+        """
+        Returns the given percentile of the recent latencies, in seconds, or None if no latency was recorded
+        """
+        if len(self.latencies) < 1:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, int(len(ordered) * percentile / 100 + 0.5) - 1)]
+
+    @property
+    def cost(self) -> Optional[float]:
+        """
+        Expected time to get an answer: the mean latency divided by the success rate, so that a transport answering
+        half of the times costs twice its latency.
+        """
+        latency = self.mean_latency
+        if latency is None:
+            return None
+        return latency / max(self.success_rate, 0.01)
+
+    def notify_success(self, latency: float) -> None:
+        self.successes += 1
+        self.latencies.append(latency)
+        self.success_rate += self._success_alpha * (1.0 - self.success_rate)
+
+    def notify_failure(self) -> None:
+        self.failures += 1
+        self.success_rate -= self._success_alpha * self.success_rate
+
+    def __repr__(self):
+        latency = self.mean_latency
+        latency = f"{latency * 1000:.1f}ms" if latency is not None else "n/a"
+        return f"success rate: {self.success_rate:.2f}, mean latency: {latency}, " \
+               f"successes: {self.successes}, failures: {self.failures}"
+
+
+class TransportSelection(object):
+    """
+    Transport picked for a command, along with the reason and the costs it was picked on
+    """
+    def __init__(self, transport: Transport, reason: SelectionReason, lan_cost: Optional[float] = None,
+                 mqtt_cost: Optional[float] = None):
+        self.transport = transport
+        self.reason = reason
+        self.lan_cost = lan_cost
+        self.mqtt_cost = mqtt_cost
+
+    def __repr__(self):
+        return f"{self.transport.value} ({self.reason.value}, lan cost: {self.lan_cost}, mqtt cost: {self.mqtt_cost})"
+
+
+class HedgingStats(object):
+    """
+    Counters of the hedged commands: how many of them needed the MQTT request and which transport answered first
+    """
+    def __init__(self):
+        self.commands = 0
+        self.hedges_sent = 0
+        self.lan_wins = 0
+        self.mqtt_wins = 0
+
+    def __str__(self):
+        return f"commands: {self.commands}, hedges sent: {self.hedges_sent}, lan wins: {self.lan_wins}, " \
+               f"mqtt wins: {self.mqtt_wins}"
+
+
+class TransportSelector(object):
+    """
+    Picks the transport of the commands issued with TransportMode.AUTO. Every device keeps the success rate and the
+    latency of the commands sent over LAN HTTP and over MQTT: each command goes through the transport with the lowest
+    expected latency, while the other one is probed every `probe_interval` seconds so that its statistics stay
+    up to date.
+    """
+    def __init__(self, probe_interval: float = 60.0, min_samples: int = 3, window: int = 50,
+                 success_alpha: float = 0.1):
+        """
+        Constructor
+        :param probe_interval: seconds after which a command is sent through the transport that is not currently
+                               preferred for a device
+        :param min_samples: number of commands each transport must be measured on before comparing them
+        :param window: number of recent latencies kept for every device and transport
+        :param success_alpha: weight of the most recent outcome in the success rate moving average
+        """
+        if probe_interval <= 0 or min_samples < 1 or window < 1 or not 0 < success_alpha <= 1:
+            raise ValueError("Invalid transport selector parameters")
+        self._probe_interval = probe_interval
+        self._min_samples = min_samples
+        self._window = window
+        self._success_alpha = success_alpha
+        self._stats: Dict[Tuple[str, Transport], TransportStats] = {}
+        self._last_selections: Dict[str, TransportSelection] = {}
+        self._selection_counts: Dict[Tuple[Transport, SelectionReason], int] = {}
+
+    def _get_stats(self, device_uuid: str, transport: Transport) -> TransportStats:
+        key = (device_uuid, transport)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = TransportStats(window=self._window, success_alpha=self._success_alpha)
+            self._stats[key] = stats
+        return stats
+
+    def select(self, device_uuid: str, lan_available: bool = True) -> TransportSelection:
+        """
+        Picks the transport for the next command sent to the given device
+        :param device_uuid: uuid of the target device
+        :param lan_available: False when the device cannot be reached over LAN right now
+        """
+        lan = self._get_stats(device_uuid, Transport.LAN_HTTP)
+        mqtt = self._get_stats(device_uuid, Transport.MQTT)
+        if not lan_available:
+            selection = TransportSelection(Transport.MQTT, SelectionReason.LAN_UNAVAILABLE)
+        elif lan.samples < self._min_samples or mqtt.samples < self._min_samples:
+            # MQTT gets measured anyway whenever LAN fails, so LAN wins the ties
+            transport = Transport.MQTT if mqtt.samples < lan.samples else Transport.LAN_HTTP
+            selection = TransportSelection(transport, SelectionReason.EXPLORING)
+        else:
+            lan_cost, mqtt_cost = lan.cost, mqtt.cost
+            if lan_cost is None and mqtt_cost is None:
+                best, other = Transport.LAN_HTTP, Transport.MQTT
+            elif mqtt_cost is None or (lan_cost is not None and lan_cost <= mqtt_cost):
+                best, other = Transport.LAN_HTTP, Transport.MQTT
+            else:
+                best, other = Transport.MQTT, Transport.LAN_HTTP
+            if monotonic() - self._get_stats(device_uuid, other).last_attempt >= self._probe_interval:
+                selection = TransportSelection(other, SelectionReason.PROBE, lan_cost, mqtt_cost)
+            else:
+                selection = TransportSelection(best, SelectionReason.LOWER_COST, lan_cost, mqtt_cost)
+
+        self._get_stats(device_uuid, selection.transport).last_attempt = monotonic()
+        key = (selection.transport, selection.reason)
+        self._selection_counts[key] = self._selection_counts.get(key, 0) + 1
+        previous = self._last_selections.get(device_uuid)
+        if previous is None or previous.transport != selection.transport:
+            _LOGGER.debug("Selected transport for device %s: %s", device_uuid, selection)
+        self._last_selections[device_uuid] = selection
+        return selection
+
+    def notify_success(self, device_uuid: str, transport: Transport, latency: float) -> None:
+        """
+        Records a command the device answered over the given transport, after `latency` seconds
+        """
+        self._get_stats(device_uuid, transport).notify_success(latency)
+
+    def notify_failure(self, device_uuid: str, transport: Transport) -> None:
+        """
+        Records a command that failed or timed out over the given transport
+        """
+        self._get_stats(device_uuid, transport).notify_failure()
+
+    def get_stats(self, device_uuid: str, transport: Transport) -> TransportStats:
+        """
+        Returns the statistics of the given device over the given transport
+        """
+        return self._get_stats(device_uuid, transport)
+
+    def get_last_selection(self, device_uuid: str) -> Optional[TransportSelection]:
+        """
+        Returns the last transport selection made for the given device, if any
+        """
+        return self._last_selections.get(device_uuid)
+
+    def get_selection_counts(self) -> Dict[Tuple[Transport, SelectionReason], int]:
+        """
+        Returns how many times every transport has been picked, for every reason
+        """
+        return dict(self._selection_counts)
@@ -0,0 +1,146 @@
+import logging
+import time
+from enum import Enum
+from typing import Dict, Optional
+
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.exception import CircuitOpenError
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """
+    State of the circuit guarding the commands sent to a device
+    """
+    CLOSED = "CLOSED"  # Commands are sent normally
+    OPEN = "OPEN"  # Commands are rejected right away with CircuitOpenError
+    HALF_OPEN = "HALF_OPEN"  # A single probe command is let through: its outcome closes or re-opens the circuit
+
+
+class _DeviceCircuit(object):
+    def __init__(self):
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.reason: Optional[str] = None
+        self.probe_in_flight = False
+
+
+class CircuitBreaker(object):
+    """
+    Per-device circuit breaker for the commands issued by the manager.
+    A device circuit opens after `failure_threshold` consecutive command timeouts, or when the device is reported
+    OFFLINE by a push notification: from then on, commands to the device fail immediately with CircuitOpenError.
+    After `recovery_timeout` seconds the circuit becomes half-open and lets a single probe command through: if the
+    device answers, the circuit closes, otherwise it opens again. An ONLINE push notification closes the circuit
+    right away.
+    """
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: float = 30.0):
+        """
+        Constructor
+        :param failure_threshold: number of consecutive timeouts that open the circuit of a device
+        :param recovery_timeout: seconds after which an open circuit lets a probe command through
+        """
+        if failure_threshold < 1 or recovery_timeout <= 0:
+            raise ValueError("failure_threshold must be at least 1 and recovery_timeout must be positive")
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._circuits: Dict[str, _DeviceCircuit] = {}
+        self.rejected_calls = 0
+
+    def _get_circuit(self, device_uuid: str) -> _DeviceCircuit:
+        circuit = self._circuits.get(device_uuid)
+        if circuit is None:
+            circuit = _DeviceCircuit()
+            self._circuits[device_uuid] = circuit
+        elif circuit.state == CircuitState.OPEN and time.monotonic() - circuit.opened_at >= self._recovery_timeout:
+            circuit.state = CircuitState.HALF_OPEN
+            circuit.probe_in_flight = False
+        return circuit
+
+    def get_state(self, device_uuid: str) -> CircuitState:
+        """
+        Returns the circuit state of the given device
+        """
+        if device_uuid not in self._circuits:
+            return CircuitState.CLOSED
+        return self._get_circuit(device_uuid).state
+
+    def get_open_reason(self, device_uuid: str) -> Optional[str]:
+        """
+        Returns why the circuit of the given device was opened, or None if it is closed
+        """
+        circuit = self._circuits.get(device_uuid)
+        return circuit.reason if circuit is not None and circuit.state != CircuitState.CLOSED else None
+
+    def before_call(self, device_uuid: str) -> None:
+        """
+        Checks whether a command can be sent to the given device. Every allowed command must then be
+        followed by one notify_success(), notify_failure() or notify_aborted() call.
+        :raises CircuitOpenError: when the circuit is open, or half-open with a probe already in flight
+        """
+        circuit = self._get_circuit(device_uuid)
+        if circuit.state == CircuitState.CLOSED:
+            return
+        if circuit.state == CircuitState.HALF_OPEN and not circuit.probe_in_flight:
+            _LOGGER.debug("Circuit of device %s is half-open: letting a probe command through", device_uuid)
+            circuit.probe_in_flight = True
+            return
+        self.rejected_calls += 1
+        retry_after = max(0.0, circuit.opened_at + self._recovery_timeout - time.monotonic())
+        raise CircuitOpenError(target_device_uuid=device_uuid, reason=circuit.reason, retry_after=retry_after)
+
+    def notify_success(self, device_uuid: str) -> None:
+        """
+        Notifies that the device answered a command
+        """
+        circuit = self._circuits.get(device_uuid)
+        if circuit is None:
+            return
+        if circuit.state != CircuitState.CLOSED:
+            _LOGGER.info("Device %s answered: closing its circuit", device_uuid)
+        self._close(circuit)
+
+    def notify_failure(self, device_uuid: str) -> None:
+        """
+        Notifies that the device did not answer a command in time
+        """
+        circuit = self._get_circuit(device_uuid)
+        circuit.consecutive_failures += 1
+        if circuit.state == CircuitState.HALF_OPEN:
+            self._open(device_uuid, circuit, reason="probe command timed out")
+        elif circuit.state == CircuitState.CLOSED and circuit.consecutive_failures >= self._failure_threshold:
+            self._open(device_uuid, circuit, reason=f"{circuit.consecutive_failures} consecutive command timeouts")
+
+    def notify_aborted(self, device_uuid: str) -> None:
+        """
+        Notifies that an allowed command ended without telling anything about the device health
+        (e.g. it was cancelled or dropped by the rate limiter)
+        """
+        circuit = self._circuits.get(device_uuid)
+        if circuit is not None:
+            circuit.probe_in_flight = False
+
+    def notify_online_status(self, device_uuid: str, status: OnlineStatus) -> None:
+        """
+        Updates the device circuit in accordance with the online status reported by a push notification
+        """
+        if status == OnlineStatus.OFFLINE:
+            self._open(device_uuid, self._get_circuit(device_uuid), reason="device reported offline")
+        elif status == OnlineStatus.ONLINE and device_uuid in self._circuits:
+            self._close(self._circuits[device_uuid])
+
+    def _open(self, device_uuid: str, circuit: _DeviceCircuit, reason: str) -> None:
+        _LOGGER.warning("Opening the circuit of device %s: %s", device_uuid, reason)
+        circuit.state = CircuitState.OPEN
+        circuit.opened_at = time.monotonic()
+        circuit.reason = reason
+        circuit.probe_in_flight = False
+
+    @staticmethod
+    def _close(circuit: _DeviceCircuit) -> None:
+        circuit.state = CircuitState.CLOSED
+        circuit.consecutive_failures = 0
+        circuit.reason = None
+        circuit.probe_in_flight = False
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+from asyncio import AbstractEventLoop
+from collections import deque
+from contextvars import ContextVar
+from time import monotonic
+from typing import Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# Set while a push notification handler runs: handlers triggering further handlers (e.g. by updating a device) must
+# not wait for a concurrency slot, as they are already holding one.
+_within_handler_var: ContextVar[bool] = ContextVar("within_push_handler", default=False)
+
+HandlerCall = Tuple[Callable[..., Awaitable], tuple, dict]
+
+
+class HandlerStats(object):
+    """
+    Latency and outcome counters of a push notification handler
+    """
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.slow_calls = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls > 0 else 0.0
+
+    def __str__(self):
+        return f"calls: {self.calls}, errors: {self.errors}, timeouts: {self.timeouts}, slow: {self.slow_calls}, " \
+               f"latency mean/max: {self.mean_latency * 1000:.3f}/{self.max_latency * 1000:.3f}ms"
+
+
+class PushDispatcher(object):
+    """
+    Processes push notifications in order for every device, while different devices are processed concurrently:
+    every device gets a lane, drained by a task that only lives while the lane holds notifications.
+    Handlers are fanned out concurrently, bounded by a global concurrency limit and, optionally, by a per-handler
+    timeout. Handlers taking longer than `slow_handler_threshold` are reported with a warning.
+    """
+    def __init__(self,
+                 loop: AbstractEventLoop,
+                 max_concurrent_handlers: int = 16,
+                 handler_timeout: Optional[float] = None,
+                 slow_handler_threshold: float = 1.0):
+        """
+        Constructor
+        :param loop: event loop running the handlers
+        :param max_concurrent_handlers: maximum number of handlers running at the same time, across all devices
+        :param handler_timeout: seconds after which a handler is cancelled. When None, handlers are never cancelled.
+        :param slow_handler_threshold: handlers running longer than this number of seconds are logged as slow
+        """
+        if max_concurrent_handlers < 1:
+            raise ValueError("max_concurrent_handlers must be a positive number")
+        self._loop = loop
+        self._max_concurrent_handlers = max_concurrent_handlers
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._handler_timeout = handler_timeout
+        self._slow_handler_threshold = slow_handler_threshold
+        self._lanes: Dict[str, Deque[Tuple[Callable[..., Awaitable], tuple]]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._handler_stats: Dict[str, HandlerStats] = {}
+
+    @property
+    def active_lanes(self) -> int:
+        """
+        Number of devices whose notifications are being processed
+        """
+        return len(self._workers)
+
+    @property
+    def queued(self) -> int:
+        """
+        Number of notifications waiting for the previous ones of the same device to be processed
+        """
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def submit(self, lane_key: str, func: Callable[..., Awaitable], *args) -> None:
+        """
+        Schedules func(*args) after the work previously submitted with the same lane key.
+        Must be invoked within the event loop.
+        :param lane_key: key of the lane, i.e. the uuid of the device the notification comes from
+        :param func: coroutine function processing the notification
+        """
+        lane = self._lanes.get(lane_key)
+        if lane is None:
+            lane = deque()
+            self._lanes[lane_key] = lane
+        lane.append((func, args))
+        if lane_key not in self._workers:
+            self._workers[lane_key] = self._loop.create_task(self._async_drain_lane(lane_key, lane))
+
+    async def _async_drain_lane(self, lane_key: str, lane: Deque[Tuple[Callable[..., Awaitable], tuple]]) -> None:
+        try:
+            while lane:
+                func, args = lane.popleft()
+                try:
+                    await func(*args)
+                except Exception:
+                    _LOGGER.exception("An error occurred while processing a push notification of %s", lane_key)
+        finally:
+            # The lane is only left with work when the worker gets cancelled, i.e. on shutdown
+            if lane:
+                _LOGGER.debug("Discarding %d push notifications of %s", len(lane), lane_key)
+            del self._workers[lane_key]
+            del self._lanes[lane_key]
+
+    async def async_join(self) -> None:
+        """
+        Waits until every submitted notification has been processed
+        """
+        while self._workers:
+            await asyncio.gather(*list(self._workers.values()), return_exceptions=True)
+
+    async def async_run_handlers(self, calls: Iterable[HandlerCall]) -> None:
+        """
+        Runs the given handler calls concurrently and waits for all of them to complete. Errors and timeouts are
+        logged and never propagated.
+        :param calls: (handler, args, kwargs) tuples
+        """
+        calls = list(calls)
+        if len(calls) == 0:
+            return
+        if len(calls) == 1:
+            await self._async_run_handler(*calls[0])
+            return
+        await asyncio.gather(*(self._async_run_handler(*call) for call in calls))
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily, so that it binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_handlers)
+        return self._semaphore
+
+    async def _async_run_handler(self, handler: Callable[..., Awaitable], args: tuple, kwargs: dict) -> None:
+        if _within_handler_var.get():
+            await self._async_invoke_handler(handler, args, kwargs)
+            return
+        async with self._get_semaphore():
+            token = _within_handler_var.set(True)
+            try:
+                await self._async_invoke_handler(handler, args, kwargs)
+            finally:
+                _within_handler_var.reset(token)
+
+    async def _async_invoke_handler(self, handler: Callable[..., Awaitable], args: tuple, kwargs: dict) -> None:
+        name = getattr(handler, "__qualname__", repr(handler))
+        stats = self._handler_stats.get(name)
+        if stats is None:
+            stats = HandlerStats()
+            self._handler_stats[name] = stats
+        start = monotonic()
+        try:
+            if self._handler_timeout is None:
+                await handler(*args, **kwargs)
+            else:
+                await asyncio.wait_for(handler(*args, **kwargs), self._handler_timeout)
+        except asyncio.TimeoutError:
+            if self._handler_timeout is None:
+                stats.errors += 1
+                _LOGGER.exception("Uncaught error occurred while executing push notification handler %s", name)
+                return
+            stats.timeouts += 1
+            _LOGGER.warning("Push notification handler %s did not complete within %.1fs and has been cancelled",
+                            name, self._handler_timeout)
+        except Exception:
+            stats.errors += 1
+            _LOGGER.exception("Uncaught error occurred while executing push notification handler %s", name)
+        finally:
+            latency = monotonic() - start
+            stats.calls += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if latency >= self._slow_handler_threshold:
+                stats.slow_calls += 1
+                _LOGGER.warning("Push notification handler %s took %.3fs: slow handlers delay the following "
+                                "notifications of the same device", name, latency)
+
+    def get_handler_stats(self) -> Dict[str, HandlerStats]:
+        """
+        Returns the counters of every handler invoked so far, keyed by handler qualified name
+        """
+        return dict(self._handler_stats)
@@ -0,0 +1,148 @@
+import asyncio
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Callable, Optional
+
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.generic import GenericPushNotification
+
+
+class StreamOverflowPolicy(Enum):
+    """
+    What an event stream does with the events that do not fit its buffer
+    """
+    DROP_OLDEST = "DROP_OLDEST"  # Discard the oldest buffered event to make room for the new one
+    DROP_NEWEST = "DROP_NEWEST"  # Discard the new event
+    COALESCE_LATEST = "COALESCE_LATEST"  # Only keep the latest event of every device and namespace
+
+
+class EventStreamStats(object):
+    """
+    Counters of an event stream. A growing lag tells the consumer is falling behind.
+    """
+    def __init__(self):
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.lag = 0
+        self.max_lag = 0
+
+    def __str__(self):
+        return f"published: {self.published}, delivered: {self.delivered}, dropped: {self.dropped}, " \
+               f"coalesced: {self.coalesced}, lag: {self.lag} (max {self.max_lag})"
+
+
+def _coalescing_key(event: GenericPushNotification):
+    namespace = event.namespace.value if isinstance(event.namespace, Namespace) else event.namespace
+    return event.originating_device_uuid, namespace
+
+
+class EventStream(object):
+    """
+    Bounded buffer of push notifications, consumed via `async for`.
+    Publishing never blocks: when the buffer is full, events are discarded according to the overflow policy.
+    With COALESCE_LATEST, a buffered event is replaced (in place) by any newer event of the same device and
+    namespace, while the oldest one is discarded when an event for a new device and namespace does not fit.
+    Iteration ends once the stream is closed and its buffered events have been consumed.
+    """
+    def __init__(self,
+                 max_size: int = 1000,
+                 overflow_policy: StreamOverflowPolicy = StreamOverflowPolicy.DROP_OLDEST,
+                 on_close: Optional[Callable[['EventStream'], None]] = None):
+        """
+        Constructor
+        :param max_size: maximum number of buffered events
+        :param overflow_policy: what to do with the events that do not fit the buffer
+        :param on_close: invoked once, when the stream gets closed
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be a positive number")
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        self._on_close = on_close
+        self._buffer = OrderedDict() if overflow_policy == StreamOverflowPolicy.COALESCE_LATEST else deque()
+        self._waiter: Optional[asyncio.Future] = None
+        self._closed = False
+        self._stats = EventStreamStats()
+
+    @property
+    def stats(self) -> EventStreamStats:
+        self._stats.lag = len(self._buffer)
+        return self._stats
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def publish(self, event: GenericPushNotification) -> bool:
+        """
+        Buffers the event. Must be invoked within the event loop.
+        :return: False if the event has been discarded
+        """
+        if self._closed:
+            return False
+        self._stats.published += 1
+        if self._overflow_policy == StreamOverflowPolicy.COALESCE_LATEST:
+            key = _coalescing_key(event)
+            if key in self._buffer:
+                self._buffer[key] = event
+                self._stats.coalesced += 1
+                return True
+            if len(self._buffer) >= self._max_size:
+                self._buffer.popitem(last=False)
+                self._stats.dropped += 1
+            self._buffer[key] = event
+        elif len(self._buffer) < self._max_size:
+            self._buffer.append(event)
+        elif self._overflow_policy == StreamOverflowPolicy.DROP_NEWEST:
+            self._stats.dropped += 1
+            return False
+        else:
+            self._buffer.popleft()
+            self._buffer.append(event)
+            self._stats.dropped += 1
+        self._stats.max_lag = max(self._stats.max_lag, len(self._buffer))
+        self._wake_up()
+        return True
+
+    def _pop(self) -> GenericPushNotification:
+        if isinstance(self._buffer, OrderedDict):
+            return self._buffer.popitem(last=False)[1]
+        return self._buffer.popleft()
+
+    def _wake_up(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def close(self) -> None:
+        """
+        Stops accepting events: the consumer gets the events still buffered, then the iteration ends
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._wake_up()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> GenericPushNotification:
+        while len(self._buffer) == 0:
+            if self._closed:
+                raise StopAsyncIteration
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        self._stats.delivered += 1
+        return self._pop()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
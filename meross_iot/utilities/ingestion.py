@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import threading
+import time
+from asyncio import AbstractEventLoop
+from collections import deque
+from enum import Enum
+from typing import Callable, Any, Deque, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IngestionOverflowPolicy(Enum):
+    """
+    Describes which message is discarded when the ingestion queue is full
+    """
+    DROP_OLDEST = "DROP_OLDEST"  # The oldest queued message is discarded to make room for the new one
+    DROP_NEWEST = "DROP_NEWEST"  # The incoming message is discarded
+
+
+class IngestionStats(object):
+    """
+    Counters of the ingestion queue
+    """
+    def __init__(self):
+        self.enqueued = 0
+        self.dropped = 0
+        self.drained = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.max_batch_size = 0
+        self.last_drain_latency = 0.0
+        self.max_drain_latency = 0.0
+        self._total_drain_latency = 0.0
+
+    def _notify_batch(self, size: int, latency: float) -> None:
+        self.batches += 1
+        self.drained += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.last_drain_latency = latency
+        self.max_drain_latency = max(self.max_drain_latency, latency)
+        self._total_drain_latency += latency
+
+    @property
+    def mean_batch_size(self) -> float:
+        """
+        Average number of messages handed over to the event loop per wakeup
+        """
+        return self.drained / self.batches if self.batches > 0 else 0
+
+    @property
+    def mean_drain_latency(self) -> float:
+        """
+        Average time in seconds between the first message of a batch being queued and the batch being drained
+        """
+        return self._total_drain_latency / self.batches if self.batches > 0 else 0
+
+    def __str__(self):
+        return f"enqueued: {self.enqueued}, drained: {self.drained}, dropped: {self.dropped}, " \
+               f"batches: {self.batches} (mean size {self.mean_batch_size:.1f}, max {self.max_batch_size}), " \
+               f"max depth: {self.max_depth}, drain latency mean/max: " \
+               f"{self.mean_drain_latency * 1000:.3f}/{self.max_drain_latency * 1000:.3f}ms"
+
+
+class IngestionQueue(object):
+    """
+    Hands messages over from a foreign thread (i.e. the paho-mqtt network thread) to the event loop.
+    Messages are queued and drained by the event loop in batches, waking it up once per batch rather than
+    once per message.
+    Droppable messages are bounded by max_size and discarded according to the overflow policy when the queue
+    is full; non-droppable messages (e.g. command ACKs, whose number is bounded by the pending commands) are
+    never discarded and are delivered before the droppable ones of the same batch.
+    """
+    def __init__(self,
+                 loop: AbstractEventLoop,
+                 consumer: Callable[[Any], None],
+                 max_size: int = 10000,
+                 overflow_policy: IngestionOverflowPolicy = IngestionOverflowPolicy.DROP_OLDEST):
+        """
+        Constructor
+        :param loop: event loop draining the queue
+        :param consumer: callable invoked within the event loop for every queued message
+        :param max_size: maximum number of droppable messages waiting to be drained
+        :param overflow_policy: which message to discard when the queue is full
+        """
+        if max_size < 1:
+            raise ValueError("The ingestion queue size must be at least 1")
+        self._loop = loop
+        self._consumer = consumer
+        self._max_size = max_size
+        self._overflow_policy = overflow_policy
+        self._lock = threading.Lock()
+        self._priority_items: Deque[Any] = deque()
+        self._items: Deque[Any] = deque()
+        self._drain_scheduled = False
+        self._batch_started_at = 0.0
+        self._stats = IngestionStats()
+
+    @property
+    def stats(self) -> IngestionStats:
+        return self._stats
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of messages waiting to be drained
+        """
+        return len(self._priority_items) + len(self._items)
+
+    def put(self, item: Any, droppable: bool = True) -> bool:
+        """
+        Queues a message. This method is thread safe.
+        :param item: message to hand over to the consumer
+        :param droppable: when False, the message is never discarded by the overflow policy
+        :return: False if the message has been discarded, True otherwise
+        """
+        with self._lock:
+            if droppable:
+                if len(self._items) >= self._max_size:
+                    self._stats.dropped += 1
+                    if self._overflow_policy == IngestionOverflowPolicy.DROP_NEWEST:
+                        return False
+                    self._items.popleft()
+                self._items.append(item)
+            else:
+                self._priority_items.append(item)
+            self._stats.enqueued += 1
+            self._stats.max_depth = max(self._stats.max_depth, self.depth)
+
+            if self._drain_scheduled:
+                return True
+            self._drain_scheduled = True
+            self._batch_started_at = time.monotonic()
+
+        # Wake up the loop once for the whole batch
+        if self._is_loop_thread():
+            self._loop.call_soon(self._drain)
+        else:
+            self._loop.call_soon_threadsafe(self._drain)
+        return True
+
+    def _is_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _take_batch(self) -> Tuple[Deque[Any], Deque[Any], float]:
+        with self._lock:
+            priority_items, items = self._priority_items, self._items
+            self._priority_items, self._items = deque(), deque()
+            self._drain_scheduled = False
+            return priority_items, items, self._batch_started_at
+
+    def _drain(self) -> None:
+        priority_items, items, started_at = self._take_batch()
+        self._stats._notify_batch(size=len(priority_items) + len(items), latency=time.monotonic() - started_at)
+        for batch in (priority_items, items):
+            for item in batch:
+                try:
+                    self._consumer(item)
+                except Exception:
+                    _LOGGER.exception("Error occurred while handling ingested message %s", item)
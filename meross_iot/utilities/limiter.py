@@ -0,0 +1,149 @@
+import time
+from contextvars import ContextVar
+from enum import Enum
+from typing import Optional, Dict, Tuple
+
+
+class OverLimitPolicy(Enum):
+    """
+    Describes what happens to a command that exceeds the configured rate limits
+    """
+    DELAY = "DELAY"  # The command is delayed until the rate limits allow it
+    DROP = "DROP"  # The command is silently discarded and None is returned to the caller
+    RAISE = "RAISE"  # The command is discarded and a RateLimitExceeded error is raised
+
+
+# Per-call override of the over-limit policy. When True, over-limit commands are dropped; when False,
+# they are always delayed. It is a context variable so that it flows from high-level calls, such as
+# `device.async_update(drop_on_overquota=False)`, down to every command they issue.
+drop_on_overquota_var: ContextVar[Optional[bool]] = ContextVar("drop_on_overquota", default=None)
+
+
+class TokenBucket(object):
+    """
+    Classic token bucket: tokens are refilled at a constant `rate` up to `burst`.
+    Tokens can be reserved in advance, in which case the bucket goes negative and the
+    caller is told how long it has to wait for its token.
+    """
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0 or burst < 1:
+            raise ValueError("Token bucket rate must be positive and burst must be at least 1")
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def wait_time(self, now: float) -> float:
+        """
+        Returns how many seconds the caller should wait before a token is available
+        """
+        self._refill(now)
+        if self._tokens >= 1:
+            return 0
+        return (1 - self._tokens) / self._rate
+
+    def consume(self, now: float) -> None:
+        """
+        Takes a token from the bucket, even if it is not yet available
+        """
+        self._refill(now)
+        self._tokens -= 1
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class RateLimiter(object):
+    """
+    Rate limiter that guards the outbound MQTT traffic with a global token bucket and a per-device one.
+    When a limit is not configured (rate set to None), it is not enforced.
+    """
+    def __init__(self,
+                 global_rate: Optional[float] = None,
+                 global_burst: int = 10,
+                 device_rate: Optional[float] = None,
+                 device_burst: int = 3,
+                 over_limit_policy: OverLimitPolicy = OverLimitPolicy.DELAY,
+                 max_delay: float = 30.0):
+        """
+        Constructor
+        :param global_rate: maximum number of commands per second sent across all devices. None means unlimited.
+        :param global_burst: maximum number of commands that can be sent in a burst across all devices
+        :param device_rate: maximum number of commands per second sent to the same device. None means unlimited.
+        :param device_burst: maximum number of commands that can be sent in a burst to the same device
+        :param over_limit_policy: what to do with commands exceeding the limits
+        :param max_delay: maximum delay in seconds applied to a command by the DELAY policy. Commands that would
+                          need to wait longer than this are rejected with a RateLimitExceeded error.
+        """
+        self._global_bucket = TokenBucket(global_rate, global_burst) if global_rate is not None else None
+        self._device_rate = device_rate
+        self._device_burst = device_burst
+        self._device_buckets: Dict[str, TokenBucket] = {}
+        self._over_limit_policy = over_limit_policy
+        self._max_delay = max_delay
+
+    @property
+    def over_limit_policy(self) -> OverLimitPolicy:
+        return self._over_limit_policy
+
+    @over_limit_policy.setter
+    def over_limit_policy(self, value: OverLimitPolicy) -> None:
+        self._over_limit_policy = value
+
+    @property
+    def enabled(self) -> bool:
+        return self._global_bucket is not None or self._device_rate is not None
+
+    def _get_device_bucket(self, device_uuid: str) -> Optional[TokenBucket]:
+        if self._device_rate is None:
+            return None
+        bucket = self._device_buckets.get(device_uuid)
+        if bucket is None:
+            bucket = TokenBucket(self._device_rate, self._device_burst)
+            self._device_buckets[device_uuid] = bucket
+        return bucket
+
+    def check_limits(self, device_uuid: str, drop_on_overquota: Optional[bool] = None) -> Tuple[Optional[OverLimitPolicy], float]:
+        """
+        Checks whether a command towards the given device can be sent right away.
+        Tokens are consumed when the command is sent now or delayed.
+
+        :param device_uuid: uuid of the target device
+        :param drop_on_overquota: per-call override of the over-limit policy. True drops over-limit commands,
+                                  False always delays them (even beyond max_delay). None applies the
+                                  configured policy.
+        :return: a tuple (policy, delay). policy is None when the command can be sent right away. When the policy
+                 is DELAY, delay tells how many seconds the command should wait before being sent.
+        """
+        buckets = [b for b in (self._global_bucket, self._get_device_bucket(device_uuid)) if b is not None]
+        if len(buckets) == 0:
+            return None, 0
+
+        now = time.monotonic()
+        wait = max(b.wait_time(now) for b in buckets)
+        if wait <= 0:
+            for b in buckets:
+                b.consume(now)
+            return None, 0
+
+        if drop_on_overquota is True:
+            policy = OverLimitPolicy.DROP
+        elif drop_on_overquota is False:
+            policy = OverLimitPolicy.DELAY
+        else:
+            policy = self._over_limit_policy
+
+        if policy == OverLimitPolicy.DELAY:
+            # Commands explicitly marked as not droppable are delayed regardless of max_delay
+            if wait > self._max_delay and drop_on_overquota is not False:
+                return OverLimitPolicy.RAISE, 0
+            for b in buckets:
+                b.consume(now)
+            return OverLimitPolicy.DELAY, wait
+
+        return policy, 0
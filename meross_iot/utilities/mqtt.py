@@ -1,5 +1,11 @@
+import json
+import os
 import uuid as UUID
 from hashlib import md5
+from time import time
+from typing import Dict, Tuple, Union
+
+from meross_iot.model.enums import Namespace
 
 
 def build_device_request_topic(client_uuid: str) -> str:
@@ -80,3 +86,53 @@ def verify_message_signature(header: dict, key: str):
     message_hash.update(strtohash.encode("utf8"))
     expected_signature = message_hash.hexdigest().lower()
     return expected_signature == header['sign']
+
+
+class MqttMessageBuilder(object):
+    """
+    Builds the signed command messages sent to the devices.
+    The message is serialized exactly as json.dumps() with compact separators would do, but the static parts of the
+    header are formatted once and the namespace/method/uuid fragments are cached, so that only the message id,
+    the signature, the timestamp and the payload are serialized for every message.
+    """
+    def __init__(self, from_topic: str, key: str):
+        """
+        Constructor
+        :param from_topic: topic the devices send their ACKs to
+        :param key: cloud key used to sign the messages
+        """
+        self._key = key
+        self._prefix = '{"header":{"from":%s,"messageId":"' % json.dumps(from_topic)
+        self._fragments: Dict[Union[Namespace, str], str] = {}
+
+    def _get_fragment(self, value: Union[Namespace, str]) -> str:
+        fragment = self._fragments.get(value)
+        if fragment is None:
+            fragment = json.dumps(value.value if isinstance(value, Namespace) else value)
+            self._fragments[value] = fragment
+        return fragment
+
+    @staticmethod
+    def generate_message_id() -> str:
+        """
+        Generates a random message id: 32 lowercase hex chars, as the md5 digests used by the official apps
+        """
+        return os.urandom(16).hex()
+
+    def build(self, method: str, namespace: Union[Namespace, str], payload: dict,
+              destination_device_uuid: str) -> Tuple[bytes, str]:
+        """
+        Builds the message carrying the given command
+        :return: the serialized message and its message id
+        """
+        if not isinstance(namespace, (Namespace, str)):
+            raise ValueError("Namespace parameter must be a Namespace enum or a string.")
+        message_id = self.generate_message_id()
+        timestamp = int(round(time()))
+        signature = md5(f"{message_id}{self._key}{timestamp}".encode("utf8")).hexdigest()
+        message = f'{self._prefix}{message_id}","method":{self._get_fragment(method)},' \
+                  f'"namespace":{self._get_fragment(namespace)},"payloadVersion":1,"sign":"{signature}",' \
+                  f'"timestamp":{timestamp},"triggerSrc":"Android",' \
+                  f'"uuid":{self._get_fragment(destination_device_uuid)}}},' \
+                  f'"payload":{json.dumps(payload, separators=(",", ":"))}}}'
+        return message.encode("utf-8"), message_id
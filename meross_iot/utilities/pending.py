@@ -0,0 +1,157 @@
+import heapq
+import itertools
+from asyncio import AbstractEventLoop, Future, TimeoutError, TimerHandle
+from typing import Dict, List, Optional, Tuple, Iterable, Callable
+
+
+class PendingCommand(object):
+    """
+    A command sent to a device, waiting for its ACK
+    """
+    __slots__ = ("message_id", "future", "target_device_uuid", "method", "namespace", "broker", "issued_at",
+                 "deadline")
+
+    def __init__(self, message_id: str, future: Future, target_device_uuid: str, method: str, namespace: str,
+                 broker: Optional[str], issued_at: float, deadline: float):
+        self.message_id = message_id
+        self.future = future
+        self.target_device_uuid = target_device_uuid
+        self.method = method
+        self.namespace = namespace
+        self.broker = broker
+        self.issued_at = issued_at
+        self.deadline = deadline
+
+
+class PendingCommandTable(object):
+    """
+    Table of the in-flight commands, keyed by message id.
+    Deadlines are tracked by a heap served by a single loop timer, armed for the earliest deadline: when a deadline
+    expires, the command is removed from the table and its future fails with TimeoutError.
+    Entries are removed in O(1) when ACKed, timed out or discarded by the caller; the heap entries of removed
+    commands are lazily dropped once their deadline is reached.
+    The table can be looked up and popped from the paho-mqtt thread, while registration and timeouts happen
+    within the event loop.
+    """
+    def __init__(self, loop: AbstractEventLoop):
+        self._loop = loop
+        self._commands: Dict[str, PendingCommand] = {}
+        self._deadlines: List[Tuple[float, int, PendingCommand]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[TimerHandle] = None
+        self._timer_deadline: Optional[float] = None
+
+        self.registered = 0
+        self.acked = 0
+        self.timed_out = 0
+        self.discarded = 0
+        self.aborted = 0
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of commands waiting for their ACK
+        """
+        return len(self._commands)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._commands
+
+    def register(self, message_id: str, future: Future, timeout: float, target_device_uuid: str, method: str,
+                 namespace: str, broker: Optional[str] = None) -> PendingCommand:
+        """
+        Registers a command waiting for its ACK. Must be invoked within the event loop.
+        :param message_id: id of the message carrying the command
+        :param future: future resolved by the ACK. It fails with TimeoutError when the timeout expires.
+        :param timeout: seconds to wait for the ACK
+        :param target_device_uuid: uuid of the device the command is sent to
+        :param method: command method
+        :param namespace: command namespace
+        :param broker: broker the command has been sent through, as "host:port"
+        """
+        now = self._loop.time()
+        command = PendingCommand(message_id=message_id, future=future, target_device_uuid=target_device_uuid,
+                                 method=method, namespace=namespace, broker=broker, issued_at=now, deadline=now + timeout)
+        self._commands[message_id] = command
+        heapq.heappush(self._deadlines, (command.deadline, next(self._sequence), command))
+        self.registered += 1
+        self._arm_timer()
+        return command
+
+    def pop(self, message_id: str) -> Optional[PendingCommand]:
+        """
+        Removes the command acknowledged by the given message id, if still in flight. This method is thread safe.
+        :param message_id: id of the ACK message
+        :return: the pending command, or None if the command already timed out or was discarded
+        """
+        command = self._commands.pop(message_id, None)
+        if command is not None:
+            self.acked += 1
+        return command
+
+    def discard(self, message_id: str) -> None:
+        """
+        Removes the command without resolving its future, e.g. when the caller stopped waiting for it.
+        """
+        if self._commands.pop(message_id, None) is not None:
+            self.discarded += 1
+
+    def abort(self, broker: str, exception_factory: Callable[[PendingCommand], Exception]) -> int:
+        """
+        Fails all the commands sent through the given broker, whose ACKs can no longer arrive.
+        Must be invoked within the event loop.
+        :param broker: broker the commands have been sent through, as "host:port"
+        :param exception_factory: builds the exception to set on the future of every aborted command
+        :return: the number of aborted commands
+        """
+        aborted = 0
+        for command in self.commands():
+            if command.broker != broker or self._commands.pop(command.message_id, None) is not command:
+                continue
+            aborted += 1
+            if not command.future.done():
+                command.future.set_exception(exception_factory(command))
+        self.aborted += aborted
+        return aborted
+
+    def commands(self) -> Iterable[PendingCommand]:
+        """
+        Returns a snapshot of the in-flight commands
+        """
+        return list(self._commands.values())
+
+    def get_age_stats(self, percentiles: Iterable[int] = (50, 90, 99)) -> Dict[str, float]:
+        """
+        Returns the age, in seconds, of the in-flight commands: the oldest one and the requested percentiles.
+        """
+        now = self._loop.time()
+        ages = sorted(now - c.issued_at for c in self.commands())
+        stats = {"count": len(ages), "max": ages[-1] if ages else 0.0}
+        for p in percentiles:
+            stats[f"p{p}"] = ages[max(0, int(len(ages) * p / 100 + 0.5) - 1)] if ages else 0.0
+        return stats
+
+    def _arm_timer(self) -> None:
+        if not self._deadlines:
+            return
+        deadline = self._deadlines[0][0]
+        if self._timer is not None:
+            if self._timer_deadline <= deadline:
+                return
+            self._timer.cancel()
+        self._timer_deadline = deadline
+        self._timer = self._loop.call_at(deadline, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._timer_deadline = None
+        now = self._loop.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, command = heapq.heappop(self._deadlines)
+            # Skip the commands that were already ACKed or discarded
+            if self._commands.pop(command.message_id, None) is not command:
+                continue
+            self.timed_out += 1
+            if not command.future.done():
+                command.future.set_exception(TimeoutError())
+        self._arm_timer()
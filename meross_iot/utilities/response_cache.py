@@ -0,0 +1,200 @@
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple, Union, Set
+
+from meross_iot.model.enums import Namespace
+
+_LOGGER = logging.getLogger(__name__)
+
+# Default time-to-live, in seconds, of the cacheable GET responses.
+# Namespaces that are not listed here are never cached.
+DEFAULT_TTL_BY_NAMESPACE: Dict[str, float] = {
+    Namespace.SYSTEM_ABILITY.value: 24 * 3600,
+    Namespace.SYSTEM_RUNTIME.value: 60,
+    Namespace.SYSTEM_DND_MODE.value: 3600,
+    Namespace.ROLLER_SHUTTER_CONFIG.value: 3600,
+    Namespace.HUB_MTS100_ADJUST.value: 3600,
+    Namespace.CONTROL_CONSUMPTION.value: 3600,
+    Namespace.CONTROL_CONSUMPTIONX.value: 3600,
+}
+
+# Namespaces whose cached responses are only valid within the day they were retrieved
+_DAY_BOUND_NAMESPACES = {Namespace.CONTROL_CONSUMPTION.value, Namespace.CONTROL_CONSUMPTIONX.value}
+
+_CacheKey = Tuple[str, str, str]
+
+
+class _CacheEntry(object):
+    def __init__(self, value: dict, stored_at: float, stored_on: date):
+        self.value = value
+        self.stored_at = stored_at
+        self.stored_on = stored_on
+
+
+class ResponseCache(object):
+    """
+    LRU cache of the responses to idempotent GET commands, keyed by (device uuid, namespace, payload).
+    Every namespace has its own time-to-live; responses of namespaces without a TTL are not cached.
+    Entries are invalidated by the manager whenever a push notification for the same device and namespace
+    is received or a SET command towards the same namespace succeeds.
+    """
+    def __init__(self,
+                 max_entries: int = 1024,
+                 ttl_by_namespace: Optional[Dict[Union[Namespace, str], float]] = None):
+        """
+        Constructor
+        :param max_entries: maximum number of responses kept in cache. The least recently used ones are evicted first.
+        :param ttl_by_namespace: time-to-live in seconds of the cached responses, by namespace.
+                                 When None, DEFAULT_TTL_BY_NAMESPACE is used.
+        """
+        if ttl_by_namespace is None:
+            ttl_by_namespace = DEFAULT_TTL_BY_NAMESPACE
+        self._ttl_by_namespace = {self._namespace_value(k): v for k, v in ttl_by_namespace.items()}
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[_CacheKey, _CacheEntry]" = OrderedDict()
+        self._keys_by_device_namespace: Dict[Tuple[str, str], Set[_CacheKey]] = {}
+        self._invalidated_at: Dict[Tuple[str, str], float] = {}
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _namespace_value(namespace: Union[Namespace, str]) -> str:
+        return namespace.value if isinstance(namespace, Namespace) else namespace
+
+    @classmethod
+    def _build_key(cls, device_uuid: str, namespace: Union[Namespace, str], payload: dict) -> _CacheKey:
+        return device_uuid, cls._namespace_value(namespace), json.dumps(payload, sort_keys=True)
+
+    def is_cacheable(self, namespace: Union[Namespace, str]) -> bool:
+        return self._namespace_value(namespace) in self._ttl_by_namespace
+
+    def get(self,
+            device_uuid: str,
+            namespace: Union[Namespace, str],
+            payload: dict,
+            max_age: Optional[float] = None) -> Optional[dict]:
+        """
+        Looks up a cached response.
+        :param device_uuid: uuid of the target device
+        :param namespace: namespace of the GET command
+        :param payload: payload of the GET command
+        :param max_age: maximum age in seconds of the response. The namespace TTL always applies.
+        :return: a copy of the cached response, or None when no valid response is cached
+        """
+        if not self.is_cacheable(namespace):
+            return None
+        key = self._build_key(device_uuid, namespace, payload)
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        age = time.monotonic() - entry.stored_at
+        ttl = self._ttl_by_namespace[key[1]]
+        expired = age > ttl or (key[1] in _DAY_BOUND_NAMESPACES and entry.stored_on != date.today())
+        if expired:
+            self._remove(key)
+            self._misses += 1
+            return None
+        if max_age is not None and age > max_age:
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return copy.deepcopy(entry.value)
+
+    def put(self,
+            device_uuid: str,
+            namespace: Union[Namespace, str],
+            payload: dict,
+            response: dict,
+            issued_at: Optional[float] = None) -> None:
+        """
+        Stores the response to a GET command, if its namespace is cacheable.
+        :param device_uuid: uuid of the target device
+        :param namespace: namespace of the GET command
+        :param payload: payload of the GET command
+        :param response: response payload
+        :param issued_at: time.monotonic() timestamp at which the command was issued. When an invalidation
+                          occurred after that instant, the response might be stale and is not stored.
+        """
+        if response is None or not self.is_cacheable(namespace):
+            return
+        key = self._build_key(device_uuid, namespace, payload)
+        invalidated_at = self._invalidated_at.get(key[:2])
+        if issued_at is not None and invalidated_at is not None and issued_at <= invalidated_at:
+            _LOGGER.debug("Discarding response to %s for device %s as it was invalidated while in flight",
+                          key[1], device_uuid)
+            return
+
+        self._entries[key] = _CacheEntry(value=copy.deepcopy(response), stored_at=time.monotonic(),
+                                         stored_on=date.today())
+        self._entries.move_to_end(key)
+        self._keys_by_device_namespace.setdefault(key[:2], set()).add(key)
+        while len(self._entries) > self._max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._evictions += 1
+
+    def invalidate(self, device_uuid: str, namespace: Optional[Union[Namespace, str]] = None) -> int:
+        """
+        Drops the cached responses of the given device.
+        :param device_uuid: uuid of the device
+        :param namespace: when set, only the responses to this namespace are dropped
+        :return: the number of dropped responses
+        """
+        if namespace is not None:
+            device_namespaces = [(device_uuid, self._namespace_value(namespace))]
+        else:
+            device_namespaces = [(device_uuid, ns) for ns in self._ttl_by_namespace.keys()]
+
+        dropped = 0
+        now = time.monotonic()
+        for device_namespace in device_namespaces:
+            if device_namespace[1] in self._ttl_by_namespace:
+                self._invalidated_at[device_namespace] = now
+            for key in list(self._keys_by_device_namespace.get(device_namespace, ())):
+                self._remove(key)
+                dropped += 1
+        self._invalidations += dropped
+        return dropped
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_device_namespace.clear()
+
+    def _remove(self, key: _CacheKey) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_device_namespace.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self._keys_by_device_namespace[key[:2]]
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def invalidations(self) -> int:
+        return self._invalidations
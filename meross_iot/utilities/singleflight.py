@@ -0,0 +1,64 @@
+import asyncio
+import copy
+from typing import Dict, Hashable, Callable, Awaitable, Any, Optional
+
+
+class SingleFlight(object):
+    """
+    Collapses identical concurrent calls into a single one.
+    The first caller for a given key starts the call; callers arriving while that call is still in flight
+    wait for it and receive a copy of its result (or the same exception).
+    """
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._coalesced_calls = 0
+
+    @property
+    def coalesced_calls(self) -> int:
+        """
+        Total number of calls that have been served by an already in-flight call
+        """
+        return self._coalesced_calls
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of calls currently in flight
+        """
+        return len(self._in_flight)
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    async def async_do(self, key: Hashable, coro_factory: Callable[[], Awaitable[Any]],
+                       timeout: Optional[float] = None) -> Any:
+        """
+        Runs the coroutine built by `coro_factory`, unless an identical call (same key) is already in flight.
+        The call runs in its own task, so cancelling one of the waiters does not affect the others.
+
+        :param key: key identifying identical calls
+        :param coro_factory: callable that builds the coroutine to run
+        :param timeout: when set, maximum time this caller waits for an already in-flight call
+        :return: the result of the call
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._release(key, t))
+            return await asyncio.shield(task)
+
+        self._coalesced_calls += 1
+        if timeout is None:
+            result = await asyncio.shield(task)
+        else:
+            result = await asyncio.wait_for(asyncio.shield(task), timeout)
+        # Followers get their own copy, so that nobody can alter the result seen by the others
+        return copy.deepcopy(result)
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception, if any, so that asyncio does not complain when no waiter is left
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,303 @@
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.generic import GenericPushNotification
+
+# Placeholder of the fields that are missing on either side of a diff
+MISSING = None
+
+_HUB_NAMESPACE_PREFIX = "Appliance.Hub."
+
+
+def _namespace_value(namespace: Union[Namespace, str]) -> str:
+    return namespace.value if isinstance(namespace, Namespace) else namespace
+
+
+def _strip(value: Any, ignored_keys: frozenset) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip(v, ignored_keys) for k, v in value.items() if k not in ignored_keys}
+    if isinstance(value, list):
+        return [_strip(v, ignored_keys) for v in value]
+    return value
+
+
+def _flatten(value: Any, prefix: str, out: Dict[str, Any]) -> None:
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        out[prefix] = value
+        return
+    for key, item in items:
+        _flatten(item, f"{prefix}.{key}" if prefix else str(key), out)
+
+
+def _split_subdevices(namespace: str, payload: Any) -> Optional[Dict[str, Dict]]:
+    # Hub payloads list the entries of their subdevices, e.g. {"togglex": [{"id": "sub1", ...}, ...]}: returns
+    # the entries of every subdevice, keyed by subdevice id, or None when the payload is not laid out that way
+    if not namespace.startswith(_HUB_NAMESPACE_PREFIX) or not isinstance(payload, dict) or not payload:
+        return None
+    subdevices = {}
+    for key, entries in payload.items():
+        if not isinstance(entries, list):
+            return None
+        for entry in entries:
+            if not isinstance(entry, dict) or "id" not in entry:
+                return None
+            subdevice_entries = subdevices.get(entry["id"])
+            if subdevice_entries is None:
+                subdevice_entries = {}
+                subdevices[entry["id"]] = subdevice_entries
+            subdevice_entries[key] = entry
+    return subdevices
+
+
+def _merge(recorded: Any, written: Any) -> Any:
+    # Applies a SET payload to a recorded push payload. SET payloads address list entries (e.g. the channels of
+    # a "togglex" push) with a single dict or a list of dicts, matched by "id" or "channel".
+    # Returns None when the written value cannot be placed.
+    if isinstance(recorded, dict) and isinstance(written, dict):
+        merged = dict(recorded)
+        for key, value in written.items():
+            if key in recorded:
+                value = _merge(recorded[key], value)
+                if value is None:
+                    return None
+            merged[key] = value
+        return merged
+    if isinstance(recorded, list) and isinstance(written, (dict, list)):
+        merged = list(recorded)
+        for item in (written if isinstance(written, list) else (written,)):
+            if not isinstance(item, dict):
+                return None
+            match_key = "id" if "id" in item else "channel"
+            index = next((i for i, entry in enumerate(merged)
+                          if isinstance(entry, dict) and match_key in item and entry.get(match_key) == item[match_key]),
+                         None)
+            if index is None:
+                return None
+            merged[index] = _merge(merged[index], item)
+            if merged[index] is None:
+                return None
+        return merged
+    return written
+
+
+class StateChange(object):
+    """
+    Outcome of the comparison of a push notification payload against the previous one of the same device and
+    namespace. The diff is only computed when first accessed.
+    """
+    def __init__(self, device_uuid: str, namespace: str, previous: Optional[Dict], current: Dict, verified: bool):
+        self.device_uuid = device_uuid
+        self.namespace = namespace
+        self.previous = previous
+        self.current = current
+        self.changed = previous != current
+        # False when the device state might have been written, since the previous payload, by something else
+        # than a push notification (e.g. a command response)
+        self.verified = verified
+        self._diff = None
+
+    @property
+    def suppressible(self) -> bool:
+        """
+        True when applying the payload to the device would not change its state
+        """
+        return self.verified and not self.changed
+
+    @property
+    def diff(self) -> Dict[str, Tuple[Any, Any]]:
+        """
+        Changed fields, keyed by dotted path (e.g. "togglex.0.onoff"), as (previous, current) tuples.
+        Fields missing on either side are reported as MISSING.
+        """
+        if self._diff is None:
+            previous, current = {}, {}
+            if self.previous is not None:
+                _flatten(self.previous, "", previous)
+            _flatten(self.current, "", current)
+            self._diff = {path: (previous.get(path, MISSING), current.get(path, MISSING))
+                          for path in {**previous, **current}
+                          if path not in previous or path not in current or previous[path] != current[path]}
+        return self._diff
+
+    def __repr__(self):
+        return f"StateChange(device_uuid={self.device_uuid}, namespace={self.namespace}, changed={self.changed})"
+
+
+class StateChangeStats(object):
+    """
+    Number of push notifications compared against the previous ones, and how many of them were unchanged
+    """
+    def __init__(self):
+        self.checked = 0
+        self.unchanged = 0
+        self.suppressed = 0
+
+    @property
+    def suppression_ratio(self) -> float:
+        return self.suppressed / self.checked if self.checked > 0 else 0.0
+
+    def __str__(self):
+        return f"checked: {self.checked}, unchanged: {self.unchanged}, suppressed: {self.suppressed} " \
+               f"({self.suppression_ratio * 100:.1f}%)"
+
+
+class StateFingerprints(object):
+    """
+    Keeps the last push notification payload of every device and namespace, so that re-pushed identical states
+    (e.g. SYSTEM_ONLINE repeats or unchanged HUB_SENSOR_ALL readings) are detected with a plain dict comparison.
+    Hub namespaces are tracked per subdevice, as every notification only carries the entries of some of them.
+    When `suppress_unchanged` is set, such notifications are not dispatched to the devices, as they would not
+    change their state. A successful SET command records the state it is expected to leave, so that the
+    notification the device echoes back is recognised as unchanged. When the outcome of a write cannot be
+    predicted (failed commands, discovery updates), the namespace is marked as unverified instead: its next
+    notification is always dispatched.
+    """
+    def __init__(self, suppress_unchanged: bool = False, ignored_keys: Iterable[str] = ()):
+        """
+        Constructor
+        :param suppress_unchanged: when set, unchanged push notifications are not dispatched to the devices
+        :param ignored_keys: payload keys left out of the comparison, at any depth (e.g. "syncedTime")
+        """
+        self._suppress_unchanged = suppress_unchanged
+        self._ignored_keys = frozenset(ignored_keys)
+        # Device uuid -> namespace -> subdevice id (None outside hub namespaces) -> [payload, verified]
+        self._states: Dict[str, Dict[str, Dict[Optional[str], list]]] = {}
+        self._stats: Dict[str, StateChangeStats] = {}
+
+    @property
+    def suppress_unchanged(self) -> bool:
+        return self._suppress_unchanged
+
+    def check(self, push_notification: GenericPushNotification) -> StateChange:
+        """
+        Compares the payload of the given notification against the previous one and records it
+        """
+        namespace = _namespace_value(push_notification.namespace)
+        device_uuid = push_notification.originating_device_uuid
+        current = push_notification.raw_data
+        if self._ignored_keys:
+            current = _strip(current, self._ignored_keys)
+
+        device_states = self._states.get(device_uuid)
+        if device_states is None:
+            device_states = {}
+            self._states[device_uuid] = device_states
+        slots = device_states.get(namespace)
+        if slots is None:
+            slots = {}
+            device_states[namespace] = slots
+
+        subdevices = _split_subdevices(namespace, current)
+        if subdevices is None:
+            state = slots.get(None)
+            if state is None:
+                change = StateChange(device_uuid, namespace, previous=None, current=current, verified=False)
+                slots[None] = [current, True]
+            else:
+                change = StateChange(device_uuid, namespace, previous=state[0], current=current, verified=state[1])
+                state[0] = current
+                state[1] = True
+        else:
+            change = self._check_subdevices(device_uuid, namespace, slots, current, subdevices)
+
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = StateChangeStats()
+            self._stats[namespace] = stats
+        stats.checked += 1
+        if not change.changed:
+            stats.unchanged += 1
+            if self._suppress_unchanged and change.suppressible:
+                stats.suppressed += 1
+        return change
+
+    @staticmethod
+    def _check_subdevices(device_uuid: str, namespace: str, slots: Dict[Optional[str], list], current: Dict,
+                          subdevices: Dict[str, Dict]) -> StateChange:
+        # The previous payload is rebuilt with the entries of the very subdevices the notification carries
+        verified = True
+        previous_entries = {}
+        for subdevice_id, entries in subdevices.items():
+            state = slots.get(subdevice_id)
+            if state is None:
+                verified = False
+                previous_entries[subdevice_id] = {}
+                slots[subdevice_id] = [entries, True]
+            else:
+                verified = verified and state[1]
+                previous_entries[subdevice_id] = state[0]
+                state[0] = entries
+                state[1] = True
+        previous = {key: [previous_entries[entry["id"]].get(key, {}) for entry in entries]
+                    for key, entries in current.items()}
+        return StateChange(device_uuid, namespace, previous=previous, current=current, verified=verified)
+
+    def expect(self, device_uuid: str, namespace: Union[Namespace, str], payload: Dict) -> None:
+        """
+        Records the state a successful SET command is expected to leave, merging its payload into the last known
+        one: the matching notification echoed back by the device is then reported as unchanged.
+        When the payload cannot be merged, the namespace is marked as unverified.
+        """
+        namespace = _namespace_value(namespace)
+        slots = self._states.get(device_uuid, {}).get(namespace)
+        if not slots:
+            # Nothing to compare the echoed notification against: it will be unverified anyway
+            return
+        if self._ignored_keys:
+            payload = _strip(payload, self._ignored_keys)
+
+        subdevices = _split_subdevices(namespace, payload)
+        written = {None: payload} if subdevices is None else subdevices
+        for slot_key, slot_payload in written.items():
+            state = slots.get(slot_key)
+            if state is None:
+                continue
+            expected = _merge(state[0], slot_payload)
+            if expected is None:
+                state[1] = False
+            else:
+                state[0] = expected
+
+    def invalidate(self, device_uuid: str, namespace: Optional[Union[Namespace, str]] = None) -> None:
+        """
+        Marks the state of the device as possibly written by something else than a push notification
+        :param device_uuid: uuid of the device
+        :param namespace: when set, only the state of this namespace is marked
+        """
+        device_states = self._states.get(device_uuid)
+        if device_states is None:
+            return
+        if namespace is None:
+            namespaces = device_states.values()
+        else:
+            namespaces = (device_states.get(_namespace_value(namespace), {}),)
+        for slots in namespaces:
+            for state in slots.values():
+                state[1] = False
+
+    def forget(self, device_uuid: str) -> None:
+        """
+        Drops every payload recorded for the given device
+        """
+        self._states.pop(device_uuid, None)
+
+    def get_stats(self) -> Dict[str, StateChangeStats]:
+        """
+        Returns the comparison counters, keyed by namespace
+        """
+        return dict(self._stats)
+
+    def get_overall_stats(self) -> StateChangeStats:
+        """
+        Returns the comparison counters summed over all the namespaces
+        """
+        overall = StateChangeStats()
+        for stats in self._stats.values():
+            overall.checked += stats.checked
+            overall.unchanged += stats.unchanged
+            overall.suppressed += stats.suppressed
+        return overall
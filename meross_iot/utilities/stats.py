@@ -1,7 +1,8 @@
+import math
 import time
-from collections import deque
+import warnings
 from datetime import timedelta
-from typing import Optional, Deque, Dict, ItemsView
+from typing import Optional, Dict, ItemsView, Hashable, List, Callable
 
 from meross_iot.model.http.error_codes import ErrorCodes
 
@@ -118,19 +119,22 @@ class HttpStat:
         self._by_api_response_code: Dict[ErrorCodes, int] = {}
 
     def add(self, sample: HttpRequestSample) -> None:
-        self._total_api_calls += 1
+        self.add_calls(http_response_code=sample.http_response_code, api_response_code=sample.api_response_code)
+
+    def add_calls(self, http_response_code: int, api_response_code: ErrorCodes, count: int = 1) -> None:
+        self._total_api_calls += count
 
         # Aggregate by HTTP response code
-        if sample.http_response_code not in self._by_http_response_code:
-            self._by_http_response_code[sample.http_response_code] = 1
+        if http_response_code not in self._by_http_response_code:
+            self._by_http_response_code[http_response_code] = count
         else:
-            self._by_http_response_code[sample.http_response_code] += 1
+            self._by_http_response_code[http_response_code] += count
 
         # Aggregate by API response code
-        if sample.api_response_code not in self._by_api_response_code:
-            self._by_api_response_code[sample.api_response_code] = 1
+        if api_response_code not in self._by_api_response_code:
+            self._by_api_response_code[api_response_code] = count
         else:
-            self._by_api_response_code[sample.api_response_code] += 1
+            self._by_api_response_code[api_response_code] += count
 
     @property
     def total_calls(self) -> int:
@@ -168,13 +172,16 @@ class ApiStat:
         self._by_method_namespace: Dict[str, int] = {}
 
     def add(self, sample: ApiCallSample) -> None:
-        self._total_api_calls += 1
+        self.add_calls(method=sample.method, namespace=sample.namespace)
+
+    def add_calls(self, method: str, namespace: str, count: int = 1) -> None:
+        self._total_api_calls += count
 
-        method_ns = f"{sample.method} {sample.namespace}"
+        method_ns = f"{method} {namespace}"
         if method_ns not in self._by_method_namespace:
-            self._by_method_namespace[method_ns] = 1
+            self._by_method_namespace[method_ns] = count
         else:
-            self._by_method_namespace[method_ns] += 1
+            self._by_method_namespace[method_ns] += count
 
     @property
     def total_calls(self) -> int:
@@ -204,12 +211,16 @@ class HttpStatsResult:
         self._by_url: Dict[str, HttpStat] = {}
 
     def add(self, sample: HttpRequestSample):
-        self._global.add(sample)
-        byurl = self._by_url.get(sample.url)
+        self.add_calls(url=sample.url, http_response_code=sample.http_response_code,
+                       api_response_code=sample.api_response_code)
+
+    def add_calls(self, url: str, http_response_code: int, api_response_code: ErrorCodes, count: int = 1):
+        self._global.add_calls(http_response_code, api_response_code, count)
+        byurl = self._by_url.get(url)
         if byurl is None:
             byurl = HttpStat()
-            self._by_url[sample.url] = byurl
-        byurl.add(sample)
+            self._by_url[url] = byurl
+        byurl.add_calls(http_response_code, api_response_code, count)
 
     @property
     def global_stats(self) -> HttpStat:
@@ -248,12 +259,15 @@ class ApiStatsResult:
         self._by_uuid: Dict[str, ApiStat] = {}
 
     def add(self, sample: ApiCallSample):
-        self._global.add(sample)
-        byuuid = self._by_uuid.get(sample.device_uuid)
+        self.add_calls(device_uuid=sample.device_uuid, method=sample.method, namespace=sample.namespace)
+
+    def add_calls(self, device_uuid: str, method: str, namespace: str, count: int = 1):
+        self._global.add_calls(method, namespace, count)
+        byuuid = self._by_uuid.get(device_uuid)
         if byuuid is None:
             byuuid = ApiStat()
-            self._by_uuid[sample.device_uuid] = byuuid
-        byuuid.add(sample)
+            self._by_uuid[device_uuid] = byuuid
+        byuuid.add_calls(method, namespace, count)
 
     @property
     def global_stats(self) -> ApiStat:
@@ -283,111 +297,256 @@ class ApiStatsResult:
                f"--------\n"
 
 
+class TimeBucketedCounter:
+    """
+    Counts keyed events within fixed-size time buckets, arranged in a ring spanning the retention period.
+    Recording an event costs O(1) and memory does not depend on the event rate, while aggregating a time window
+    only visits the buckets it spans. Windows are rounded up to whole buckets and capped to the retention period.
+    """
+    def __init__(self,
+                 bucket_seconds: float = 1.0,
+                 retention: timedelta = timedelta(hours=1),
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Constructor
+        :param bucket_seconds: time span of every bucket, i.e. the resolution of the time windows
+        :param retention: longest time window that can be aggregated
+        :param clock: function returning the current time in seconds
+        """
+        if bucket_seconds <= 0:
+            raise ValueError("bucket_seconds must be a positive number")
+        self._bucket_seconds = bucket_seconds
+        self._size = max(1, math.ceil(retention.total_seconds() / bucket_seconds))
+        self._clock = clock
+        # Bucket dicts are allocated lazily and cleared, rather than replaced, when their slot is reused
+        self._epochs: List[Optional[int]] = [None] * self._size
+        self._buckets: List[Optional[Dict[Hashable, int]]] = [None] * self._size
+
+    @property
+    def retention(self) -> timedelta:
+        return timedelta(seconds=self._size * self._bucket_seconds)
+
+    def _current_epoch(self) -> int:
+        return int(self._clock() // self._bucket_seconds)
+
+    def add(self, key: Hashable, count: int = 1) -> None:
+        epoch = self._current_epoch()
+        slot = epoch % self._size
+        bucket = self._buckets[slot]
+        if self._epochs[slot] != epoch:
+            self._epochs[slot] = epoch
+            if bucket is None:
+                bucket = {}
+                self._buckets[slot] = bucket
+            else:
+                bucket.clear()
+        bucket[key] = bucket.get(key, 0) + count
+
+    def get_counts(self, time_window: timedelta) -> Dict[Hashable, int]:
+        """
+        Returns the number of events recorded within the given time window, by key
+        """
+        epoch = self._current_epoch()
+        spanned = min(self._size, max(1, math.ceil(time_window.total_seconds() / self._bucket_seconds)))
+        counts: Dict[Hashable, int] = {}
+        for bucket_epoch in range(epoch - spanned + 1, epoch + 1):
+            slot = bucket_epoch % self._size
+            if self._epochs[slot] != bucket_epoch:
+                continue
+            for key, count in self._buckets[slot].items():
+                counts[key] = counts.get(key, 0) + count
+        return counts
+
+
+def _warn_max_samples(max_samples: Optional[int]) -> None:
+    if max_samples is not None:
+        warnings.warn("max_samples is ignored: the statistics are now counted in time buckets, "
+                      "see bucket_seconds and retention", DeprecationWarning, stacklevel=3)
+
+
 class HttpStatsCounter:
     """
     Helper class to keep track and calculate statistics for sent HTTP requests
     """
-    def __init__(self, max_samples=1000):
-        self._samples: Deque[HttpRequestSample] = deque([], maxlen=max_samples)
+    def __init__(self, max_samples: Optional[int] = None, bucket_seconds: float = 1.0,
+                 retention: timedelta = timedelta(hours=1)):
+        """
+        Constructor
+        :param max_samples: deprecated and ignored, the statistics are no longer kept as a bounded list of samples
+        :param bucket_seconds: resolution, in seconds, of the statistics time windows
+        :param retention: longest time window the statistics can be computed on
+        """
+        _warn_max_samples(max_samples)
+        self._requests = TimeBucketedCounter(bucket_seconds=bucket_seconds, retention=retention)
 
     def notify_http_request(self, request_url: str, method: str, http_response_code: int, api_response_code: Optional[ErrorCodes]):
-        sample = HttpRequestSample(
-            url=request_url,
-            method=method,
-            http_response_code=http_response_code,
-            api_response_code=api_response_code,
-            timestamp=time.time()
-        )
-        self._samples.append(sample)
-
-    def _get_stats(self, samples: Deque[HttpRequestSample], time_window: timedelta = timedelta(minutes=1)) -> HttpStatsResult:
-        result = HttpStatsResult()
-        lower_limit = time.time() - time_window.total_seconds()
-        for sample in reversed(samples):
-            if sample.timestamp > lower_limit:
-                result.add(sample)
-
-        return result
+        self._requests.add((request_url, http_response_code, api_response_code))
 
     def get_stats(self, time_window: timedelta = timedelta(minutes=1)) -> HttpStatsResult:
         """
         Returns the statistics of sent MQTT messages to the MQTT broker
         """
-        return self._get_stats(samples=self._samples, time_window=time_window)
+        result = HttpStatsResult()
+        for (url, http_response_code, api_response_code), count in self._requests.get_counts(time_window).items():
+            result.add_calls(url=url, http_response_code=http_response_code, api_response_code=api_response_code,
+                             count=count)
+        return result
 
 
 class ApiCounter:
     """
     Helper class to keep track and calculate statistics for sent MQTT message
     """
-    def __init__(self, max_samples=1000):
-        self.api_calls: Deque[ApiCallSample] = deque([], maxlen=max_samples)
-        self.delayed_calls: Deque[ApiCallSample] = deque([], maxlen=max_samples)
-        self.dropped_calls: Deque[ApiCallSample] = deque([], maxlen=max_samples)
+    def __init__(self, max_samples: Optional[int] = None, bucket_seconds: float = 1.0,
+                 retention: timedelta = timedelta(hours=1)):
+        """
+        Constructor
+        :param max_samples: deprecated and ignored, the statistics are no longer kept as a bounded list of samples
+        :param bucket_seconds: resolution, in seconds, of the statistics time windows
+        :param retention: longest time window the statistics can be computed on
+        """
+        _warn_max_samples(max_samples)
+        self.api_calls = TimeBucketedCounter(bucket_seconds=bucket_seconds, retention=retention)
+        self.delayed_calls = TimeBucketedCounter(bucket_seconds=bucket_seconds, retention=retention)
+        self.dropped_calls = TimeBucketedCounter(bucket_seconds=bucket_seconds, retention=retention)
+        self.coalesced_calls = TimeBucketedCounter(bucket_seconds=bucket_seconds, retention=retention)
 
     def notify_api_call(self, device_uuid: str, namespace: str, method: str):
         """
         Method called internally by the manager itself, whenever a message is sent to the
         MQTT broker.
         """
-        sample = ApiCallSample(
-            device_uuid=device_uuid,
-            namespace=namespace,
-            method=method,
-            timestamp=time.time()
-        )
-        self.api_calls.append(sample)
+        self.api_calls.add((device_uuid, method, namespace))
 
     def notify_delayed_call(self, device_uuid: str, namespace: str, method: str):
         """
         Method called internally by the manager itself, whenever a message is delayed instead of being sent to the
         MQTT broker.
         """
-        sample = ApiCallSample(
-            device_uuid=device_uuid,
-            namespace=namespace,
-            method=method,
-            timestamp=time.time()
-        )
-        self.delayed_calls.append(sample)
+        self.delayed_calls.add((device_uuid, method, namespace))
 
     def notify_dropped_call(self, device_uuid: str, namespace: str, method: str):
         """
         Method called internally by the manager itself, whenever a message is dropped instead of being sent to the
         MQTT broker.
         """
-        sample = ApiCallSample(
-            device_uuid=device_uuid,
-            namespace=namespace,
-            method=method,
-            timestamp=time.time()
-        )
-        self.dropped_calls.append(sample)
+        self.dropped_calls.add((device_uuid, method, namespace))
 
-    def _get_stats(self, api_samples: Deque[ApiCallSample], time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
-        result = ApiStatsResult()
-        lower_limit = time.time() - time_window.total_seconds()
-        for sample in reversed(api_samples):
-            if sample.timestamp > lower_limit:
-                result.add(sample)
+    def notify_coalesced_call(self, device_uuid: str, namespace: str, method: str):
+        """
+        Method called internally by the manager itself, whenever a message is not sent to the
+        MQTT broker because an identical one was already in flight.
+        """
+        self.coalesced_calls.add((device_uuid, method, namespace))
 
+    def _get_stats(self, counter: TimeBucketedCounter, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
+        result = ApiStatsResult()
+        for (device_uuid, method, namespace), count in counter.get_counts(time_window).items():
+            result.add_calls(device_uuid=device_uuid, method=method, namespace=namespace, count=count)
         return result
 
     def get_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
         """
         Returns the statistics of sent MQTT messages to the MQTT broker
         """
-        return self._get_stats(api_samples=self.api_calls, time_window=time_window)
+        return self._get_stats(counter=self.api_calls, time_window=time_window)
 
     def get_delayed_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
         """
         Returns the statistics of delayed MQTT messages to the MQTT broker
         """
-        return self._get_stats(api_samples=self.delayed_calls, time_window=time_window)
+        return self._get_stats(counter=self.delayed_calls, time_window=time_window)
 
     def get_dropped_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
         """
         Returns the statistics of dropped MQTT messages to the MQTT broker
         """
-        return self._get_stats(api_samples=self.dropped_calls, time_window=time_window)
+        return self._get_stats(counter=self.dropped_calls, time_window=time_window)
+
+    def get_coalesced_api_stats(self, time_window: timedelta = timedelta(minutes=1)) -> ApiStatsResult:
+        """
+        Returns the statistics of MQTT messages that were served by an identical in-flight message
+        """
+        return self._get_stats(counter=self.coalesced_calls, time_window=time_window)
+
+
+class DiscoveryStats:
+    """
+    Timing breakdown of a device discovery run
+    """
+    def __init__(self):
+        self._phase_durations: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._started_at = time.monotonic()
+        self._total_duration: Optional[float] = None
+        self._snapshot_hits = 0
+        self._snapshot_misses = 0
+
+    def notify_phase_duration(self, phase: str, duration: float) -> None:
+        self._phase_durations[phase] = self._phase_durations.get(phase, 0) + duration
+
+    def notify_failure(self, phase: str) -> None:
+        self._failures[phase] = self._failures.get(phase, 0) + 1
+
+    def notify_snapshot_lookup(self, hit: bool) -> None:
+        if hit:
+            self._snapshot_hits += 1
+        else:
+            self._snapshot_misses += 1
+
+    def notify_done(self) -> None:
+        self._total_duration = time.monotonic() - self._started_at
+
+    @property
+    def phase_durations(self) -> Dict[str, float]:
+        """
+        Wall-clock duration in seconds of every discovery phase
+        :return:
+        """
+        return dict(self._phase_durations)
+
+    @property
+    def failures(self) -> Dict[str, int]:
+        """
+        Number of devices that failed, by discovery phase
+        :return:
+        """
+        return dict(self._failures)
+
+    @property
+    def total_duration(self) -> Optional[float]:
+        """
+        Wall-clock duration in seconds of the whole discovery, None while the discovery is still running
+        :return:
+        """
+        return self._total_duration
+
+    @property
+    def snapshot_hits(self) -> int:
+        """
+        Number of new devices built from the abilities recorded in the device snapshot
+        :return:
+        """
+        return self._snapshot_hits
+
+    @property
+    def snapshot_misses(self) -> int:
+        """
+        Number of new devices whose abilities were not found (or were outdated) in the device snapshot
+        :return:
+        """
+        return self._snapshot_misses
+
+    @property
+    def warm_start(self) -> bool:
+        """
+        True when every new device has been built from the device snapshot
+        :return:
+        """
+        return self._snapshot_hits > 0 and self._snapshot_misses == 0
 
+    def __str__(self):
+        phases = ", ".join(f"{phase}: {duration:.3f}s" for phase, duration in self._phase_durations.items())
+        total = f"{self._total_duration:.3f}s" if self._total_duration is not None else "n/a"
+        return f"Discovery took {total} ({phases}), failures: {self._failures}, " \
+               f"snapshot hits/misses: {self._snapshot_hits}/{self._snapshot_misses}"
@@ -0,0 +1,147 @@
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+from meross_iot.model.constants import DEFAULT_COMMAND_TIMEOUT
+
+
+class Transport(Enum):
+    """
+    Transport a command is sent through
+    """
+    LAN_HTTP = "LAN_HTTP"
+    MQTT = "MQTT"
+
+
+class RttEstimator(object):
+    """
+    Round-trip time estimator, computing the retransmission timeout as TCP does (RFC 6298): a smoothed RTT and
+    its mean deviation are updated as exponentially weighted moving averages of the samples, and the timeout is
+    SRTT + K * RTTVAR. Every timeout doubles the timeout (exponential backoff) until the next sample.
+    """
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial_timeout: float):
+        self._initial_timeout = initial_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.samples = 0
+        self.timeouts = 0
+        self.backoff = 1
+
+    def notify_sample(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+        self.backoff = 1
+
+    def notify_timeout(self) -> None:
+        self.timeouts += 1
+        self.backoff = min(self.backoff * 2, 64)
+
+    @property
+    def timeout(self) -> float:
+        """
+        Unbounded timeout derived from the samples, or the initial timeout when no sample was collected
+        """
+        base = self._initial_timeout if self.srtt is None else self.srtt + self.K * self.rttvar
+        return base * self.backoff
+
+
+class RttEstimate(object):
+    """
+    Snapshot of the round-trip time estimates of a device over a transport
+    """
+    def __init__(self, srtt: Optional[float], rttvar: Optional[float], timeout: float, samples: int, timeouts: int):
+        self.srtt = srtt
+        self.rttvar = rttvar
+        self.timeout = timeout
+        self.samples = samples
+        self.timeouts = timeouts
+
+    def __repr__(self):
+        srtt = f"{self.srtt * 1000:.1f}ms" if self.srtt is not None else "n/a"
+        rttvar = f"{self.rttvar * 1000:.1f}ms" if self.rttvar is not None else "n/a"
+        return f"srtt: {srtt}, rttvar: {rttvar}, timeout: {self.timeout:.3f}s, samples: {self.samples}, " \
+               f"timeouts: {self.timeouts}"
+
+
+_DEFAULT_INITIAL_TIMEOUTS = {
+    Transport.LAN_HTTP: 1.0,
+    Transport.MQTT: DEFAULT_COMMAND_TIMEOUT
+}
+
+
+class AdaptiveTimeouts(object):
+    """
+    Derives the command timeouts of every device and transport from the observed round-trip times.
+    Until a device answers for the first time over a transport, the initial timeout of that transport is used.
+    Effective timeouts are always bounded by min_timeout and max_timeout.
+    """
+    def __init__(self,
+                 min_timeout: float = 0.5,
+                 max_timeout: float = 30.0,
+                 initial_timeouts: Optional[Dict[Transport, float]] = None):
+        """
+        Constructor
+        :param min_timeout: lower bound of the effective timeouts, in seconds
+        :param max_timeout: upper bound of the effective timeouts, in seconds
+        :param initial_timeouts: timeout of every transport, in seconds, used until the first RTT sample is
+                                 collected. Defaults to 1s for LAN HTTP and 10s for MQTT.
+        """
+        if min_timeout <= 0 or max_timeout < min_timeout:
+            raise ValueError("min_timeout must be positive and not greater than max_timeout")
+        self._min_timeout = min_timeout
+        self._max_timeout = max_timeout
+        self._initial_timeouts = dict(_DEFAULT_INITIAL_TIMEOUTS)
+        if initial_timeouts is not None:
+            self._initial_timeouts.update(initial_timeouts)
+        self._estimators: Dict[Tuple[str, Transport], RttEstimator] = {}
+
+    def _get_estimator(self, device_uuid: str, transport: Transport) -> RttEstimator:
+        key = (device_uuid, transport)
+        estimator = self._estimators.get(key)
+        if estimator is None:
+            estimator = RttEstimator(initial_timeout=self._initial_timeouts[transport])
+            self._estimators[key] = estimator
+        return estimator
+
+    def get_timeout(self, device_uuid: str, transport: Transport) -> float:
+        """
+        Returns the timeout to apply to the next command sent to the device over the given transport
+        """
+        estimator = self._estimators.get((device_uuid, transport))
+        timeout = estimator.timeout if estimator is not None else self._initial_timeouts[transport]
+        return min(self._max_timeout, max(self._min_timeout, timeout))
+
+    def notify_rtt(self, device_uuid: str, transport: Transport, rtt: float) -> None:
+        """
+        Records the round-trip time of a command answered by the device
+        """
+        self._get_estimator(device_uuid, transport).notify_sample(rtt)
+
+    def notify_timeout(self, device_uuid: str, transport: Transport) -> None:
+        """
+        Records a command the device did not answer in time
+        """
+        self._get_estimator(device_uuid, transport).notify_timeout()
+
+    def get_estimate(self, device_uuid: str, transport: Transport) -> RttEstimate:
+        """
+        Returns the current round-trip time estimates of the device over the given transport
+        """
+        estimator = self._get_estimator(device_uuid, transport)
+        return RttEstimate(srtt=estimator.srtt, rttvar=estimator.rttvar,
+                           timeout=self.get_timeout(device_uuid, transport),
+                           samples=estimator.samples, timeouts=estimator.timeouts)
+
+    def get_estimates(self) -> Dict[Tuple[str, Transport], RttEstimate]:
+        """
+        Returns the round-trip time estimates of every device and transport observed so far
+        """
+        return {key: self.get_estimate(*key) for key in list(self._estimators)}
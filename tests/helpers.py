@@ -0,0 +1,93 @@
+"""
+Offline fakes shared by the tests exercising the manager without a Meross account, broker or device
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Optional
+
+from meross_iot.http_api import MerossHttpClient
+from meross_iot.manager import MerossManager
+from meross_iot.model.credentials import MerossCloudCreds
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+MQTT_DOMAIN = "mqtt.example.com"
+BROKER = f"{MQTT_DOMAIN}:443"
+
+
+def build_creds(key: str = "key") -> MerossCloudCreds:
+    return MerossCloudCreds(token="token", key=key, user_id="1", user_email="user@example.com",
+                            issued_on=datetime.utcnow(), domain="https://iot.meross.com", mqtt_domain=MQTT_DOMAIN)
+
+
+def build_manager(key: str = "key", **kwargs) -> MerossManager:
+    """
+    Builds a manager bound to the running event loop
+    """
+    kwargs.setdefault("loop", asyncio.get_running_loop())
+    return MerossManager(http_client=MerossHttpClient(cloud_credentials=build_creds(key)), **kwargs)
+
+
+def build_http_device_info(uuid: str, device_type: str = "mss310", dev_name: Optional[str] = None) -> HttpDeviceInfo:
+    return HttpDeviceInfo(uuid=uuid, online_status=OnlineStatus.ONLINE, dev_name=dev_name or uuid,
+                          device_type=device_type, channels=[{}], fmware_version="1.0.0", hdware_version="1.0.0",
+                          domain=MQTT_DOMAIN, reserved_domain=MQTT_DOMAIN)
+
+
+class FakeMqttClient:
+    """
+    Fake MQTT client recording the published messages. When ack_delay is set, the device answers every command
+    after that delay, with ack_payload or, when ack_error is set, with that error.
+    """
+    def __init__(self, manager: Optional[MerossManager] = None, ack_delay: Optional[float] = None,
+                 ack_payload: Optional[dict] = None):
+        self.manager = manager
+        self.ack_delay = ack_delay
+        self.ack_payload = ack_payload if ack_payload is not None else {}
+        self.ack_error: Optional[Exception] = None
+        self.connected = True
+        self.published = []
+
+    def is_connected(self):
+        return self.connected
+
+    def publish(self, topic, payload):
+        self.published.append((topic, payload))
+        if self.ack_delay is not None:
+            message_id = json.loads(payload)["header"]["messageId"]
+            asyncio.get_running_loop().call_later(self.ack_delay, self.ack, message_id)
+
+    def ack(self, message_id: str) -> None:
+        command = self.manager.pending_commands.pop(message_id)
+        if command is None:
+            return
+        if self.ack_error is not None:
+            command.future.set_exception(self.ack_error)
+        else:
+            command.future.set_result({"payload": self.ack_payload})
+
+    def ack_published(self, index: int) -> None:
+        """
+        Answers the index-th published message
+        """
+        self.ack(json.loads(self.published[index][1])["header"]["messageId"])
+
+
+def connect_fake_mqtt_client(manager: MerossManager, client: Optional[FakeMqttClient] = None) -> FakeMqttClient:
+    """
+    Makes the manager send its MQTT commands through the given (or a new) fake client, as if it was connected
+    """
+    if client is None:
+        client = FakeMqttClient(manager)
+    client.manager = manager
+    manager._mqtt_clients[BROKER] = client
+    conn_evt = asyncio.Event()
+    conn_evt.set()
+    manager._mqtt_connected_and_subscribed[BROKER] = conn_evt
+
+    async def get_client(domain, port):
+        return client
+
+    manager._async_get_create_mqtt_client = get_client
+    return client
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from meross_iot.model.constants import DEFAULT_COMMAND_TIMEOUT
+from meross_iot.model.enums import Namespace
+from meross_iot.model.exception import CommandTimeoutError
+from meross_iot.utilities.timeouts import AdaptiveTimeouts, RttEstimator, Transport
+from tests.helpers import build_manager, connect_fake_mqtt_client
+
+
+class TestAdaptiveTimeouts:
+    def test_estimator_follows_rfc6298(self):
+        estimator = RttEstimator(initial_timeout=1.0)
+        assert estimator.timeout == 1.0
+
+        estimator.notify_sample(0.1)
+        assert estimator.srtt == pytest.approx(0.1)
+        assert estimator.rttvar == pytest.approx(0.05)
+        assert estimator.timeout == pytest.approx(0.3)
+
+        estimator.notify_sample(0.2)
+        assert estimator.rttvar == pytest.approx(0.75 * 0.05 + 0.25 * 0.1)
+        assert estimator.srtt == pytest.approx(0.875 * 0.1 + 0.125 * 0.2)
+
+        base = estimator.timeout
+        estimator.notify_timeout()
+        estimator.notify_timeout()
+        assert estimator.timeout == pytest.approx(base * 4)
+        estimator.notify_sample(0.1)
+        assert estimator.backoff == 1
+
+    def test_timeouts_are_bounded_and_tracked_per_device_and_transport(self):
+        timeouts = AdaptiveTimeouts(min_timeout=0.5, max_timeout=5.0)
+        assert timeouts.get_timeout("uuid", Transport.LAN_HTTP) == 1.0
+        assert timeouts.get_timeout("uuid", Transport.MQTT) == 5.0
+
+        for _ in range(20):
+            timeouts.notify_rtt("uuid", Transport.LAN_HTTP, 0.01)
+        assert timeouts.get_timeout("uuid", Transport.LAN_HTTP) == 0.5
+        assert timeouts.get_timeout("other", Transport.LAN_HTTP) == 1.0
+
+        timeouts.notify_rtt("uuid", Transport.MQTT, 1.0)
+        for _ in range(5):
+            timeouts.notify_timeout("uuid", Transport.MQTT)
+        estimate = timeouts.get_estimate("uuid", Transport.MQTT)
+        assert estimate.timeout == 5.0
+        assert (estimate.samples, estimate.timeouts) == (1, 5)
+        assert set(timeouts.get_estimates()) == {("uuid", Transport.LAN_HTTP), ("uuid", Transport.MQTT)}
+
+        with pytest.raises(ValueError):
+            AdaptiveTimeouts(min_timeout=2.0, max_timeout=1.0)
+
+    def test_manager_feeds_and_applies_the_estimates(self):
+        async def run():
+            timeouts = AdaptiveTimeouts(min_timeout=0.05, initial_timeouts={Transport.MQTT: 0.05})
+            manager = build_manager(adaptive_timeouts=timeouts)
+            client = connect_fake_mqtt_client(manager)
+            effective_timeout = manager._get_command_timeout("uuid", Transport.MQTT, None)
+            with pytest.raises(CommandTimeoutError):
+                await manager.async_execute_cmd_client(client=client, destination_device_uuid="uuid", method="GET",
+                                                       namespace=Namespace.SYSTEM_ALL, payload={},
+                                                       timeout=effective_timeout)
+
+            task = asyncio.ensure_future(manager.async_execute_cmd_client(
+                client=client, destination_device_uuid="uuid", method="GET", namespace=Namespace.SYSTEM_ALL,
+                payload={}, timeout=1.0))
+            await asyncio.sleep(0.02)
+            manager.pending_commands.commands()[0].future.set_result({"payload": {}})
+            await task
+            return manager, timeouts
+
+        manager, timeouts = asyncio.run(run())
+        estimate = timeouts.get_estimate("uuid", Transport.MQTT)
+        assert (estimate.samples, estimate.timeouts) == (1, 1)
+        assert estimate.srtt >= 0.02
+
+        # Explicit timeouts override the estimates, LAN attempts stay capped by them
+        assert manager._get_command_timeout("uuid", Transport.MQTT, 7.0) == 7.0
+        assert manager._get_command_timeout("uuid", Transport.LAN_HTTP, 7.0) == 1.0
+        assert manager._get_command_timeout("uuid", Transport.LAN_HTTP, 0.2) == 0.2
+
+    def test_manager_without_adaptive_timeouts_keeps_the_fixed_defaults(self):
+        async def run():
+            return build_manager()
+
+        manager = asyncio.run(run())
+        assert manager._get_command_timeout("uuid", Transport.MQTT, None) == DEFAULT_COMMAND_TIMEOUT
+        assert manager._get_command_timeout("uuid", Transport.LAN_HTTP, None) == 1.0
+        assert manager._get_command_timeout("uuid", Transport.MQTT, 3.0) == 3.0
+
+    def test_public_api_applies_the_adaptive_timeout_by_default(self):
+        async def run():
+            timeouts = AdaptiveTimeouts(min_timeout=0.05, initial_timeouts={Transport.MQTT: 0.05})
+            manager = build_manager(adaptive_timeouts=timeouts)
+            connect_fake_mqtt_client(manager)
+            with pytest.raises(CommandTimeoutError) as error:
+                await manager.async_execute_cmd(mqtt_hostname="mqtt.example.com", mqtt_port=443,
+                                                destination_device_uuid="uuid", method="SET",
+                                                namespace=Namespace.CONTROL_TOGGLEX, payload={})
+            return error.value
+
+        assert asyncio.run(run()).timeout == 0.05
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from meross_iot.device_factory import build_meross_device_from_abilities
+from meross_iot.model.enums import Namespace, OnlineStatus
+from meross_iot.model.exception import CommandTimeoutError, CircuitOpenError
+from meross_iot.model.push.online import OnlinePushNotification
+from meross_iot.utilities.circuit_breaker import CircuitBreaker, CircuitState
+from tests.helpers import build_http_device_info, build_manager
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_timeouts_and_recovers_through_a_probe(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+        for _ in range(2):
+            breaker.before_call("uuid")
+            breaker.notify_failure("uuid")
+        assert breaker.get_state("uuid") == CircuitState.OPEN
+        with pytest.raises(CircuitOpenError) as e:
+            breaker.before_call("uuid")
+        assert e.value.retry_after > 0
+        assert breaker.get_state("other") == CircuitState.CLOSED
+
+        time.sleep(0.06)
+        assert breaker.get_state("uuid") == CircuitState.HALF_OPEN
+        breaker.before_call("uuid")
+        # Only a single probe at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call("uuid")
+        # A failed probe re-opens the circuit
+        breaker.notify_failure("uuid")
+        assert breaker.get_state("uuid") == CircuitState.OPEN
+
+        time.sleep(0.06)
+        breaker.before_call("uuid")
+        breaker.notify_success("uuid")
+        assert breaker.get_state("uuid") == CircuitState.CLOSED
+        assert breaker.rejected_calls == 2
+
+    def test_online_status_drives_the_circuit(self):
+        breaker = CircuitBreaker()
+        breaker.notify_online_status("uuid", OnlineStatus.UNKNOWN)
+        assert breaker.get_state("uuid") == CircuitState.CLOSED
+        breaker.notify_online_status("uuid", OnlineStatus.OFFLINE)
+        assert breaker.get_state("uuid") == CircuitState.OPEN
+        assert breaker.get_open_reason("uuid") == "device reported offline"
+        breaker.notify_online_status("uuid", OnlineStatus.ONLINE)
+        assert breaker.get_state("uuid") == CircuitState.CLOSED
+
+    def test_manager_rejects_commands_to_unreachable_devices(self):
+        async def run():
+            manager = build_manager(circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60))
+            sent = []
+
+            async def fake_execute_cmd(destination_device_uuid, namespace, timeout, **kwargs):
+                sent.append(namespace)
+                raise CommandTimeoutError(message="", target_device_uuid=destination_device_uuid, timeout=timeout)
+
+            manager._async_execute_cmd = fake_execute_cmd
+
+            async def send():
+                return await manager.async_execute_cmd(mqtt_hostname="mqtt.example.com", mqtt_port=443,
+                                                       destination_device_uuid="uuid", method="SET",
+                                                       namespace=Namespace.CONTROL_TOGGLEX, payload={}, timeout=1)
+
+            for _ in range(2):
+                with pytest.raises(CommandTimeoutError):
+                    await send()
+            with pytest.raises(CircuitOpenError):
+                await send()
+            assert len(sent) == 2
+            device = build_meross_device_from_abilities(build_http_device_info("uuid"), {Namespace.SYSTEM_ALL.value: {}},
+                                                        manager=manager)
+            assert device.circuit_state == CircuitState.OPEN
+
+            # The device reports to be online again
+            await manager._handle_and_dispatch_push_notification(
+                OnlinePushNotification(originating_device_uuid="uuid", raw_data={'online': {'status': 1}}))
+            assert manager.circuit_breaker.get_state("uuid") == CircuitState.CLOSED
+            with pytest.raises(CommandTimeoutError):
+                await send()
+            assert len(sent) == 3
+
+        asyncio.run(run())
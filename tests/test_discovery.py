@@ -0,0 +1,84 @@
+import asyncio
+
+from meross_iot.model.exception import CommandTimeoutError
+from tests.helpers import build_http_device_info, build_manager
+
+_ABILITIES = {"Appliance.System.All": {}, "Appliance.System.Online": {}, "Appliance.Control.ToggleX": {}}
+
+
+class TestDiscovery:
+    def test_concurrent_enrollment_with_failure_isolation(self):
+        async def run():
+            manager = build_manager(discovery_concurrency=4)
+            running = 0
+            max_running = 0
+
+            async def fake_execute_cmd(destination_device_uuid, **kwargs):
+                nonlocal running, max_running
+                running += 1
+                max_running = max(max_running, running)
+                try:
+                    await asyncio.sleep(0.05)
+                finally:
+                    running -= 1
+                if destination_device_uuid == "timeout":
+                    raise CommandTimeoutError(message="", target_device_uuid=destination_device_uuid, timeout=0.05)
+                if destination_device_uuid == "broken":
+                    raise ValueError("Unexpected response")
+                return {"ability": _ABILITIES}
+
+            manager.async_execute_cmd = fake_execute_cmd
+            http_devices = [build_http_device_info(str(i)) for i in range(10)]
+            http_devices.append(build_http_device_info("timeout"))
+            http_devices.append(build_http_device_info("broken"))
+
+            start = asyncio.get_event_loop().time()
+            devices = await manager.async_device_discovery(cached_http_device_list=http_devices)
+            elapsed = asyncio.get_event_loop().time() - start
+            return manager, devices, max_running, elapsed
+
+        manager, devices, max_running, elapsed = asyncio.run(run())
+        # Neither the device that timed out nor the broken one prevent the others from being enrolled
+        assert {d.uuid for d in devices} == {str(i) for i in range(10)}
+        assert max_running == 4
+        # 12 ability fetches of 50ms, 4 at a time
+        assert elapsed < 0.5
+
+        stats = manager.last_discovery_stats
+        assert stats.failures == {"new_devices_enrollment": 1}
+        assert "new_devices_enrollment" in stats.phase_durations
+        assert stats.total_duration is not None
+
+    def test_warm_start_from_snapshot(self, tmp_path):
+        snapshot_path = str(tmp_path / "snapshot.json")
+
+        async def discover(http_devices):
+            manager = build_manager(snapshot_path=snapshot_path)
+            fetched = []
+
+            async def fake_execute_cmd(destination_device_uuid, **kwargs):
+                fetched.append(destination_device_uuid)
+                return {"ability": _ABILITIES}
+
+            manager.async_execute_cmd = fake_execute_cmd
+            devices = await manager.async_device_discovery(cached_http_device_list=http_devices,
+                                                           update_subdevice_status=False)
+            return manager, devices, fetched
+
+        http_devices = [build_http_device_info(str(i)) for i in range(5)]
+        manager, devices, fetched = asyncio.run(discover(http_devices))
+        assert len(fetched) == 5
+        assert not manager.last_discovery_stats.warm_start
+
+        # Second start: abilities come from the snapshot, except for the device whose firmware changed
+        http_devices[0].fmware_version = "2.0.0"
+        manager, devices, fetched = asyncio.run(discover(http_devices))
+        assert fetched == ["0"]
+        assert len(devices) == 5
+        assert manager.last_discovery_stats.snapshot_hits == 4
+        assert manager.last_discovery_stats.snapshot_misses == 1
+
+        # Third start: the snapshot has been refreshed with the new firmware
+        manager, devices, fetched = asyncio.run(discover(http_devices))
+        assert fetched == []
+        assert manager.last_discovery_stats.warm_start
@@ -121,3 +121,73 @@ class TestDispatch():
             except KeyError:
                 continue
 
+    def test_type_cache_shared_by_identical_ability_sets(self):
+        abilities = {Namespace.SYSTEM_ALL.value: {}, Namespace.SYSTEM_ONLINE.value: {}, Namespace.CONTROL_TOGGLEX.value: {}}
+        reordered = dict(reversed(list(abilities.items())))
+        stats_before = device_factory.get_type_cache_stats()
+
+        def build(uuid, device_type, fw, device_abilities):
+            info = HttpDeviceInfo(uuid=uuid, online_status=OnlineStatus.ONLINE, dev_name=uuid, device_type=device_type,
+                                  channels=[{}], fmware_version=fw, hdware_version="1.0.0",
+                                  domain="mqtt.example.com", reserved_domain="mqtt.example.com")
+            return device_factory.build_meross_device_from_abilities(info, device_abilities, manager=None)
+
+        first = build("uuid1", "cache-test", "1.0.0", abilities)
+        # Same abilities, reported in a different order and with a different firmware: same class
+        second = build("uuid2", "cache-test", "2.0.0", reordered)
+        # Same abilities on a different device type: the mixins are the same, so is the class
+        third = build("uuid3", "cache-test-2", "1.0.0", abilities)
+        assert type(first) is type(second) is type(third)
+        assert ToggleXMixin in type(first).__bases__
+
+        stats = device_factory.get_type_cache_stats()
+        assert stats["hits"] - stats_before["hits"] == 1
+        assert stats["misses"] - stats_before["misses"] == 2
+
+    def test_device_type_dependent_mixins(self):
+        from meross_iot.controller.mixins.plantLight import PlantLightMixin
+        abilities = {Namespace.SYSTEM_ALL.value: {}, Namespace.CONTROL_LIGHT.value: {}, Namespace.CONTROL_TOGGLEX.value: {}}
+        plant_light = device_factory._build_cached_type("test", abilities, BaseDevice, "bgl120a")
+        other = device_factory._build_cached_type("test", abilities, BaseDevice, "msl120")
+        assert PlantLightMixin in plant_light.__bases__
+        assert LightMixin not in plant_light.__bases__
+        assert PlantLightMixin not in other.__bases__
+        assert LightMixin in other.__bases__
+
+    def test_push_dispatch_table(self):
+        from meross_iot.controller.mixins.plantLight import PlantLightMixin
+        from meross_iot.controller.mixins.luminance import LuminanceMixin
+        abilities = {Namespace.SYSTEM_ALL.value: {}, Namespace.SYSTEM_ONLINE.value: {},
+                     Namespace.CONTROL_TOGGLEX.value: {}, Namespace.CONTROL_LUMINANCE.value: {}}
+        device_class = device_factory._build_cached_type("test", abilities, BaseDevice, "bgl120a")
+        push_table = device_class._get_mixin_dispatch_table("async_handle_push_notification")
+        update_table = device_class._get_mixin_dispatch_table("async_handle_update")
+
+        # PlantLightMixin replaces ToggleXMixin and LuminanceMixin, as it subclasses them
+        assert push_table.lookup(Namespace.CONTROL_TOGGLEX) == [PlantLightMixin.async_handle_push_notification]
+        assert push_table.lookup(Namespace.SYSTEM_ONLINE) == [SystemOnlineMixin.async_handle_push_notification]
+        assert push_table.lookup(Namespace.CONTROL_LIGHT) == []
+        assert push_table.lookup(Namespace.SYSTEM_ONLINE.value) == push_table.lookup(Namespace.SYSTEM_ONLINE)
+        # Handlers are invoked in the same order of the device base classes
+        assert update_table.lookup(Namespace.SYSTEM_ALL) == [PlantLightMixin.async_handle_update,
+                                                             SystemOnlineMixin.async_handle_update]
+        # The plant light update handler is not declared: it is invoked for any namespace
+        assert update_table.lookup(Namespace.CONTROL_LIGHT) == [PlantLightMixin.async_handle_update]
+        assert LuminanceMixin.async_handle_push_notification not in push_table.all_handlers
+
+    def test_push_dispatch_invokes_only_target_mixin(self):
+        abilities = {Namespace.SYSTEM_ALL.value: {}, Namespace.SYSTEM_ONLINE.value: {},
+                     Namespace.CONTROL_TOGGLEX.value: {}, Namespace.CONTROL_LIGHT.value: {}}
+        info = HttpDeviceInfo(uuid="dispatch-uuid", online_status=OnlineStatus.ONLINE, dev_name="dispatch",
+                              device_type="dispatch-test", channels=[{}], fmware_version="1.0.0",
+                              hdware_version="1.0.0", domain="mqtt.example.com", reserved_domain="mqtt.example.com")
+        device = device_factory.build_meross_device_from_abilities(info, abilities, manager=None)
+
+        handled = asyncio.run(device.async_handle_all_push_notifications(
+            namespace=Namespace.CONTROL_TOGGLEX, data={'togglex': [{'channel': 0, 'onoff': 1}]}))
+        assert handled
+        assert device.is_on(channel=0)
+
+        handled = asyncio.run(device.async_handle_all_push_notifications(
+            namespace=Namespace.CONTROL_SPRAY, data={'spray': [{'channel': 0, 'mode': 1}]}))
+        assert handled is None
@@ -0,0 +1,65 @@
+import asyncio
+import base64
+import json
+
+from Cryptodome.Cipher import AES
+
+from meross_iot.device_factory import build_meross_device_from_abilities
+from meross_iot.model.enums import Namespace
+from tests.helpers import build_http_device_info, build_manager
+
+_KEY = "0123456789abcdef0123456789abcdef"
+_IV = b"0000000000000000"
+_ABILITIES = {Namespace.SYSTEM_ALL.value: {}, Namespace.SYSTEM_ENCRYPTION.value: {},
+              Namespace.SYSTEM_ENCRYPTION_ECDHE.value: {}}
+
+
+def _build_device(manager=None):
+    info = build_http_device_info(_KEY, dev_name="plug")
+    device = build_meross_device_from_abilities(info, _ABILITIES, manager=manager)
+    device.set_encryption_key(uuid=device.uuid, mrskey=_KEY,
+                              mac="48:e1:e9:00:00:01")
+    return device
+
+
+def _reference_encrypt(key: bytes, data: bytes) -> bytes:
+    # Fresh context per message, zero padding to the next block
+    padded = data + bytes(16 - len(data) % 16)
+    return base64.b64encode(AES.new(key, AES.MODE_CBC, _IV).encrypt(padded))
+
+
+class TestEncryption:
+    def test_reused_contexts_match_fresh_ones(self):
+        device = _build_device()
+        for size in (10, 16, 1500, 33, 4096, 0, 700):
+            message = bytes((i * 7) % 251 for i in range(size))
+            encrypted = device.encrypt_bytes(message)
+            assert encrypted == _reference_encrypt(device._encryption_key, message)
+            assert device.encrypt(message) == encrypted.decode("utf-8")
+            assert device.decrypt(encrypted).rstrip(b"\0") == message.rstrip(b"\0")
+
+    def test_manager_decrypts_lan_responses(self):
+        async def run():
+            manager = build_manager(key=_KEY)
+            device = _build_device(manager)
+            manager._device_registry.enroll_device(device)
+            requests = []
+
+            async def fake_post_raw(device_ip, data, timeout, idempotent):
+                assert idempotent
+                request = json.loads(device.decrypt(data).rstrip(b"\0"))
+                requests.append(request)
+                response = {"header": request["header"], "payload": {"all": {"system": {}}}}
+                return _reference_encrypt(device._encryption_key, json.dumps(response).encode("utf8"))
+
+            manager._lan_transport.async_post_raw = fake_post_raw
+            for _ in range(3):
+                payload = await manager._async_execute_cmd_http(device_ip="192.168.1.2",
+                                                                destination_device_uuid=device.uuid, method="GET",
+                                                                namespace=Namespace.SYSTEM_ALL, payload={},
+                                                                timeout=1)
+                assert payload == {"all": {"system": {}}}
+            return requests
+
+        requests = asyncio.run(run())
+        assert [r["header"]["namespace"] for r in requests] == [Namespace.SYSTEM_ALL.value] * 3
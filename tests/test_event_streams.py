@@ -0,0 +1,89 @@
+import asyncio
+
+from meross_iot.device_factory import build_meross_device_from_abilities
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.generic import GenericPushNotification
+from meross_iot.utilities.event_stream import EventStream, StreamOverflowPolicy
+from tests.helpers import build_http_device_info, build_manager
+
+
+def _push(namespace, uuid, value=None):
+    return GenericPushNotification(namespace=namespace, originating_device_uuid=uuid, raw_data={"value": value})
+
+
+async def _drain(stream):
+    stream.close()
+    return [(e.originating_device_uuid, e.raw_data["value"]) async for e in stream]
+
+
+class TestEventStreams:
+    def test_overflow_policies(self):
+        async def run():
+            results = {}
+            for policy in StreamOverflowPolicy:
+                stream = EventStream(max_size=2, overflow_policy=policy)
+                for uuid, value in (("a", 0), ("b", 0), ("a", 1), ("c", 0)):
+                    stream.publish(_push(Namespace.CONTROL_TOGGLEX, uuid, value))
+                results[policy] = (await _drain(stream), stream.stats)
+            return results
+
+        results = asyncio.run(run())
+        events, stats = results[StreamOverflowPolicy.DROP_OLDEST]
+        assert events == [("a", 1), ("c", 0)]
+        assert (stats.dropped, stats.max_lag, stats.delivered) == (2, 2, 2)
+        events, stats = results[StreamOverflowPolicy.DROP_NEWEST]
+        assert events == [("a", 0), ("b", 0)]
+        assert stats.dropped == 2
+        events, stats = results[StreamOverflowPolicy.COALESCE_LATEST]
+        assert events == [("b", 0), ("c", 0)]
+        assert (stats.coalesced, stats.dropped) == (1, 1)
+
+    def test_consumer_waits_for_events_and_stops_on_close(self):
+        async def run():
+            stream = EventStream()
+            received = []
+
+            async def consume():
+                async for event in stream:
+                    received.append(event.raw_data["value"])
+
+            consumer = asyncio.create_task(consume())
+            await asyncio.sleep(0)
+            stream.publish(_push(Namespace.CONTROL_TOGGLEX, "a", 0))
+            stream.publish(_push(Namespace.CONTROL_TOGGLEX, "a", 1))
+            await asyncio.sleep(0)
+            stream.close()
+            assert not stream.publish(_push(Namespace.CONTROL_TOGGLEX, "a", 2))
+            await asyncio.wait_for(consumer, 1)
+            return received, stream.stats.lag
+
+        assert asyncio.run(run()) == ([0, 1], 0)
+
+    def test_manager_streams_are_filtered_and_do_not_block_dispatching(self):
+        async def run():
+            manager = build_manager()
+            info = build_http_device_info("plug")
+            device = build_meross_device_from_abilities(
+                info, {Namespace.SYSTEM_ALL.value: {}, Namespace.CONTROL_TOGGLEX.value: {}}, manager=manager)
+            manager._device_registry.enroll_device(device)
+
+            toggles = manager.events(namespaces=Namespace.CONTROL_TOGGLEX, device_types="mss310", max_size=1)
+            everything = manager.events()
+            for onoff in (1, 0):
+                await manager._handle_and_dispatch_push_notification(
+                    GenericPushNotification(namespace=Namespace.CONTROL_TOGGLEX, originating_device_uuid="plug",
+                                            raw_data={"togglex": [{"channel": 0, "onoff": onoff}]}))
+            await manager._handle_and_dispatch_push_notification(_push(Namespace.SYSTEM_ONLINE, "other"))
+            # Nobody consumed the events, yet the device state is up to date
+            assert device.is_on() is False
+            assert (toggles.stats.lag, toggles.stats.dropped) == (1, 1)
+            assert everything.stats.lag == 3
+
+            async with toggles:
+                latest = await toggles.__anext__()
+            assert latest.raw_data["togglex"][0]["onoff"] == 0
+            assert manager._event_streams.get_subscription_counts()["total"] == 1
+            manager.close()
+            return everything.closed, manager._event_streams.get_subscription_counts()["total"]
+
+        assert asyncio.run(run()) == (True, 0)
@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+from meross_iot.manager import MerossManager, TransportMode
+from meross_iot.model.enums import Namespace
+from meross_iot.utilities.timeouts import Transport
+from tests.helpers import FakeMqttClient, build_manager, connect_fake_mqtt_client
+
+
+class _Py37CancelledError(asyncio.CancelledError, Exception):
+    """
+    CancelledError as raised on Python 3.7, where it still derives from Exception
+    """
+
+
+class _FakeLan:
+    def __init__(self, delay: float, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return {"via": "lan"}
+
+
+async def _build_hedging_manager(lan: _FakeLan, mqtt_delay: float = 0.01, **kwargs):
+    manager = build_manager(**kwargs)
+    manager.default_transport_mode = TransportMode.HEDGED
+    manager._device_registry.lookup_base_by_uuid = lambda uuid: SimpleNamespace(lan_ip="192.168.1.2")
+    client = connect_fake_mqtt_client(manager, FakeMqttClient(ack_delay=mqtt_delay, ack_payload={"via": "mqtt"}))
+    manager._async_execute_cmd_http = lan
+    return manager, client
+
+
+async def _send(manager: MerossManager, method: str = "GET"):
+    return await manager.async_execute_cmd(mqtt_hostname="mqtt.example.com", mqtt_port=443,
+                                           destination_device_uuid="uuid", method=method,
+                                           namespace=Namespace.SYSTEM_ALL, payload={}, timeout=1)
+
+
+class TestHedging:
+    def test_fast_lan_answer_is_not_hedged(self):
+        async def run():
+            manager, client = await _build_hedging_manager(_FakeLan(delay=0.01), hedge_delay=0.2)
+            assert await _send(manager) == {"via": "lan"}
+            return manager, client
+
+        manager, client = asyncio.run(run())
+        assert len(client.published) == 0
+        stats = manager.hedging_stats
+        assert (stats.commands, stats.hedges_sent, stats.lan_wins) == (1, 0, 1)
+
+    def test_mqtt_wins_over_a_late_lan_answer(self):
+        async def run():
+            lan = _FakeLan(delay=0.5)
+            manager, client = await _build_hedging_manager(lan, hedge_delay=0.05)
+            assert await _send(manager) == {"via": "mqtt"}
+            await asyncio.sleep(0)
+            return manager, client, lan
+
+        manager, client, lan = asyncio.run(run())
+        assert len(client.published) == 1
+        assert lan.cancelled == 1
+        assert (manager.hedging_stats.hedges_sent, manager.hedging_stats.mqtt_wins) == (1, 1)
+        # The cancelled LAN request is not a LAN error
+        assert not manager._error_budget_manager.is_out_of_budget("uuid")
+
+    def test_lan_failure_consumes_the_error_budget(self):
+        async def run():
+            lan = _FakeLan(delay=0.01, error=ConnectionRefusedError())
+            manager, client = await _build_hedging_manager(lan, hedge_delay=0.2)
+            assert await _send(manager) == {"via": "mqtt"}
+            # Out of budget: the next command goes straight to MQTT
+            assert await _send(manager) == {"via": "mqtt"}
+            return manager, client, lan
+
+        manager, client, lan = asyncio.run(run())
+        assert lan.calls == 1
+        assert len(client.published) == 2
+        assert manager._error_budget_manager.is_out_of_budget("uuid")
+        assert manager.hedging_stats.commands == 1
+
+    def test_non_idempotent_commands_are_never_hedged(self):
+        async def run():
+            manager, client = await _build_hedging_manager(_FakeLan(delay=0.1), hedge_delay=0.01)
+            assert await _send(manager, method="SET") == {"via": "lan"}
+            return manager, client
+
+        manager, client = asyncio.run(run())
+        assert len(client.published) == 0
+        assert manager.hedging_stats.commands == 0
+
+    def test_cancelled_lan_leg_keeps_the_error_budget_on_python_37(self):
+        async def run():
+            lan = _FakeLan(delay=0, error=_Py37CancelledError())
+            manager, client = await _build_hedging_manager(lan, hedge_delay=0.05)
+            try:
+                await manager._async_execute_lan_cmd(device_ip="192.168.1.2", destination_device_uuid="uuid",
+                                                     method="GET", namespace=Namespace.SYSTEM_ALL, payload={},
+                                                     timeout=1)
+            except asyncio.CancelledError:
+                pass
+            return manager
+
+        manager = asyncio.run(run())
+        assert not manager._error_budget_manager.is_out_of_budget("uuid")
+        assert manager.transport_selector.get_stats("uuid", Transport.LAN_HTTP).failures == 0
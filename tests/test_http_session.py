@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from meross_iot.http_api import MerossHttpClient
+from meross_iot.model.credentials import MerossCloudCreds
+
+
+class TestHttpSessionReuse(AioHTTPTestCase):
+    async def get_application(self):
+        self.peers = set()
+
+        async def devlist(request: web.Request):
+            self.peers.add(request.transport.get_extra_info("peername"))
+            return web.json_response({"apiStatus": 0, "data": []})
+
+        app = web.Application()
+        app.router.add_post("/v1/Device/devList", devlist)
+        return app
+
+    def _build_client(self, reuse_http_session: bool) -> MerossHttpClient:
+        creds = MerossCloudCreds(token="token", key="key", user_id="1", user_email="user@example.com",
+                                 issued_on=datetime.utcnow(), domain=f"http://{self.server.host}:{self.server.port}",
+                                 mqtt_domain="mqtt.example.com")
+        return MerossHttpClient(cloud_credentials=creds, reuse_http_session=reuse_http_session)
+
+    async def test_pooled_session(self):
+        async with self._build_client(reuse_http_session=True) as client:
+            for _ in range(3):
+                self.assertEqual(await client.async_list_devices(), [])
+            self.assertEqual(client.stats.get_stats().global_stats.total_calls, 3)
+        self.assertEqual(len(self.peers), 1)
+
+    async def test_session_per_request(self):
+        client = self._build_client(reuse_http_session=False)
+        for _ in range(3):
+            await client.async_list_devices()
+        self.assertEqual(client.stats.get_stats().global_stats.total_calls, 3)
+        self.assertEqual(len(self.peers), 3)
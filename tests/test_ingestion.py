@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+from meross_iot.utilities.ingestion import IngestionQueue, IngestionOverflowPolicy
+
+
+class TestIngestionQueue:
+    def test_messages_from_thread_are_drained_in_batches(self):
+        async def run():
+            received = []
+            queue = IngestionQueue(loop=asyncio.get_running_loop(), consumer=received.append)
+
+            def produce():
+                for i in range(1000):
+                    queue.put(i)
+
+            producer = threading.Thread(target=produce)
+            producer.start()
+            producer.join()
+            await asyncio.sleep(0.05)
+            return queue, received
+
+        queue, received = asyncio.run(run())
+        assert received == list(range(1000))
+        assert queue.depth == 0
+        assert queue.stats.drained == 1000
+        assert queue.stats.dropped == 0
+        # The loop was busy while the producer ran: far fewer wakeups than messages
+        assert queue.stats.batches < 1000
+        assert queue.stats.max_drain_latency >= queue.stats.mean_drain_latency > 0
+
+    def test_overflow_policies(self):
+        async def run(policy):
+            received = []
+            queue = IngestionQueue(loop=asyncio.get_running_loop(), consumer=received.append,
+                                   max_size=3, overflow_policy=policy)
+            # Nothing is drained until the loop gets control back
+            results = [queue.put(i) for i in range(5)]
+            queue.put("ack", droppable=False)
+            await asyncio.sleep(0)
+            return queue, received, results
+
+        queue, received, results = asyncio.run(run(IngestionOverflowPolicy.DROP_OLDEST))
+        assert received == ["ack", 2, 3, 4]
+        assert all(results)
+        assert queue.stats.dropped == 2
+        assert queue.stats.batches == 1
+
+        queue, received, results = asyncio.run(run(IngestionOverflowPolicy.DROP_NEWEST))
+        assert received == ["ack", 0, 1, 2]
+        assert results == [True, True, True, False, False]
+        assert queue.stats.dropped == 2
+        assert queue.stats.max_depth == 4
+
+    def test_consumer_errors_do_not_stop_the_batch(self):
+        async def run():
+            received = []
+
+            def consumer(item):
+                if item == 1:
+                    raise ValueError()
+                received.append(item)
+
+            queue = IngestionQueue(loop=asyncio.get_running_loop(), consumer=consumer)
+            for i in range(3):
+                queue.put(i)
+            await asyncio.sleep(0)
+            return received
+
+        assert asyncio.run(run()) == [0, 2]
@@ -0,0 +1,76 @@
+import asyncio
+import warnings
+
+from aiohttp import ServerDisconnectedError, web
+from aiohttp.test_utils import AioHTTPTestCase
+
+from meross_iot.lan_transport import LanHttpTransport
+
+
+class TestLanHttpTransport(AioHTTPTestCase):
+    async def get_application(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.peers = set()
+        self.received = 0
+        self.drop_next = False
+
+        async def config(request: web.Request):
+            self.received += 1
+            if self.drop_next:
+                # Behave as a device dropping the connection after having read the request
+                self.drop_next = False
+                await request.read()
+                request.transport.close()
+                await asyncio.sleep(0.1)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.peers.add(request.transport.get_extra_info("peername"))
+            body = await request.read()
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return web.Response(body=body)
+
+        app = web.Application()
+        app.router.add_post("/config", config)
+        self.transport = LanHttpTransport(max_concurrent_requests_per_device=1)
+        return app
+
+    @property
+    def device_ip(self):
+        return f"{self.server.host}:{self.server.port}"
+
+    async def test_connection_reuse(self):
+        for i in range(5):
+            res = await self.transport.async_post(device_ip=self.device_ip, data=f"msg{i}".encode(), timeout=5)
+            self.assertEqual(res, f"msg{i}")
+        # All the requests should have travelled over the same keep-alive connection
+        self.assertEqual(len(self.peers), 1)
+
+    async def test_concurrency_cap(self):
+        await asyncio.gather(*(self.transport.async_post(device_ip=self.device_ip, data=b"{}", timeout=5)
+                               for _ in range(5)))
+        self.assertEqual(self.max_in_flight, 1)
+
+    async def test_only_idempotent_requests_are_retried(self):
+        self.drop_next = True
+        with self.assertRaises(ServerDisconnectedError):
+            await self.transport.async_post(device_ip=self.device_ip, data=b"set", timeout=5)
+        self.assertEqual(self.received, 1)
+
+        self.drop_next = True
+        res = await self.transport.async_post(device_ip=self.device_ip, data=b"get", timeout=5, idempotent=True)
+        self.assertEqual(res, "get")
+        self.assertEqual(self.received, 3)
+
+    async def test_sync_close_within_the_loop_closes_the_connector(self):
+        await self.transport.async_post(device_ip=self.device_ip, data=b"{}", timeout=5)
+        connector = self.transport._get_session().connector
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            self.transport.close()
+            await asyncio.sleep(0)
+        self.assertTrue(connector.closed)
+
+    async def tearDownAsync(self):
+        await self.transport.async_close()
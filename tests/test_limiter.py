@@ -0,0 +1,42 @@
+from meross_iot.utilities.limiter import RateLimiter, OverLimitPolicy
+
+
+class TestRateLimiter:
+    def test_unlimited_by_default(self):
+        limiter = RateLimiter()
+        assert not limiter.enabled
+        for _ in range(100):
+            assert limiter.check_limits("uuid1") == (None, 0)
+
+    def test_device_burst_then_delay(self):
+        limiter = RateLimiter(device_rate=1, device_burst=2, over_limit_policy=OverLimitPolicy.DELAY)
+        assert limiter.check_limits("uuid1") == (None, 0)
+        assert limiter.check_limits("uuid1") == (None, 0)
+
+        policy, delay = limiter.check_limits("uuid1")
+        assert policy == OverLimitPolicy.DELAY
+        assert 0.9 < delay <= 1
+
+        # Delayed commands reserve their token, so the next one has to wait longer
+        policy, delay = limiter.check_limits("uuid1")
+        assert policy == OverLimitPolicy.DELAY
+        assert 1.9 < delay <= 2
+
+        # Other devices are not affected by the per-device limit
+        assert limiter.check_limits("uuid2") == (None, 0)
+
+    def test_global_limit(self):
+        limiter = RateLimiter(global_rate=0.01, global_burst=1, over_limit_policy=OverLimitPolicy.RAISE)
+        assert limiter.check_limits("uuid1") == (None, 0)
+        assert limiter.check_limits("uuid2") == (OverLimitPolicy.RAISE, 0)
+
+    def test_drop_on_overquota_override(self):
+        limiter = RateLimiter(device_rate=0.01, device_burst=1, over_limit_policy=OverLimitPolicy.RAISE)
+        assert limiter.check_limits("uuid1") == (None, 0)
+        assert limiter.check_limits("uuid1", drop_on_overquota=True) == (OverLimitPolicy.DROP, 0)
+        assert limiter.check_limits("uuid1", drop_on_overquota=False)[0] == OverLimitPolicy.DELAY
+
+    def test_max_delay(self):
+        limiter = RateLimiter(device_rate=0.01, device_burst=1, over_limit_policy=OverLimitPolicy.DELAY, max_delay=5)
+        assert limiter.check_limits("uuid1") == (None, 0)
+        assert limiter.check_limits("uuid1") == (OverLimitPolicy.RAISE, 0)
@@ -0,0 +1,47 @@
+import json
+import re
+
+import pytest
+
+from meross_iot.model.enums import Namespace
+from meross_iot.utilities.mqtt import MqttMessageBuilder, verify_message_signature
+
+_FROM = "/app/1-0123456789abcdef0123456789abcdef/subscribe"
+_KEY = "0123456789abcdef0123456789abcdef"
+_LEGACY_HEADER_KEYS = ["from", "messageId", "method", "namespace", "payloadVersion", "sign", "timestamp",
+                       "triggerSrc", "uuid"]
+
+
+class TestMqttMessageBuilder:
+    @pytest.mark.parametrize("namespace,payload", [
+        (Namespace.SYSTEM_ALL, {}),
+        (Namespace.CONTROL_TOGGLEX, {"togglex": {"channel": 0, "onoff": 1}}),
+        ("Appliance.Custom.Namespace", {"text": "café \"quoted\"", "values": [1, 2.5, None, True]}),
+    ])
+    def test_wire_format_matches_json_dumps(self, namespace, payload):
+        builder = MqttMessageBuilder(from_topic=_FROM, key=_KEY)
+        raw, message_id = builder.build("SET", namespace, payload, "uuid-1")
+        message = json.loads(raw)
+
+        # The legacy serialization of the very same message must produce the very same bytes
+        assert json.dumps(message, separators=(',', ':')).encode("utf-8") == raw
+        assert list(message) == ["header", "payload"]
+        assert list(message["header"]) == _LEGACY_HEADER_KEYS
+        header = message["header"]
+        assert header["messageId"] == message_id
+        assert header["from"] == _FROM
+        assert header["namespace"] == (namespace.value if isinstance(namespace, Namespace) else namespace)
+        assert (header["method"], header["uuid"], header["payloadVersion"]) == ("SET", "uuid-1", 1)
+        assert message["payload"] == payload
+        assert verify_message_signature(header, _KEY)
+
+    def test_message_ids_look_like_md5_digests(self):
+        builder = MqttMessageBuilder(from_topic=_FROM, key=_KEY)
+        ids = {builder.build("GET", Namespace.SYSTEM_ALL, {}, "uuid")[1] for _ in range(1000)}
+        assert len(ids) == 1000
+        assert all(re.fullmatch("[0-9a-f]{32}", i) for i in ids)
+
+    def test_invalid_namespace_is_rejected(self):
+        builder = MqttMessageBuilder(from_topic=_FROM, key=_KEY)
+        with pytest.raises(ValueError):
+            builder.build("GET", 1, {}, "uuid")
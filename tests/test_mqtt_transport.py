@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+import paho.mqtt.client as mqtt
+
+from meross_iot.mqtt_transport import AsyncioMqttLoopAdapter
+from utilities.mqtt_broker_stub import MqttBrokerStub
+
+_TOPIC = "/app/test/subscribe"
+
+
+async def _async_connected_client(port: int, **adapter_kwargs):
+    loop = asyncio.get_running_loop()
+    subscribed = asyncio.Event()
+    received = asyncio.Queue()
+    callback_threads = set()
+
+    client = mqtt.Client(client_id="test", protocol=mqtt.MQTTv311)
+    client.on_connect = lambda c, userdata, flags, rc: c.subscribe(_TOPIC, qos=1)
+    client.on_subscribe = lambda c, userdata, mid, qos: subscribed.set()
+
+    def on_message(c, userdata, msg):
+        callback_threads.add(threading.get_ident())
+        received.put_nowait(msg.payload)
+
+    client.on_message = on_message
+    adapter = AsyncioMqttLoopAdapter(client=client, loop=loop, **adapter_kwargs)
+    await adapter.async_connect(host="127.0.0.1", port=port, keepalive=30)
+    await asyncio.wait_for(subscribed.wait(), 5)
+    return adapter, subscribed, received, callback_threads
+
+
+class TestAsyncioMqttLoopAdapter:
+    def test_publish_and_receive_within_the_loop(self):
+        broker = MqttBrokerStub()
+        port = broker.start()
+
+        async def run():
+            adapter, _, received, callback_threads = await _async_connected_client(port)
+            payloads = [f"message-{i}".encode() for i in range(50)]
+            for payload in payloads:
+                adapter.client.publish(_TOPIC, payload)
+            result = [await asyncio.wait_for(received.get(), 5) for _ in payloads]
+            adapter.stop()
+            return payloads, result, callback_threads
+
+        try:
+            payloads, result, callback_threads = asyncio.run(run())
+        finally:
+            broker.stop()
+        assert result == payloads
+        # Callbacks are invoked by the event loop thread: no network thread is involved
+        assert callback_threads == {threading.get_ident()}
+
+    def test_reconnects_when_the_connection_drops(self):
+        broker = MqttBrokerStub()
+        port = broker.start()
+
+        async def run():
+            adapter, subscribed, received, _ = await _async_connected_client(
+                port, misc_interval=0.05, reconnect_min_delay=0.05)
+            subscribed.clear()
+            broker.drop_connections()
+            # The adapter reconnects and the client subscribes again
+            await asyncio.wait_for(subscribed.wait(), 5)
+            adapter.client.publish(_TOPIC, b"after-reconnection")
+            result = await asyncio.wait_for(received.get(), 5)
+            adapter.stop()
+            return result
+
+        try:
+            assert asyncio.run(run()) == b"after-reconnection"
+        finally:
+            broker.stop()
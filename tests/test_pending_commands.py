@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from meross_iot.manager import MerossManager
+from meross_iot.model.enums import Namespace
+from meross_iot.model.exception import CommandTimeoutError, MqttConnectionLostError
+from meross_iot.utilities.pending import PendingCommandTable
+from tests.helpers import BROKER, FakeMqttClient, build_manager, connect_fake_mqtt_client
+
+
+def _send(manager: MerossManager, client: FakeMqttClient, method: str = "GET", **kwargs) -> asyncio.Future:
+    return asyncio.ensure_future(manager.async_execute_cmd_client(
+        client=client, destination_device_uuid="uuid", method=method, namespace=Namespace.SYSTEM_ALL, payload={},
+        timeout=10, **kwargs))
+
+
+class TestPendingCommandTable:
+    def test_deadlines_expire_in_order_with_a_single_timer(self):
+        async def run():
+            loop = asyncio.get_running_loop()
+            table = PendingCommandTable(loop=loop)
+            futures = {}
+            for message_id, timeout in (("slow", 0.2), ("fast", 0.05), ("acked", 0.1)):
+                futures[message_id] = loop.create_future()
+                table.register(message_id, futures[message_id], timeout=timeout, target_device_uuid="uuid",
+                               method="GET", namespace=Namespace.SYSTEM_ALL.value)
+            assert table.in_flight == 3
+            assert table.pop("acked").future is futures["acked"]
+            assert table.pop("acked") is None
+
+            await asyncio.sleep(0.1)
+            assert futures["fast"].done() and isinstance(futures["fast"].exception(), asyncio.TimeoutError)
+            assert not futures["slow"].done()
+            assert table.in_flight == 1
+            assert table.get_age_stats()["max"] >= 0.1
+
+            await asyncio.sleep(0.15)
+            assert isinstance(futures["slow"].exception(), asyncio.TimeoutError)
+            return table
+
+        table = asyncio.run(run())
+        assert table.in_flight == 0
+        assert (table.registered, table.acked, table.timed_out) == (3, 1, 2)
+
+    def test_manager_cleans_up_timed_out_and_cancelled_commands(self):
+        async def run():
+            manager = build_manager()
+            client = connect_fake_mqtt_client(manager)
+
+            with pytest.raises(CommandTimeoutError):
+                await manager.async_execute_cmd_client(client=client, destination_device_uuid="uuid", method="GET",
+                                                       namespace=Namespace.SYSTEM_ALL, payload={}, timeout=0.05)
+            assert manager.pending_commands.in_flight == 0
+
+            task = asyncio.ensure_future(manager.async_execute_cmd_client(
+                client=client, destination_device_uuid="uuid", method="GET", namespace=Namespace.SYSTEM_ALL,
+                payload={}, timeout=10))
+            await asyncio.sleep(0.01)
+            assert manager.pending_commands.in_flight == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return manager, client
+
+        manager, client = asyncio.run(run())
+        assert manager.pending_commands.in_flight == 0
+        assert manager.pending_commands.timed_out == 1
+        assert manager.pending_commands.discarded == 1
+        assert len(client.published) == 2
+
+    def test_disconnection_fails_in_flight_commands_right_away(self):
+        async def run():
+            manager = build_manager()
+            client = connect_fake_mqtt_client(manager)
+            task = _send(manager, client)
+            await asyncio.sleep(0.01)
+            manager._on_disconnect(client, BROKER, 1)
+            with pytest.raises(MqttConnectionLostError):
+                await asyncio.wait_for(task, 1)
+            return manager
+
+        manager = asyncio.run(run())
+        assert manager.pending_commands.in_flight == 0
+        assert manager.pending_commands.aborted == 1
+
+    def test_replay_on_reconnection(self):
+        async def run():
+            manager = build_manager(replay_commands_on_reconnect=True, replay_ttl=0.2)
+            client = connect_fake_mqtt_client(manager)
+            get_task = _send(manager, client)
+            set_task = _send(manager, client, method="SET")
+            safe_set_task = _send(manager, client, method="SET", replay_safe=True)
+            await asyncio.sleep(0.01)
+            manager._on_disconnect(client, BROKER, 1)
+
+            # Plain SETs are not replayed
+            with pytest.raises(MqttConnectionLostError):
+                await asyncio.wait_for(set_task, 1)
+            await asyncio.sleep(0.01)
+            assert not get_task.done() and not safe_set_task.done()
+
+            # Connection restored: the parked commands are sent again
+            manager._mqtt_connected_and_subscribed[BROKER].set()
+            await asyncio.sleep(0.01)
+            assert len(client.published) == 5
+            client.ack_published(-1)
+            client.ack_published(-2)
+            await asyncio.wait_for(asyncio.gather(get_task, safe_set_task), 1)
+
+            # Parked commands are dropped when the connection is not restored within the TTL
+            expiring_task = _send(manager, client)
+            await asyncio.sleep(0.01)
+            manager._on_disconnect(client, BROKER, 1)
+            with pytest.raises(MqttConnectionLostError):
+                await asyncio.wait_for(expiring_task, 1)
+            return manager
+
+        manager = asyncio.run(run())
+        assert manager.replayed_commands_count == 2
+        assert manager.pending_commands.in_flight == 0
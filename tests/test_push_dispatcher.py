@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+from meross_iot.device_factory import build_meross_device_from_abilities
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.online import OnlinePushNotification
+from meross_iot.utilities.dispatcher import PushDispatcher
+from tests.helpers import build_http_device_info, build_manager
+
+
+class TestPushDispatcher:
+    def test_lanes_are_ordered_per_device_and_concurrent_across_devices(self):
+        async def run():
+            dispatcher = PushDispatcher(loop=asyncio.get_running_loop())
+            processed = []
+
+            async def process(device, index, delay):
+                await asyncio.sleep(delay)
+                processed.append((device, index))
+
+            dispatcher.submit("a", process, "a", 0, 0.1)
+            dispatcher.submit("a", process, "a", 1, 0)
+            dispatcher.submit("b", process, "b", 0, 0)
+            assert dispatcher.active_lanes == 2
+            await dispatcher.async_join()
+            assert dispatcher.active_lanes == 0 and dispatcher.queued == 0
+            return processed
+
+        assert asyncio.run(run()) == [("b", 0), ("a", 0), ("a", 1)]
+
+    def test_handlers_are_bounded_timed_out_and_measured(self, caplog):
+        async def run():
+            dispatcher = PushDispatcher(loop=asyncio.get_running_loop(), max_concurrent_handlers=2,
+                                        handler_timeout=0.2, slow_handler_threshold=0.05)
+            running = []
+            max_running = []
+
+            async def handler(delay):
+                running.append(1)
+                max_running.append(len(running))
+                try:
+                    await asyncio.sleep(delay)
+                finally:
+                    running.pop()
+
+            async def failing_handler():
+                raise RuntimeError("boom")
+
+            with caplog.at_level(logging.WARNING):
+                await dispatcher.async_run_handlers([(handler, (0.01,), {}) for _ in range(4)] +
+                                                    [(handler, (), {"delay": 1.0}), (failing_handler, (), {})])
+            return dispatcher, max(max_running)
+
+        dispatcher, max_running = asyncio.run(run())
+        assert max_running == 2
+        stats = dispatcher.get_handler_stats()
+        handler_stats = stats["TestPushDispatcher.test_handlers_are_bounded_timed_out_and_measured.<locals>.run."
+                              "<locals>.handler"]
+        assert (handler_stats.calls, handler_stats.timeouts, handler_stats.slow_calls) == (5, 1, 1)
+        assert handler_stats.max_latency >= 0.2
+        assert sum(s.errors for s in stats.values()) == 1
+        assert "did not complete within" in caplog.text
+
+    def test_slow_manager_handler_does_not_stall_other_devices(self):
+        async def run():
+            manager = build_manager()
+            handled = []
+
+            async def handler(push_notification, target_devices, manager):
+                if push_notification.originating_device_uuid == "slow":
+                    await asyncio.sleep(0.2)
+                handled.append((push_notification.originating_device_uuid, push_notification.status))
+
+            manager.register_push_notification_handler_coroutine(handler)
+            for uuid, status in (("slow", 1), ("slow", 0), ("fast", 1)):
+                manager._on_ingested_message(OnlinePushNotification(originating_device_uuid=uuid,
+                                                                    raw_data={'online': {'status': status}}))
+            await asyncio.sleep(0.05)
+            assert handled == [("fast", 1)]
+            await manager.push_dispatcher.async_join()
+            return handled
+
+        assert asyncio.run(run()) == [("fast", 1), ("slow", 1), ("slow", 0)]
+
+    def test_connection_drop_is_queued_behind_the_device_pushes(self):
+        async def run():
+            manager = build_manager()
+            manager._device_registry.enroll_device(build_meross_device_from_abilities(
+                build_http_device_info("plug"), {Namespace.SYSTEM_ALL.value: {}}, manager=manager))
+            handled = []
+
+            async def handler(push_notification, target_devices, manager):
+                await asyncio.sleep(0.05)
+                handled.append(push_notification.status)
+
+            manager.register_push_notification_handler_coroutine(handler)
+            manager._on_ingested_message(OnlinePushNotification(originating_device_uuid="plug",
+                                                                raw_data={'online': {'status': 1}}))
+            manager._notify_connection_drop()
+            assert manager.push_dispatcher.queued == 2
+            await manager.push_dispatcher.async_join()
+            return handled
+
+        assert asyncio.run(run()) == [1, -1]
@@ -0,0 +1,116 @@
+import pytest
+
+from meross_iot.controller.device import BaseDevice, HubDevice
+from meross_iot.controller.mixins.toggle import ToggleXMixin
+from meross_iot.controller.subdevice import Ms100Sensor
+from meross_iot.manager import DeviceRegistry
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+
+class _FakeManager:
+    def __init__(self, registry: DeviceRegistry):
+        self.find_devices = registry.find_all_by
+
+
+class _ToggleXDevice(ToggleXMixin, BaseDevice):
+    pass
+
+
+def _http_info(uuid: str, name: str, device_type: str = "mss310", online: OnlineStatus = OnlineStatus.ONLINE):
+    return HttpDeviceInfo(uuid=uuid, online_status=online, dev_name=name, device_type=device_type, channels=[],
+                          fmware_version="1.0.0", hdware_version="1.0.0", domain="mqtt.meross.com",
+                          reserved_domain=None)
+
+
+class TestDeviceRegistry:
+    def setup_method(self, method):
+        self.registry = DeviceRegistry()
+        self.manager = _FakeManager(self.registry)
+
+    def test_lookup_by_uuid(self):
+        dev = BaseDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "plug"))
+        self.registry.enroll_device(dev)
+        assert self.registry.lookup_base_by_uuid("uuid1") is dev
+        assert self.registry.lookup_base_by_uuid("uuid2") is None
+
+        self.registry.relinquish_device(dev.internal_id)
+        assert self.registry.lookup_base_by_uuid("uuid1") is None
+        assert self.registry.find_all_by(device_uuids=("uuid1",)) == []
+
+    def test_duplicate_base_devices_are_rejected_on_lookup(self):
+        class _AliasDevice(BaseDevice):
+            @property
+            def internal_id(self) -> str:
+                return f"#ALIAS:{self.uuid}"
+
+        dev = BaseDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "plug"))
+        alias = _AliasDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "alias"))
+        self.registry.enroll_device(dev)
+        self.registry.enroll_device(alias)
+        with pytest.raises(ValueError):
+            self.registry.lookup_base_by_uuid("uuid1")
+
+        self.registry.relinquish_device(alias.internal_id)
+        assert self.registry.lookup_base_by_uuid("uuid1") is dev
+
+    def test_find_all_by_combined_filters(self):
+        plug = _ToggleXDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "plug"))
+        bulb = _ToggleXDevice("uuid2", self.manager, http_device_info=_http_info("uuid2", "bulb", "msl120"))
+        other = BaseDevice("uuid3", self.manager, http_device_info=_http_info("uuid3", "other",
+                                                                             online=OnlineStatus.OFFLINE))
+        for d in (plug, bulb, other):
+            self.registry.enroll_device(d)
+
+        assert self.registry.find_all_by() == [plug, bulb, other]
+        assert self.registry.find_all_by(device_class=ToggleXMixin) == [plug, bulb]
+        assert self.registry.find_all_by(device_class=ToggleXMixin, device_type="msl120") == [bulb]
+        assert self.registry.find_all_by(online_status=OnlineStatus.OFFLINE) == [other]
+        assert self.registry.find_all_by(device_name="plug") == [plug]
+        assert self.registry.find_all_by(device_uuids="uuid2") == [bulb]
+        assert self.registry.find_all_by(exclude_classes=(ToggleXMixin,)) == [other]
+
+    def test_online_status_transitions_update_index(self):
+        plug = BaseDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "plug"))
+        self.registry.enroll_device(plug)
+
+        plug._update_online_status(OnlineStatus.OFFLINE)
+        assert self.registry.find_all_by(online_status=OnlineStatus.ONLINE) == []
+        assert self.registry.find_all_by(online_status=OnlineStatus.OFFLINE) == [plug]
+
+    def test_results_follow_the_enrollment_order(self):
+        plug = BaseDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "plug"))
+        bulb = BaseDevice("uuid2", self.manager, http_device_info=_http_info("uuid2", "bulb"))
+        for d in (plug, bulb):
+            self.registry.enroll_device(d)
+
+        # Going offline and back online moves the plug to the end of the online bucket
+        plug._update_online_status(OnlineStatus.OFFLINE)
+        plug._update_online_status(OnlineStatus.ONLINE)
+        assert self.registry.find_all_by(online_status=OnlineStatus.ONLINE) == [plug, bulb]
+        assert self.registry.find_all_by(device_uuids=("uuid2", "uuid1")) == [plug, bulb]
+        assert self.registry.find_all_by(internal_ids=(bulb.internal_id, plug.internal_id)) == [plug, bulb]
+
+    def test_http_update_reindexes_device(self):
+        import asyncio
+        plug = BaseDevice("uuid1", self.manager, http_device_info=_http_info("uuid1", "plug"))
+        self.registry.enroll_device(plug)
+
+        asyncio.run(plug.update_from_http_state(_http_info("uuid1", "renamed")))
+        assert self.registry.find_all_by(device_name="plug") == []
+        assert self.registry.find_all_by(device_name="renamed") == [plug]
+
+    def test_subdevice_follows_hub_status(self):
+        hub = HubDevice("hub1", self.manager, http_device_info=_http_info("hub1", "hub", "msh300"))
+        self.registry.enroll_device(hub)
+        sensor = Ms100Sensor(hubdevice_uuid="hub1", subdevice_id="sub1", manager=self.manager)
+        sensor._update_online_status(OnlineStatus.ONLINE)
+        hub.register_subdevice(sensor)
+        self.registry.enroll_device(sensor)
+
+        assert self.registry.lookup_base_by_uuid("hub1") is hub
+        assert self.registry.find_all_by(device_uuids=("hub1",), exclude_classes=(HubDevice,)) == [sensor]
+        assert sensor in self.registry.find_all_by(online_status=OnlineStatus.ONLINE)
+
+        hub._update_online_status(OnlineStatus.OFFLINE)
+        assert self.registry.find_all_by(online_status=OnlineStatus.OFFLINE) == [hub, sensor]
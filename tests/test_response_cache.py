@@ -0,0 +1,77 @@
+import time
+
+from meross_iot.model.enums import Namespace
+from meross_iot.utilities.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    def test_only_configured_namespaces_are_cached(self):
+        cache = ResponseCache()
+        cache.put("uuid1", Namespace.SYSTEM_DND_MODE, {}, {"DNDMode": {"mode": 1}})
+        cache.put("uuid1", Namespace.SYSTEM_ALL, {}, {"all": {}})
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) == {"DNDMode": {"mode": 1}}
+        assert cache.get("uuid1", Namespace.SYSTEM_ALL, {}) is None
+        assert cache.size == 1
+
+    def test_key_includes_payload(self):
+        cache = ResponseCache()
+        cache.put("uuid1", Namespace.CONTROL_CONSUMPTIONX, {"channel": 0}, {"consumptionx": [0]})
+        assert cache.get("uuid1", Namespace.CONTROL_CONSUMPTIONX, {"channel": 1}) is None
+        assert cache.get("uuid1", Namespace.CONTROL_CONSUMPTIONX, {"channel": 0}) == {"consumptionx": [0]}
+        assert cache.get("uuid2", Namespace.CONTROL_CONSUMPTIONX, {"channel": 0}) is None
+
+    def test_ttl_and_max_age(self):
+        cache = ResponseCache(ttl_by_namespace={Namespace.SYSTEM_RUNTIME: 0.05})
+        cache.put("uuid1", Namespace.SYSTEM_RUNTIME, {}, {"runtime": {}})
+        time.sleep(0.02)
+        assert cache.get("uuid1", Namespace.SYSTEM_RUNTIME, {}, max_age=0.01) is None
+        assert cache.get("uuid1", Namespace.SYSTEM_RUNTIME, {}) == {"runtime": {}}
+        time.sleep(0.04)
+        assert cache.get("uuid1", Namespace.SYSTEM_RUNTIME, {}) is None
+        assert cache.size == 0
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put("uuid1", Namespace.SYSTEM_DND_MODE, {}, {"v": 1})
+        cache.put("uuid2", Namespace.SYSTEM_DND_MODE, {}, {"v": 2})
+        # Touch uuid1, so that uuid2 is the least recently used
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) is not None
+        cache.put("uuid3", Namespace.SYSTEM_DND_MODE, {}, {"v": 3})
+        assert cache.get("uuid2", Namespace.SYSTEM_DND_MODE, {}) is None
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) is not None
+        assert cache.evictions == 1
+
+    def test_invalidation(self):
+        cache = ResponseCache()
+        cache.put("uuid1", Namespace.SYSTEM_DND_MODE, {}, {"v": 1})
+        cache.put("uuid1", Namespace.SYSTEM_RUNTIME, {}, {"v": 2})
+        assert cache.invalidate("uuid1", Namespace.SYSTEM_DND_MODE) == 1
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) is None
+        assert cache.get("uuid1", Namespace.SYSTEM_RUNTIME, {}) is not None
+        assert cache.invalidate("uuid1") == 1
+        assert cache.size == 0
+
+    def test_response_invalidated_while_in_flight_is_discarded(self):
+        cache = ResponseCache()
+        issued_at = time.monotonic()
+        cache.invalidate("uuid1", Namespace.SYSTEM_DND_MODE)
+        cache.put("uuid1", Namespace.SYSTEM_DND_MODE, {}, {"v": 1}, issued_at=issued_at)
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) is None
+        cache.put("uuid1", Namespace.SYSTEM_DND_MODE, {}, {"v": 1}, issued_at=time.monotonic())
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) == {"v": 1}
+
+    def test_cached_values_are_copies(self):
+        cache = ResponseCache()
+        response = {"DNDMode": {"mode": 1}}
+        cache.put("uuid1", Namespace.SYSTEM_DND_MODE, {}, response)
+        response["DNDMode"]["mode"] = 0
+        cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {})["DNDMode"]["mode"] = 0
+        assert cache.get("uuid1", Namespace.SYSTEM_DND_MODE, {}) == {"DNDMode": {"mode": 1}}
+        assert cache.hits == 2
+
+    def test_both_consumption_namespaces_are_cached(self):
+        cache = ResponseCache()
+        for namespace in (Namespace.CONTROL_CONSUMPTION, Namespace.CONTROL_CONSUMPTIONX):
+            assert cache.is_cacheable(namespace)
+            cache.put("uuid1", namespace, {"channel": 0}, {"consumption": []})
+            assert cache.get("uuid1", namespace, {"channel": 0}, max_age=60) == {"consumption": []}
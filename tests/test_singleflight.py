@@ -0,0 +1,75 @@
+import asyncio
+
+from meross_iot.utilities.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_are_coalesced(self):
+        async def run():
+            flight = SingleFlight()
+            executions = []
+
+            async def fetch():
+                executions.append(1)
+                await asyncio.sleep(0.05)
+                return {"online": {"status": 1}}
+
+            results = await asyncio.gather(*[flight.async_do("key", fetch) for _ in range(5)])
+            return flight, executions, results
+
+        flight, executions, results = asyncio.run(run())
+        assert len(executions) == 1
+        assert flight.coalesced_calls == 4
+        assert flight.in_flight == 0
+        assert all(r == {"online": {"status": 1}} for r in results)
+        # Every caller gets its own copy of the result
+        assert len({id(r) for r in results}) == 5
+
+    def test_different_keys_are_not_coalesced(self):
+        async def run():
+            flight = SingleFlight()
+
+            async def fetch(value):
+                await asyncio.sleep(0.01)
+                return value
+
+            return flight, await asyncio.gather(flight.async_do("a", lambda: fetch(1)),
+                                                flight.async_do("b", lambda: fetch(2)))
+
+        flight, results = asyncio.run(run())
+        assert results == [1, 2]
+        assert flight.coalesced_calls == 0
+
+    def test_errors_are_shared(self):
+        async def run():
+            flight = SingleFlight()
+
+            async def fetch():
+                await asyncio.sleep(0.01)
+                raise ValueError("boom")
+
+            return await asyncio.gather(*[flight.async_do("key", fetch) for _ in range(3)], return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(r, ValueError) for r in results)
+
+    def test_follower_timeout_does_not_cancel_call(self):
+        async def run():
+            flight = SingleFlight()
+
+            async def fetch():
+                await asyncio.sleep(0.1)
+                return 42
+
+            leader = asyncio.ensure_future(flight.async_do("key", fetch))
+            await asyncio.sleep(0)
+            try:
+                await flight.async_do("key", fetch, timeout=0.01)
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+            return timed_out, await leader
+
+        timed_out, result = asyncio.run(run())
+        assert timed_out
+        assert result == 42
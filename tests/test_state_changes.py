@@ -0,0 +1,126 @@
+import asyncio
+
+from meross_iot.device_factory import build_meross_device_from_abilities
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.generic import GenericPushNotification
+from meross_iot.utilities.state_changes import MISSING, StateFingerprints
+from tests.helpers import FakeMqttClient, build_http_device_info, build_manager, connect_fake_mqtt_client
+
+
+def _toggle(onoff, uuid="plug", **extra):
+    return GenericPushNotification(namespace=Namespace.CONTROL_TOGGLEX, originating_device_uuid=uuid,
+                                   raw_data={"togglex": [{"channel": 0, "onoff": onoff, **extra}]})
+
+
+def _sensors(*readings):
+    return GenericPushNotification(namespace=Namespace.HUB_SENSOR_ALL, originating_device_uuid="hub",
+                                   raw_data={"all": [{"id": sub, "temperature": t} for sub, t in readings]})
+
+
+class TestStateFingerprints:
+    def test_unchanged_payloads_and_diffs(self):
+        fingerprints = StateFingerprints(suppress_unchanged=True, ignored_keys=("lmTime",))
+        first = fingerprints.check(_toggle(1, lmTime=1))
+        assert first.changed and first.diff == {"togglex.0.channel": (MISSING, 0), "togglex.0.onoff": (MISSING, 1)}
+
+        repeated = fingerprints.check(_toggle(1, lmTime=2))
+        assert not repeated.changed and repeated.suppressible and repeated.diff == {}
+
+        fingerprints.invalidate("plug")
+        after_command = fingerprints.check(_toggle(1))
+        assert not after_command.changed and not after_command.suppressible
+
+        changed = fingerprints.check(_toggle(0, lmTime=3))
+        assert changed.diff == {"togglex.0.onoff": (1, 0)}
+
+        stats = fingerprints.get_stats()[Namespace.CONTROL_TOGGLEX.value]
+        assert (stats.checked, stats.unchanged, stats.suppressed) == (4, 2, 1)
+        assert fingerprints.get_overall_stats().suppression_ratio == 0.25
+
+    def test_manager_suppresses_unchanged_notifications(self):
+        async def run():
+            manager = build_manager(state_fingerprints=StateFingerprints(suppress_unchanged=True))
+            info = build_http_device_info("plug")
+            device = build_meross_device_from_abilities(
+                info, {Namespace.SYSTEM_ALL.value: {}, Namespace.CONTROL_TOGGLEX.value: {}}, manager=manager)
+            manager._device_registry.enroll_device(device)
+            device_events, all_events, changes = [], [], []
+
+            async def device_handler(namespace, data, device_internal_id):
+                device_events.append(data["togglex"][0]["onoff"])
+
+            async def handler(push_notification, target_devices, manager):
+                all_events.append(push_notification.raw_data["togglex"][0]["onoff"])
+
+            async def changes_handler(push_notification, target_devices, manager, state_change):
+                changes.append(state_change.diff)
+
+            device.register_push_notification_handler_coroutine(device_handler)
+            manager.register_push_notification_handler_coroutine(handler)
+            manager.subscribe_push_notifications(changes_handler, changes_only=True)
+            stream = manager.events(changes_only=True)
+            for onoff in (1, 1, 0, 0):
+                await manager._handle_and_dispatch_push_notification(_toggle(onoff))
+            # A command response might have written the state: the repeated notification is dispatched again
+            manager.state_fingerprints.invalidate("plug")
+            await manager._handle_and_dispatch_push_notification(_toggle(0))
+            stream.close()
+            streamed = [e.raw_data["togglex"][0]["onoff"] async for e in stream]
+            return device_events, all_events, changes, streamed, manager.get_state_change_stats()
+
+        device_events, all_events, changes, streamed, stats = asyncio.run(run())
+        assert device_events == [1, 0, 0]
+        assert all_events == [1, 1, 0, 0, 0]
+        assert changes == [{"togglex.0.channel": (MISSING, 0), "togglex.0.onoff": (MISSING, 1)},
+                           {"togglex.0.onoff": (1, 0)}]
+        assert streamed == [1, 0]
+        toggle_stats = stats[Namespace.CONTROL_TOGGLEX.value]
+        assert (toggle_stats.checked, toggle_stats.unchanged, toggle_stats.suppressed) == (5, 3, 2)
+
+    def test_hub_namespaces_are_tracked_per_subdevice(self):
+        fingerprints = StateFingerprints(suppress_unchanged=True)
+        assert fingerprints.check(_sensors(("s1", 20))).changed
+        assert fingerprints.check(_sensors(("s2", 25))).changed
+        # The readings of s2 in between do not make s1 look changed
+        assert fingerprints.check(_sensors(("s1", 20))).suppressible
+        change = fingerprints.check(_sensors(("s1", 20), ("s2", 26)))
+        assert change.verified and change.diff == {"all.1.temperature": (25, 26)}
+
+        fingerprints.invalidate("hub", Namespace.HUB_SENSOR_ALL)
+        assert not fingerprints.check(_sensors(("s1", 20))).suppressible
+
+        toggle = GenericPushNotification(namespace=Namespace.HUB_TOGGLEX, originating_device_uuid="hub",
+                                         raw_data={"togglex": [{"id": "s1", "channel": 0, "onoff": 1},
+                                                               {"id": "s2", "channel": 0, "onoff": 1}]})
+        fingerprints.check(toggle)
+        fingerprints.expect("hub", Namespace.HUB_TOGGLEX, {"togglex": [{"id": "s2", "channel": 0, "onoff": 0}]})
+        echo = GenericPushNotification(namespace=Namespace.HUB_TOGGLEX, originating_device_uuid="hub",
+                                       raw_data={"togglex": [{"id": "s2", "channel": 0, "onoff": 0}]})
+        assert fingerprints.check(echo).suppressible
+
+    def test_set_echo_is_suppressed_and_gets_do_not_invalidate(self):
+        async def run():
+            manager = build_manager(state_fingerprints=StateFingerprints(suppress_unchanged=True))
+            connect_fake_mqtt_client(manager, FakeMqttClient(ack_delay=0))
+            device = build_meross_device_from_abilities(
+                build_http_device_info("plug"),
+                {Namespace.SYSTEM_ALL.value: {}, Namespace.CONTROL_TOGGLEX.value: {}}, manager=manager)
+            manager._device_registry.enroll_device(device)
+            changes = []
+
+            async def changes_handler(push_notification, target_devices, manager, state_change):
+                changes.append(state_change.diff)
+
+            manager.subscribe_push_notifications(changes_handler, changes_only=True)
+            await manager._handle_and_dispatch_push_notification(_toggle(1))
+            await device.async_turn_off(channel=0)
+            # The device echoes the state we set
+            await manager._handle_and_dispatch_push_notification(_toggle(0))
+            await device._execute_command(method="GET", namespace=Namespace.CONTROL_TOGGLEX, payload={})
+            await manager._handle_and_dispatch_push_notification(_toggle(0))
+            return device.is_on(channel=0), changes, manager.get_state_change_stats()
+
+        is_on, changes, stats = asyncio.run(run())
+        assert is_on is False
+        assert changes == [{"togglex.0.channel": (MISSING, 0), "togglex.0.onoff": (MISSING, 1)}]
+        assert stats[Namespace.CONTROL_TOGGLEX.value].suppressed == 2
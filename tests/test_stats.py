@@ -0,0 +1,63 @@
+import warnings
+from datetime import timedelta
+
+import pytest
+
+from meross_iot.model.http.error_codes import ErrorCodes
+from meross_iot.utilities.stats import ApiCounter, HttpStatsCounter, TimeBucketedCounter
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStatsCounters:
+    def test_windows_span_whole_buckets_up_to_the_retention(self):
+        clock = _FakeClock()
+        counter = TimeBucketedCounter(bucket_seconds=10, retention=timedelta(hours=1), clock=clock)
+        for _ in range(3):
+            counter.add("a")
+        clock.now += 30 * 60
+        counter.add("a")
+        counter.add("b", count=2)
+
+        assert counter.get_counts(timedelta(minutes=1)) == {"a": 1, "b": 2}
+        assert counter.get_counts(timedelta(hours=1)) == {"a": 4, "b": 2}
+        # Buckets older than the retention are recycled
+        clock.now += 45 * 60
+        counter.add("c")
+        assert counter.get_counts(timedelta(hours=5)) == {"a": 1, "b": 2, "c": 1}
+        assert counter.retention == timedelta(hours=1)
+
+    def test_counters_keep_the_result_classes(self):
+        api_counter = ApiCounter()
+        for _ in range(1500):
+            api_counter.notify_api_call(device_uuid="plug", namespace="Appliance.Control.ToggleX", method="SET")
+        api_counter.notify_dropped_call(device_uuid="bulb", namespace="Appliance.Control.Light", method="GET")
+
+        stats = api_counter.get_api_stats(time_window=timedelta(hours=1))
+        assert stats.global_stats.total_calls == 1500
+        assert dict(stats.stats_by_uuid("plug").by_method_namespace()) == {"SET Appliance.Control.ToggleX": 1500}
+        assert api_counter.get_dropped_api_stats().stats_by_uuid("bulb").total_calls == 1
+        assert api_counter.get_delayed_api_stats().global_stats.total_calls == 0
+
+        http_counter = HttpStatsCounter()
+        http_counter.notify_http_request(request_url="/v1/Device/devList", method="POST", http_response_code=200,
+                                         api_response_code=ErrorCodes.CODE_NO_ERROR)
+        http_counter.notify_http_request(request_url="/v1/Device/devList", method="POST", http_response_code=500,
+                                         api_response_code=None)
+        url_stats = http_counter.get_stats().stats_by_url("/v1/Device/devList")
+        assert url_stats.total_calls == 2
+        assert dict(url_stats.by_http_reponse_code()) == {200: 1, 500: 1}
+
+    def test_max_samples_is_deprecated(self):
+        for counter_class in (ApiCounter, HttpStatsCounter):
+            with pytest.warns(DeprecationWarning):
+                counter_class(max_samples=1000)
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                counter_class()
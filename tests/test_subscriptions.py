@@ -0,0 +1,100 @@
+import asyncio
+
+from meross_iot.controller.mixins.toggle import ToggleXMixin
+from meross_iot.device_factory import build_meross_device_from_abilities
+from meross_iot.model.enums import Namespace
+from meross_iot.model.push.generic import GenericPushNotification
+from meross_iot.subscriptions import PushSubscriptionRegistry
+from tests.helpers import build_http_device_info, build_manager
+
+
+class _FakeDevice:
+    def __init__(self, device_type):
+        self.type = device_type
+
+
+async def _handler(push_notification, target_devices, manager):
+    pass
+
+
+def _push(namespace, uuid):
+    return GenericPushNotification(namespace=namespace, originating_device_uuid=uuid, raw_data={})
+
+
+class TestPushSubscriptions:
+    def test_routing_matches_all_the_filters(self):
+        registry = PushSubscriptionRegistry()
+        everything = registry.subscribe(_handler)
+        toggles = registry.subscribe(_handler, namespaces=Namespace.CONTROL_TOGGLEX)
+        plug_toggles = registry.subscribe(_handler, namespaces=[Namespace.CONTROL_TOGGLEX.value],
+                                          device_uuids="plug")
+        bulbs = registry.subscribe(_handler, device_types=("msl120", "msl430"))
+        fakes = registry.subscribe(_handler, device_classes=_FakeDevice)
+        plug = [_FakeDevice("mss310")]
+
+        assert registry.match(_push(Namespace.CONTROL_TOGGLEX, "plug"), plug) == \
+               [everything, toggles, plug_toggles, fakes]
+        assert registry.match(_push(Namespace.CONTROL_TOGGLEX, "other"), []) == [everything, toggles]
+        assert registry.match(_push(Namespace.CONTROL_LIGHT, "bulb"), [_FakeDevice("msl120")]) == \
+               [everything, bulbs, fakes]
+
+        counts = registry.get_subscription_counts()
+        assert counts["total"] == 5
+        assert counts["by_device_uuid"] == {"plug": 1}
+        assert counts["by_namespace"] == {Namespace.CONTROL_TOGGLEX.value: 1}
+        assert counts["by_device_type"] == {"msl120": 1, "msl430": 1}
+        assert counts["by_device_class"] == {"_FakeDevice": 1}
+        assert counts["unindexed"] == 1
+
+    def test_device_class_filters_are_matched_through_the_mro(self):
+        class _FakeSubDevice(_FakeDevice):
+            pass
+
+        registry = PushSubscriptionRegistry()
+        fakes = registry.subscribe(_handler, device_classes=_FakeDevice)
+        sub_device = [_FakeSubDevice("mss310")]
+        assert registry.match(_push(Namespace.CONTROL_TOGGLEX, "plug"), sub_device) == [fakes]
+        assert registry.match(_push(Namespace.CONTROL_TOGGLEX, "other"), []) == []
+
+        # Classes indexed later are found for the device classes looked up before
+        sub_fakes = registry.subscribe(_handler, device_classes=(_FakeSubDevice, ToggleXMixin))
+        assert registry.match(_push(Namespace.CONTROL_TOGGLEX, "plug"), sub_device) == [fakes, sub_fakes]
+        registry.unsubscribe(fakes)
+        assert registry.match(_push(Namespace.CONTROL_TOGGLEX, "plug"), sub_device) == [sub_fakes]
+        assert registry.get_subscription_counts()["by_device_class"] == {"_FakeSubDevice": 1, "ToggleXMixin": 1}
+
+    def test_unsubscribe_drops_the_index_entries(self):
+        registry = PushSubscriptionRegistry()
+        subscription = registry.subscribe(_handler, device_types=("msl120", "msl430"))
+        assert registry.unsubscribe(subscription)
+        assert not subscription.active
+        assert not registry.unsubscribe(subscription)
+        assert registry.get_subscription_counts()["by_device_type"] == {}
+        assert registry.match(_push(Namespace.CONTROL_LIGHT, "bulb"), [_FakeDevice("msl120")]) == []
+
+    def test_manager_only_invokes_matching_subscriptions(self):
+        async def run():
+            manager = build_manager()
+            info = build_http_device_info("plug")
+            manager._device_registry.enroll_device(build_meross_device_from_abilities(
+                info, {Namespace.SYSTEM_ALL.value: {}, Namespace.CONTROL_TOGGLEX.value: {}}, manager=manager))
+            received = []
+
+            async def toggle_handler(push_notification, target_devices, manager):
+                received.append(push_notification.originating_device_uuid)
+
+            subscription = manager.subscribe_push_notifications(toggle_handler, device_classes=ToggleXMixin,
+                                                                namespaces=Namespace.CONTROL_TOGGLEX)
+            for uuid in ("plug", "unknown"):
+                await manager._handle_and_dispatch_push_notification(
+                    GenericPushNotification(namespace=Namespace.CONTROL_TOGGLEX, originating_device_uuid=uuid,
+                                            raw_data={"togglex": [{"channel": 0, "onoff": 1}]}))
+            manager.unsubscribe_push_notifications(subscription)
+            await manager._handle_and_dispatch_push_notification(
+                GenericPushNotification(namespace=Namespace.CONTROL_TOGGLEX, originating_device_uuid="plug",
+                                        raw_data={"togglex": [{"channel": 0, "onoff": 0}]}))
+            return received, manager
+
+        received, manager = asyncio.run(run())
+        assert received == ["plug"]
+        assert manager.push_subscriptions.get_subscription_counts()["total"] == 0
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from meross_iot.error_budget import ErrorBudgetManager
+from meross_iot.manager import TransportMode
+from meross_iot.model.enums import Namespace
+from meross_iot.model.exception import CommandError, MqttConnectionLostError
+from meross_iot.transport_selector import SelectionReason, TransportSelector
+from meross_iot.utilities.timeouts import Transport
+from tests.helpers import FakeMqttClient, build_manager, connect_fake_mqtt_client
+
+
+class TestTransportSelector:
+    def test_error_budget_is_consumed(self):
+        budget = ErrorBudgetManager(max_errors=2)
+        budget.notify_error("uuid")
+        assert not budget.is_out_of_budget("uuid")
+        budget.notify_error("uuid")
+        assert budget.is_out_of_budget("uuid")
+        assert not budget.is_out_of_budget("other")
+
+    def test_selection_follows_the_measurements(self):
+        selector = TransportSelector(probe_interval=60, min_samples=2)
+        assert selector.select("uuid").reason == SelectionReason.EXPLORING
+        assert selector.select("uuid", lan_available=False).transport == Transport.MQTT
+        for _ in range(2):
+            selector.notify_success("uuid", Transport.LAN_HTTP, 0.02)
+            selector.notify_success("uuid", Transport.MQTT, 0.2)
+        selection = selector.select("uuid")
+        assert (selection.transport, selection.reason) == (Transport.LAN_HTTP, SelectionReason.LOWER_COST)
+
+        # A flaky LAN costs more than a slower, reliable MQTT
+        for _ in range(30):
+            selector.notify_failure("uuid", Transport.LAN_HTTP)
+        assert selector.get_stats("uuid", Transport.LAN_HTTP).cost > 0.2
+        assert selector.select("uuid").transport == Transport.MQTT
+        assert selector.get_last_selection("uuid").reason == SelectionReason.LOWER_COST
+
+        counts = selector.get_selection_counts()
+        assert counts[(Transport.MQTT, SelectionReason.LAN_UNAVAILABLE)] == 1
+        assert counts[(Transport.MQTT, SelectionReason.LOWER_COST)] == 1
+
+    def test_the_other_transport_is_probed_periodically(self):
+        selector = TransportSelector(probe_interval=0.05, min_samples=1)
+        selector.notify_success("uuid", Transport.LAN_HTTP, 0.5)
+        selector.notify_success("uuid", Transport.MQTT, 0.1)
+        assert selector.select("uuid").reason == SelectionReason.PROBE
+        assert selector.select("uuid").transport == Transport.MQTT
+        assert selector.select("uuid").reason == SelectionReason.LOWER_COST
+
+    def test_manager_routes_auto_commands_to_the_faster_transport(self):
+        async def run():
+            manager = build_manager(transport_selector=TransportSelector(probe_interval=60, min_samples=2))
+            manager.default_transport_mode = TransportMode.AUTO
+            manager._device_registry.lookup_base_by_uuid = lambda uuid: SimpleNamespace(lan_ip="192.168.1.2")
+            client = connect_fake_mqtt_client(manager, FakeMqttClient(ack_delay=0.01))
+            lan_calls = []
+
+            async def slow_lan(**kwargs):
+                lan_calls.append(kwargs)
+                await asyncio.sleep(0.05)
+                return {}
+
+            manager._async_execute_cmd_http = slow_lan
+            for _ in range(8):
+                await manager.async_execute_cmd(mqtt_hostname="mqtt.example.com", mqtt_port=443,
+                                                destination_device_uuid="uuid", method="GET",
+                                                namespace=Namespace.SYSTEM_ALL, payload={}, timeout=1)
+            return manager, lan_calls, client
+
+        manager, lan_calls, client = asyncio.run(run())
+        assert (len(lan_calls), len(client.published)) == (2, 6)
+        selection = manager.transport_selector.get_last_selection("uuid")
+        assert (selection.transport, selection.reason) == (Transport.MQTT, SelectionReason.LOWER_COST)
+
+    def test_every_mqtt_failure_is_reported(self):
+        async def run():
+            manager = build_manager()
+            client = connect_fake_mqtt_client(manager, FakeMqttClient(ack_delay=0.01))
+            client.connected = False
+            with pytest.raises(MqttConnectionLostError):
+                await manager.async_execute_cmd_client(client=client, destination_device_uuid="uuid", method="SET",
+                                                       namespace=Namespace.CONTROL_TOGGLEX, payload={}, timeout=1)
+            client.connected = True
+            client.ack_error = CommandError(error_payload={"error": "boom"})
+            with pytest.raises(CommandError):
+                await manager.async_execute_cmd_client(client=client, destination_device_uuid="uuid", method="SET",
+                                                       namespace=Namespace.CONTROL_TOGGLEX, payload={}, timeout=1)
+            return manager.transport_selector.get_stats("uuid", Transport.MQTT)
+
+        stats = asyncio.run(run())
+        assert (stats.successes, stats.failures) == (0, 2)
@@ -0,0 +1,80 @@
+"""
+Measures the time needed to build 10k managed devices out of 20 distinct models.
+- "no type cache": the dynamic type is built for every device, using the ability -> mixin index
+- "linear plugin scan": same, but every plugin filter is tested against every ability (the former behaviour)
+- "type cache": build_meross_device_from_abilities(), which reuses the type built for the same ability set
+
+Run with: python -m utilities.benchmarks.device_factory
+"""
+import logging
+import time
+
+from meross_iot import device_factory
+from meross_iot.controller.device import BaseDevice
+from meross_iot.model.enums import Namespace, OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+_DEVICES = 10000
+_MODELS = 20
+_COMMON_ABILITIES = [Namespace.SYSTEM_ALL, Namespace.SYSTEM_ONLINE, Namespace.SYSTEM_ABILITY, Namespace.SYSTEM_RUNTIME,
+                     Namespace.SYSTEM_DND_MODE, Namespace.SYSTEM_REPORT, Namespace.SYSTEM_DEBUG,
+                     Namespace.CONTROL_BIND, Namespace.CONTROL_UNBIND]
+_OPTIONAL_ABILITIES = [Namespace.CONTROL_TOGGLEX, Namespace.CONTROL_TOGGLE, Namespace.CONTROL_CONSUMPTIONX,
+                       Namespace.CONTROL_ELECTRICITY, Namespace.CONTROL_LIGHT, Namespace.GARAGE_DOOR_STATE,
+                       Namespace.ROLLER_SHUTTER_STATE, Namespace.CONTROL_SPRAY, Namespace.CONTROL_LUMINANCE]
+
+
+def _model_abilities(model: int) -> dict:
+    abilities = {ns.value: {} for ns in _COMMON_ABILITIES}
+    for i, ns in enumerate(_OPTIONAL_ABILITIES):
+        if model & (1 << (i % 5)):
+            abilities[ns.value] = {}
+    abilities["Appliance.Config.Key"] = {}
+    abilities["Appliance.Config.Wifi"] = {}
+    return abilities
+
+
+def _legacy_build_type(device_abilities: dict, device_type: str) -> type:
+    mixin_classes = []
+    for device_ability in device_abilities:
+        for clazz in device_factory.dynamic_plugins.values():
+            if clazz.filter(device_ability, device_type) == True:
+                device_factory._add_mixin_class(clazz, mixin_classes)
+    mixin_classes.append(BaseDevice)
+    return type("legacy", tuple(mixin_classes), {"_abilities_spec": device_abilities})
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    device_factory._load_mixins()
+    devices = []
+    for i in range(_DEVICES):
+        model = i % _MODELS
+        info = HttpDeviceInfo(uuid=f"uuid-{i}", online_status=OnlineStatus.ONLINE, dev_name=f"dev-{i}",
+                              device_type=f"model{model}", channels=[{}], fmware_version="1.0.0",
+                              hdware_version="1.0.0", domain="mqtt.example.com", reserved_domain="mqtt.example.com")
+        devices.append((info, _model_abilities(model)))
+
+    start = time.perf_counter()
+    for info, abilities in devices:
+        _legacy_build_type(abilities, info.device_type)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for info, abilities in devices:
+        device_factory._build_cached_type("bench", abilities, BaseDevice, info.device_type)
+    indexed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for info, abilities in devices:
+        device_factory.build_meross_device_from_abilities(info, abilities, manager=None)
+    cached = time.perf_counter() - start
+
+    print(f"{'strategy':>20} | {'total':>9} | {'per device':>10}")
+    for name, elapsed in (("linear plugin scan", legacy), ("no type cache", indexed), ("type cache", cached)):
+        print(f"{name:>20} | {elapsed * 1000:>7.1f}ms | {elapsed / _DEVICES * 1e6:>8.1f}us")
+    print(f"type cache stats: {device_factory.get_type_cache_stats()}")
+
+
+if __name__ == '__main__':
+    main()
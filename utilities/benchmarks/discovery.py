@@ -0,0 +1,58 @@
+"""
+Measures the time the discovery needs to enroll 400 new devices with different concurrency limits.
+The MQTT round trip of the ability fetch is simulated with a fixed latency; 2% of the devices
+do not answer and hit the command timeout.
+
+Run with: python -m utilities.benchmarks.discovery
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+from meross_iot.http_api import MerossHttpClient
+from meross_iot.manager import MerossManager
+from meross_iot.model.credentials import MerossCloudCreds
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.exception import CommandTimeoutError
+from meross_iot.model.http.device import HttpDeviceInfo
+
+_DEVICES = 400
+_ROUND_TRIP = 0.05
+_TIMEOUT = 1.0
+_ABILITIES = {"Appliance.System.All": {}, "Appliance.System.Online": {}, "Appliance.Control.ToggleX": {}}
+
+
+async def _fake_execute_cmd(destination_device_uuid, **kwargs):
+    if int(destination_device_uuid) % 50 == 0:
+        await asyncio.sleep(_TIMEOUT)
+        raise CommandTimeoutError(message="", target_device_uuid=destination_device_uuid, timeout=_TIMEOUT)
+    await asyncio.sleep(_ROUND_TRIP)
+    return {"ability": _ABILITIES}
+
+
+async def _measure(concurrency: int) -> MerossManager:
+    creds = MerossCloudCreds(token="token", key="key", user_id="1", user_email="user@example.com",
+                             issued_on=datetime.utcnow(), domain="https://iot.meross.com",
+                             mqtt_domain="mqtt.example.com")
+    manager = MerossManager(http_client=MerossHttpClient(cloud_credentials=creds), discovery_concurrency=concurrency)
+    manager.async_execute_cmd = _fake_execute_cmd
+    http_devices = [HttpDeviceInfo(uuid=str(i), online_status=OnlineStatus.ONLINE, dev_name=f"dev-{i}",
+                                   device_type="mss310", channels=[{}], fmware_version="1.0.0",
+                                   hdware_version="1.0.0", domain="mqtt.example.com",
+                                   reserved_domain="mqtt.example.com") for i in range(_DEVICES)]
+    await manager.async_device_discovery(cached_http_device_list=http_devices)
+    return manager
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    print(f"{'concurrency':>12} | {'total':>8} | {'enrolled':>8}")
+    for concurrency in (1, 10, 50):
+        manager = await _measure(concurrency)
+        stats = manager.last_discovery_stats
+        enrolled = len(manager.find_devices())
+        print(f"{concurrency:>12} | {stats.total_duration:>7.2f}s | {enrolled:>8}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Measures the cost of encrypting a LAN request and decrypting its response for devices supporting encryption,
+comparing the former per-message AES.new() contexts, byte string padding and str round trips against the cached
+per-device cipher contexts with reused buffers. Payloads mimic SYSTEM_ALL responses of growing size (a plug, a
+multi-channel strip, a hub with sub-devices).
+
+Run with: python -m utilities.benchmarks.encryption
+"""
+import base64
+import json
+import time
+from typing import Tuple
+
+from Cryptodome.Cipher import AES
+
+from meross_iot.controller.mixins.encryption import _CbcCipherContext
+
+_ITERATIONS = 20000
+_KEY = b"0123456789abcdef0123456789abcdef"
+_IV = b"0000000000000000"
+
+
+def _system_all(channels: int) -> bytes:
+    payload = {"all": {
+        "system": {"hardware": {"type": "mss310", "version": "6.0.0", "macAddress": "48:e1:e9:00:00:01"},
+                   "firmware": {"version": "6.1.8", "innerIp": "192.168.1.2", "server": "mqtt.example.com"},
+                   "time": {"timestamp": 1700000000, "timezone": "Europe/Rome"},
+                   "online": {"status": 1}},
+        "digest": {"togglex": [{"channel": c, "onoff": c % 2, "lmTime": 1700000000} for c in range(channels)],
+                   "timer": [{"channel": c, "id": f"{c:032x}", "enable": 1} for c in range(channels)]}}}
+    message = {"header": {"messageId": "0" * 32, "method": "GETACK", "namespace": "Appliance.System.All",
+                          "payloadVersion": 1, "sign": "0" * 32, "timestamp": 1700000000}, "payload": payload}
+    return json.dumps(message).encode("utf8")
+
+
+def _legacy_round_trip(request: bytes, response: bytes) -> Tuple[bytes, bytes]:
+    # Request: byte string padding, fresh context, str output
+    padded = request + bytes([0] * (16 - len(request) % 16))
+    cipher = AES.new(_KEY, AES.MODE_CBC, _IV)
+    encrypted = base64.b64encode(cipher.encrypt(padded)).decode("utf-8")
+    # Response: received as text, encoded again, decrypted by a fresh context, decoded and stripped
+    text = response.decode("utf8")
+    cipher = AES.new(_KEY, AES.MODE_CBC, _IV)
+    decrypted = cipher.decrypt(base64.b64decode(text.encode("utf8"))).decode("utf8").rstrip("\0")
+    return encrypted.encode("utf8"), decrypted.encode("utf8")
+
+
+def _cached_round_trip(context: _CbcCipherContext, request: bytes, response: bytes) -> Tuple[bytes, bytes]:
+    encrypted = base64.b64encode(context.encrypt(request, _IV))
+    decrypted = context.decrypt(base64.b64decode(response), _IV).rstrip(b"\0")
+    return encrypted, decrypted
+
+
+def main():
+    request = _system_all(0)[:300]
+    context = _CbcCipherContext(_KEY)
+    print(f"{_ITERATIONS} request/response round trips")
+    print(f"{'SYSTEM_ALL size':<18}{'legacy (us)':>14}{'cached (us)':>14}{'speedup':>10}")
+    for channels in (1, 6, 24, 64):
+        message = _system_all(channels)
+        padded = message + bytes(16 - len(message) % 16)
+        response = base64.b64encode(AES.new(_KEY, AES.MODE_CBC, _IV).encrypt(padded))
+        assert _legacy_round_trip(request, response) == _cached_round_trip(context, request, response)
+
+        start = time.perf_counter()
+        for _ in range(_ITERATIONS):
+            _legacy_round_trip(request, response)
+        legacy = (time.perf_counter() - start) / _ITERATIONS
+        start = time.perf_counter()
+        for _ in range(_ITERATIONS):
+            _cached_round_trip(context, request, response)
+        cached = (time.perf_counter() - start) / _ITERATIONS
+        print(f"{len(message):<18}{legacy * 1e6:>14.2f}{cached * 1e6:>14.2f}{legacy / cached:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares MerossHttpClient API calls issued with a session per request (default) against
+the long-lived pooled session (reuse_http_session=True).
+A local aiohttp application fakes the Meross HTTP API. Note that the fake API is served over
+plain HTTP, so the figures do not include the TLS handshake cost that session reuse also saves.
+
+Run with: python -m utilities.benchmarks.http_api
+"""
+import asyncio
+import logging
+import statistics
+import time
+from datetime import datetime
+
+from aiohttp import web
+
+from meross_iot.http_api import MerossHttpClient
+from meross_iot.model.credentials import MerossCloudCreds
+
+_REQUESTS = 1000
+_HOST = "127.0.0.1"
+_PORT = 18081
+
+
+async def _fake_api_handler(request: web.Request) -> web.Response:
+    await request.json()
+    return web.json_response({"apiStatus": 0, "data": []})
+
+
+async def _measure(client: MerossHttpClient) -> tuple:
+    latencies = []
+    start = time.perf_counter()
+    for i in range(_REQUESTS):
+        t0 = time.perf_counter()
+        if i % 2 == 0:
+            await client.async_list_devices()
+        else:
+            await client.async_list_hub_subdevices(hub_id="hub")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1], _REQUESTS / elapsed
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    app = web.Application()
+    app.router.add_post("/v1/Device/devList", _fake_api_handler)
+    app.router.add_post("/v1/Hub/getSubDevices", _fake_api_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, _HOST, _PORT).start()
+
+    creds = MerossCloudCreds(token="token", key="key", user_id="1", user_email="user@example.com",
+                             issued_on=datetime.utcnow(), domain=f"http://{_HOST}:{_PORT}",
+                             mqtt_domain="mqtt.example.com")
+    try:
+        print(f"{'session':>20} | {'p50':>8} | {'p99':>8} | {'req/s':>8}")
+        for name, reuse in (("session per request", False), ("pooled session", True)):
+            async with MerossHttpClient(cloud_credentials=creds, reuse_http_session=reuse) as client:
+                p50, p99, rps = await _measure(client)
+                calls = client.stats.get_stats().global_stats.total_calls
+            print(f"{name:>20} | {p50:>6.3f}ms | {p99:>6.3f}ms | {rps:>8.0f}   ({calls} calls tracked)")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
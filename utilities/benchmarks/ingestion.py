@@ -0,0 +1,65 @@
+"""
+Measures the cost of handing over messages received by the paho-mqtt network thread to the event loop, comparing
+the former per-message call_soon_threadsafe() wakeup against the batched ingestion queue.
+A producer thread emits bursts of messages, as the broker does when many devices push at once.
+
+Run with: python -m utilities.benchmarks.ingestion
+"""
+import asyncio
+import threading
+import time
+
+from meross_iot.utilities.ingestion import IngestionQueue
+
+_MESSAGES = 100000
+_BURST = 100
+
+
+async def _run(handover) -> float:
+    loop = asyncio.get_running_loop()
+    done = asyncio.Event()
+    received = 0
+
+    def consumer(_):
+        nonlocal received
+        received += 1
+        if received == _MESSAGES:
+            done.set()
+
+    put = handover(loop, consumer)
+
+    def produce():
+        for i in range(0, _MESSAGES, _BURST):
+            for j in range(_BURST):
+                put(i + j)
+            time.sleep(0)
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    await done.wait()
+    producer.join()
+    return time.perf_counter() - start
+
+
+def _per_message(loop, consumer):
+    return lambda item: loop.call_soon_threadsafe(consumer, item)
+
+
+def _batched(loop, consumer):
+    queue = IngestionQueue(loop=loop, consumer=consumer, max_size=_MESSAGES)
+    _batched.queue = queue
+    return queue.put
+
+
+def main():
+    print(f"{_MESSAGES} messages, bursts of {_BURST}")
+    print(f"{'handover':<30}{'total (ms)':>12}{'per msg (us)':>14}")
+    for name, handover in (("call_soon_threadsafe", _per_message), ("ingestion queue", _batched)):
+        elapsed = asyncio.run(_run(handover))
+        print(f"{name:<30}{elapsed * 1000:>12.1f}{elapsed / _MESSAGES * 1e6:>14.2f}")
+    print(f"ingestion queue stats: {_batched.queue.stats}")
+
+
+if __name__ == '__main__':
+    main()
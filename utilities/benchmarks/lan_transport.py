@@ -0,0 +1,74 @@
+"""
+Compares the latency of LAN HTTP commands when opening a new ClientSession per command (as the
+manager used to do) against the pooled, keep-alive LanHttpTransport.
+A local aiohttp stub emulates the /config endpoint exposed by the devices.
+
+Run with: python -m utilities.benchmarks.lan_transport
+"""
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from aiohttp import web, ClientSession
+
+from meross_iot.lan_transport import LanHttpTransport
+
+_REQUESTS = 2000
+_HOST = "127.0.0.1"
+_PORT = 18080
+_RESPONSE = json.dumps({"header": {"method": "GETACK"}, "payload": {"all": {"system": {}}}})
+
+
+async def _config_handler(request: web.Request) -> web.Response:
+    await request.read()
+    return web.Response(text=_RESPONSE, content_type="application/json")
+
+
+async def _post_new_session(device_ip: str, data: bytes, timeout: float) -> str:
+    async with ClientSession() as session:
+        async with session.post(f"http://{device_ip}/config", data=data, timeout=timeout,
+                                headers={"Content-Type": "application/json"}) as response:
+            return await response.text("utf8")
+
+
+async def _measure(post_coro) -> tuple:
+    device_ip = f"{_HOST}:{_PORT}"
+    payload = b'{"header":{},"payload":{}}'
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(_REQUESTS):
+        t0 = time.perf_counter()
+        await post_coro(device_ip, payload, 5.0)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    return p50, p99, _REQUESTS / elapsed
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    app = web.Application()
+    app.router.add_post("/config", _config_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, _HOST, _PORT)
+    await site.start()
+
+    transport = LanHttpTransport()
+    try:
+        print(f"{'transport':>20} | {'p50':>8} | {'p99':>8} | {'req/s':>8}")
+        for name, post in (("session per command", _post_new_session),
+                           ("pooled keep-alive", lambda ip, data, timeout: transport.async_post(ip, data, timeout))):
+            p50, p99, rps = await _measure(post)
+            print(f"{name:>20} | {p50:>6.3f}ms | {p99:>6.3f}ms | {rps:>8.0f}")
+    finally:
+        await transport.async_close()
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Measures the per-notification cost of dispatching push notifications to the mixins of a BBSolar plant light
+(PlantLightMixin, which itself mixes light, togglex and luminance), comparing the former reflective visit of
+every base class against the precompiled namespace -> handlers table.
+
+Run with: python -m utilities.benchmarks.mixin_dispatch
+"""
+import asyncio
+import logging
+import time
+
+from meross_iot import device_factory
+from meross_iot.controller.mixins.utilities import DynamicFilteringMixin
+from meross_iot.model.enums import Namespace, OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+_ITERATIONS = 50000
+_LOGGER = logging.getLogger(__name__)
+_ABILITIES = {ns.value: {} for ns in (Namespace.SYSTEM_ALL, Namespace.SYSTEM_ONLINE, Namespace.SYSTEM_RUNTIME,
+                                      Namespace.SYSTEM_DND_MODE, Namespace.CONTROL_TOGGLEX, Namespace.CONTROL_LIGHT,
+                                      Namespace.CONTROL_LUMINANCE)}
+_NOTIFICATIONS = [
+    (Namespace.CONTROL_TOGGLEX, {'togglex': [{'channel': 1, 'onoff': 1}]}),
+    (Namespace.SYSTEM_ONLINE, {'online': {'status': 1}}),
+    (Namespace.CONTROL_BIND, {'bind': {}}),
+]
+
+
+async def _legacy_visitor(device, func, *args, **kwargs):
+    # Reflective visit of every base class, as done before the dispatch tables were introduced
+    returnStatus = None
+    for clazz in device.__class__.__bases__:
+        if issubclass(clazz, DynamicFilteringMixin):
+            try:
+                visitor = getattr(clazz, func)
+                mixinStatus = await visitor(device, *args, **kwargs)
+                if isinstance(mixinStatus, bool):
+                    if returnStatus == None:
+                        returnStatus = mixinStatus
+                    else:
+                        returnStatus = returnStatus or mixinStatus
+                _LOGGER.debug(f'Function: {func} called in {clazz} via {visitor}')
+            except AttributeError as e:
+                _LOGGER.debug(f'Function: {func} not found in {clazz}: {e}')
+    return returnStatus
+
+
+async def _measure(dispatch, namespace, data) -> float:
+    start = time.perf_counter()
+    for _ in range(_ITERATIONS):
+        await dispatch(namespace, data)
+    return (time.perf_counter() - start) / _ITERATIONS * 1e6
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    info = HttpDeviceInfo(uuid="plant", online_status=OnlineStatus.ONLINE, dev_name="plant", device_type="bgl120a",
+                          channels=[{}, {}, {}], fmware_version="1.0.0", hdware_version="1.0.0",
+                          domain="mqtt.example.com", reserved_domain="mqtt.example.com")
+    device = device_factory.build_meross_device_from_abilities(info, _ABILITIES, manager=None)
+    print(f"device bases: {[c.__name__ for c in type(device).__bases__]}")
+
+    async def legacy(namespace, data):
+        return await _legacy_visitor(device, "async_handle_push_notification", namespace, data)
+
+    async def compiled(namespace, data):
+        return await device._async_dispatch_to_mixins("async_handle_push_notification", namespace, data)
+
+    print(f"{'namespace':>28} | {'reflective':>10} | {'table':>9}")
+    for namespace, data in _NOTIFICATIONS:
+        before = await _measure(legacy, namespace, data)
+        after = await _measure(compiled, namespace, data)
+        print(f"{namespace.value:>28} | {before:>8.2f}us | {after:>7.2f}us")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
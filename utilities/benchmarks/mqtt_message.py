@@ -0,0 +1,64 @@
+"""
+Measures the cost of building a signed command message, comparing the former builder (SystemRandom message id
+hashed with md5, header dict rebuilt and serialized by json.dumps() for every message) against MqttMessageBuilder,
+which only formats the variable parts of the message.
+
+Run with: python -m utilities.benchmarks.mqtt_message
+"""
+import json
+import random
+import string
+import time
+from hashlib import md5
+
+from meross_iot.model.enums import Namespace
+from meross_iot.utilities.mqtt import MqttMessageBuilder
+
+_ITERATIONS = 50000
+_FROM = "/app/1-0123456789abcdef0123456789abcdef/subscribe"
+_KEY = "0123456789abcdef0123456789abcdef"
+_COMMANDS = [
+    ("GET", Namespace.SYSTEM_ALL, {}),
+    ("SET", Namespace.CONTROL_TOGGLEX, {"togglex": {"channel": 0, "onoff": 1}}),
+    ("SET", Namespace.CONTROL_LIGHT, {"light": {"channel": 0, "rgb": 16711680, "luminance": 80, "capacity": 5}}),
+]
+
+
+def _legacy_build(method, namespace, payload, destination_device_uuid):
+    randomstring = "".join(random.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(16))
+    md5_hash = md5()
+    md5_hash.update(randomstring.encode("utf8"))
+    message_id = md5_hash.hexdigest().lower()
+    timestamp = int(round(time.time()))
+    md5_hash = md5()
+    md5_hash.update(("%s%s%s" % (message_id, _KEY, timestamp)).encode("utf8"))
+    signature = md5_hash.hexdigest().lower()
+    if not isinstance(namespace, Namespace) and not isinstance(namespace, str):
+        raise ValueError("Namespace parameter must be a Namespace enum or a string.")
+    namespace_val = namespace.value if isinstance(namespace, Namespace) else namespace
+    data = {
+        "header": {"from": _FROM, "messageId": message_id, "method": method, "namespace": namespace_val,
+                   "payloadVersion": 1, "sign": signature, "timestamp": timestamp, "triggerSrc": "Android",
+                   "uuid": destination_device_uuid},
+        "payload": payload,
+    }
+    return json.dumps(data, separators=(',', ':')).encode("utf-8"), message_id
+
+
+def main():
+    builder = MqttMessageBuilder(from_topic=_FROM, key=_KEY)
+    print(f"{_ITERATIONS} messages per command")
+    print(f"{'command':<36}{'legacy (us)':>14}{'builder (us)':>14}{'speedup':>10}")
+    for method, namespace, payload in _COMMANDS:
+        timings = []
+        for build in (_legacy_build, builder.build):
+            start = time.perf_counter()
+            for _ in range(_ITERATIONS):
+                build(method, namespace, payload, "0123456789abcdef0123456789abcdef")
+            timings.append((time.perf_counter() - start) / _ITERATIONS)
+        name = f"{method} {namespace.value}"
+        print(f"{name:<36}{timings[0] * 1e6:>14.2f}{timings[1] * 1e6:>14.2f}{timings[0] / timings[1]:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
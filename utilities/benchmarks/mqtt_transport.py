@@ -0,0 +1,102 @@
+"""
+Measures the round-trip latency of MQTT commands in the threaded (paho-mqtt network thread) and in the asyncio
+(event loop driven) transport modes, against a local TLS broker stand-in (see utilities/mqtt_broker_stub.py) whose devices acknowledge every
+command right away. Both sequential commands and bursts of concurrent commands are measured.
+Requires the openssl command line tool, used to generate the broker self-signed certificate.
+
+Run with: python -m utilities.benchmarks.mqtt_transport
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from meross_iot.http_api import MerossHttpClient
+from meross_iot.manager import MerossManager
+from meross_iot.model.credentials import MerossCloudCreds
+from meross_iot.model.enums import Namespace
+from meross_iot.mqtt_transport import MqttTransportMode
+from utilities.mqtt_broker_stub import MqttBrokerStub, meross_device_responder
+
+_SEQUENTIAL_COMMANDS = 2000
+_BURSTS = 20
+_BURST_SIZE = 100
+_KEY = "key"
+
+
+def _build_ssl_context(directory: str) -> ssl.SSLContext:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                    "-keyout", key, "-out", cert], check=True, capture_output=True)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def _percentile(samples, p):
+    return sorted(samples)[int(len(samples) * p / 100) - 1]
+
+
+async def _run(mode: MqttTransportMode, port: int):
+    creds = MerossCloudCreds(token="token", key=_KEY, user_id="1", user_email="user@example.com",
+                             issued_on=datetime.utcnow(), domain="https://iot.meross.com",
+                             mqtt_domain="127.0.0.1")
+    manager = MerossManager(http_client=MerossHttpClient(cloud_credentials=creds),
+                            mqtt_skip_cert_validation=True,
+                            auto_discovery_on_connection=False,
+                            mqtt_transport_mode=mode)
+    client = await manager._async_get_create_mqtt_client(domain="127.0.0.1", port=port)
+
+    async def command(i):
+        start = time.perf_counter()
+        await manager.async_execute_cmd_client(client=client, destination_device_uuid=f"device-{i % 10}",
+                                               method="GET", namespace=Namespace.SYSTEM_ALL, payload={}, timeout=5)
+        return time.perf_counter() - start
+
+    logging.getLogger("meross_iot").setLevel(logging.WARNING)
+    sequential = [await command(i) for i in range(_SEQUENTIAL_COMMANDS)]
+    burst_durations = []
+    for _ in range(_BURSTS):
+        start = time.perf_counter()
+        await asyncio.gather(*[command(i) for i in range(_BURST_SIZE)])
+        burst_durations.append(time.perf_counter() - start)
+    manager.close()
+    await asyncio.sleep(0.1)
+    return sequential, burst_durations
+
+
+def _serve(directory: str, port_queue: multiprocessing.Queue, stop_event: multiprocessing.Event) -> None:
+    broker = MqttBrokerStub(ssl_context=_build_ssl_context(directory), responder=meross_device_responder(_KEY))
+    port_queue.put(broker.start())
+    stop_event.wait()
+    broker.stop()
+
+
+def main():
+    # The broker runs in a child process, so that it does not compete for the GIL with the client under test
+    stop_event = multiprocessing.Event()
+    port_queue = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        broker_process = multiprocessing.Process(target=_serve, args=(directory, port_queue, stop_event))
+        broker_process.start()
+        port = port_queue.get()
+    try:
+        print(f"{_SEQUENTIAL_COMMANDS} sequential commands, {_BURSTS} bursts of {_BURST_SIZE} concurrent commands")
+        print(f"{'mode':<10}{'p50 (us)':>10}{'p90 (us)':>10}{'p99 (us)':>10}{'burst (ms)':>12}")
+        for mode in (MqttTransportMode.THREADED, MqttTransportMode.ASYNCIO):
+            sequential, bursts = asyncio.run(_run(mode, port))
+            print(f"{mode.name:<10}{_percentile(sequential, 50) * 1e6:>10.0f}{_percentile(sequential, 90) * 1e6:>10.0f}"
+                  f"{_percentile(sequential, 99) * 1e6:>10.0f}{statistics.mean(bursts) * 1000:>12.2f}")
+    finally:
+        stop_event.set()
+        broker_process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Measures the cost of tracking in-flight commands, comparing the former dict + per-command asyncio.wait_for() timer
+against the pending command table served by a single deadline timer. Commands are registered concurrently and then
+ACKed; a share of them never gets an ACK and times out, which used to leave its entry behind.
+
+Run with: python -m utilities.benchmarks.pending_commands
+"""
+import asyncio
+import time
+
+from meross_iot.utilities.pending import PendingCommandTable
+
+_COMMANDS = 20000
+_LOST_EVERY = 10
+_TIMEOUT = 0.2
+
+
+async def _legacy():
+    loop = asyncio.get_running_loop()
+    pending = {}
+
+    async def command(i):
+        future = loop.create_future()
+        pending[str(i)] = future
+        try:
+            await asyncio.wait_for(future, _TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+    def ack(i):
+        future = pending.get(str(i))
+        if future is not None:
+            future.set_result(None)
+            del pending[str(i)]
+
+    return await _run(command, ack), len(pending)
+
+
+async def _table():
+    loop = asyncio.get_running_loop()
+    table = PendingCommandTable(loop=loop)
+
+    async def command(i):
+        future = loop.create_future()
+        table.register(str(i), future, timeout=_TIMEOUT, target_device_uuid="uuid", method="GET", namespace="ns")
+        try:
+            await future
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            table.discard(str(i))
+
+    def ack(i):
+        command = table.pop(str(i))
+        if command is not None:
+            command.future.set_result(None)
+
+    return await _run(command, ack), table.in_flight
+
+
+async def _run(command, ack) -> float:
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(command(i)) for i in range(_COMMANDS)]
+    await asyncio.sleep(0)
+    for i in range(_COMMANDS):
+        if i % _LOST_EVERY != 0:
+            ack(i)
+    await asyncio.gather(*tasks)
+    # Timed out commands take _TIMEOUT seconds in both cases: only account for the bookkeeping
+    return time.perf_counter() - start - _TIMEOUT
+
+
+def main():
+    print(f"{_COMMANDS} concurrent commands, 1 every {_LOST_EVERY} never ACKed")
+    print(f"{'tracking':<28}{'overhead (ms)':>14}{'leftover entries':>18}")
+    for name, runner in (("dict + wait_for", _legacy), ("pending command table", _table)):
+        elapsed, leftover = asyncio.run(runner())
+        print(f"{name:<28}{elapsed * 1000:>14.1f}{leftover:>18}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Measures the cost of DeviceRegistry lookups as the number of registered devices grows.
+The indexed lookups are compared against the linear scan the registry used to perform.
+
+Run with: python -m utilities.benchmarks.registry
+"""
+import logging
+import timeit
+
+from meross_iot.controller.device import BaseDevice, GenericSubDevice
+from meross_iot.controller.mixins.toggle import ToggleXMixin
+from meross_iot.manager import DeviceRegistry
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+_SIZES = (10, 100, 1000, 10000, 50000)
+_ROUNDS = 2000
+
+
+class _ToggleXDevice(ToggleXMixin, BaseDevice):
+    pass
+
+
+def _build_registry(size: int) -> DeviceRegistry:
+    registry = DeviceRegistry()
+    for i in range(size):
+        info = HttpDeviceInfo(uuid=f"uuid{i}", online_status=OnlineStatus.ONLINE if i % 3 else OnlineStatus.OFFLINE,
+                              dev_name=f"device {i}", device_type="mss310" if i % 2 else "msl120", channels=[],
+                              fmware_version="1.0.0", hdware_version="1.0.0", domain="mqtt.meross.com",
+                              reserved_domain=None)
+        clazz = _ToggleXDevice if i % 2 else BaseDevice
+        registry.enroll_device(clazz(device_uuid=info.uuid, manager=None, http_device_info=info))
+    return registry
+
+
+def _linear_lookup_base_by_uuid(registry: DeviceRegistry, device_uuid: str):
+    res = [d for d in registry._devices_by_internal_id.values()
+           if d.uuid == device_uuid and not isinstance(d, GenericSubDevice)]
+    return res[0] if len(res) == 1 else None
+
+
+def _per_call_us(stmt) -> float:
+    return timeit.timeit(stmt, number=_ROUNDS) / _ROUNDS * 1e6
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print(f"{'devices':>8} | {'by uuid':>10} | {'by uuid (linear)':>16} | {'class+online':>12} | {'type+name':>10}")
+    for size in _SIZES:
+        registry = _build_registry(size)
+        target = f"uuid{size // 2}"
+        by_uuid = _per_call_us(lambda: registry.lookup_base_by_uuid(target))
+        # The linear scan gets too slow to be measured on the biggest registries
+        linear = f"{_per_call_us(lambda: _linear_lookup_base_by_uuid(registry, target)):.2f}us" if size <= 10000 else "-"
+        by_class = _per_call_us(lambda: registry.find_all_by(device_uuids=(target,), device_class=ToggleXMixin,
+                                                              online_status=OnlineStatus.ONLINE))
+        by_type_name = _per_call_us(lambda: registry.find_all_by(device_type="msl120", device_name="device 4"))
+        print(f"{size:>8} | {by_uuid:>8.2f}us | {linear:>16} | {by_class:>10.2f}us | {by_type_name:>8.2f}us")
+
+
+if __name__ == '__main__':
+    main()
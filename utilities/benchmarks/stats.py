@@ -0,0 +1,54 @@
+"""
+Measures the cost of recording MQTT calls and of computing their statistics, comparing the former ApiCounter (one
+ApiCallSample per call in a 1000 samples deque, rescanned on every query) against the time-bucketed one.
+The legacy counter only covers the last 1000 calls, so its 1 hour totals are also reported.
+
+Run with: python -m utilities.benchmarks.stats
+"""
+import time
+from collections import deque
+from datetime import timedelta
+
+from meross_iot.utilities.stats import ApiCallSample, ApiCounter, ApiStatsResult
+
+_CALLS = 20000
+_QUERIES = 200
+_DEVICES = [f"device-{i}" for i in range(20)]
+_NAMESPACES = ["Appliance.System.All", "Appliance.Control.ToggleX", "Appliance.Control.Electricity"]
+
+
+class _LegacyApiCounter:
+    def __init__(self, max_samples=1000):
+        self.api_calls = deque([], maxlen=max_samples)
+
+    def notify_api_call(self, device_uuid, namespace, method):
+        self.api_calls.append(ApiCallSample(device_uuid=device_uuid, namespace=namespace, method=method,
+                                            timestamp=time.time()))
+
+    def get_api_stats(self, time_window=timedelta(minutes=1)):
+        result = ApiStatsResult()
+        lower_limit = time.time() - time_window.total_seconds()
+        for sample in reversed(self.api_calls):
+            if sample.timestamp > lower_limit:
+                result.add(sample)
+        return result
+
+
+def main():
+    print(f"{_CALLS} calls over {len(_DEVICES)} devices, {_QUERIES} queries")
+    print(f"{'counter':<16}{'notify (us)':>14}{'query (us)':>14}{'1h total':>12}")
+    for name, counter in (("legacy", _LegacyApiCounter()), ("bucketed", ApiCounter())):
+        start = time.perf_counter()
+        for i in range(_CALLS):
+            counter.notify_api_call(device_uuid=_DEVICES[i % len(_DEVICES)],
+                                    namespace=_NAMESPACES[i % len(_NAMESPACES)], method="GET")
+        notify = (time.perf_counter() - start) / _CALLS
+        start = time.perf_counter()
+        for _ in range(_QUERIES):
+            stats = counter.get_api_stats(time_window=timedelta(hours=1))
+        query = (time.perf_counter() - start) / _QUERIES
+        print(f"{name:<16}{notify * 1e6:>14.2f}{query * 1e6:>14.2f}{stats.global_stats.total_calls:>12}")
+
+
+if __name__ == '__main__':
+    main()
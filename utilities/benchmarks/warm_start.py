@@ -0,0 +1,59 @@
+"""
+Compares the time to a ready registry of 400 devices on a cold start (no device snapshot) against
+a warm start (abilities reused from the device snapshot written by the cold start).
+The MQTT round trip of the ability fetch is simulated with a fixed latency.
+
+Run with: python -m utilities.benchmarks.warm_start
+"""
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import datetime
+
+from meross_iot.http_api import MerossHttpClient
+from meross_iot.manager import MerossManager
+from meross_iot.model.credentials import MerossCloudCreds
+from meross_iot.model.enums import OnlineStatus
+from meross_iot.model.http.device import HttpDeviceInfo
+
+_DEVICES = 400
+_ROUND_TRIP = 0.05
+_ABILITIES = {"Appliance.System.All": {}, "Appliance.System.Online": {}, "Appliance.Control.ToggleX": {},
+              "Appliance.Control.ConsumptionX": {}, "Appliance.Control.Electricity": {}}
+
+
+async def _fake_execute_cmd(destination_device_uuid, **kwargs):
+    await asyncio.sleep(_ROUND_TRIP)
+    return {"ability": _ABILITIES}
+
+
+async def _start(snapshot_path: str) -> MerossManager:
+    creds = MerossCloudCreds(token="token", key="key", user_id="1", user_email="user@example.com",
+                             issued_on=datetime.utcnow(), domain="https://iot.meross.com",
+                             mqtt_domain="mqtt.example.com")
+    manager = MerossManager(http_client=MerossHttpClient(cloud_credentials=creds), snapshot_path=snapshot_path)
+    manager.async_execute_cmd = _fake_execute_cmd
+    http_devices = [HttpDeviceInfo(uuid=str(i), online_status=OnlineStatus.ONLINE, dev_name=f"dev-{i}",
+                                   device_type="mss310", channels=[{}], fmware_version="1.0.0",
+                                   hdware_version="1.0.0", domain="mqtt.example.com",
+                                   reserved_domain="mqtt.example.com", bind_time=1600000000)
+                    for i in range(_DEVICES)]
+    await manager.async_device_discovery(cached_http_device_list=http_devices)
+    return manager
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        snapshot_path = os.path.join(tmpdir, "snapshot.json")
+        print(f"{'start':>6} | {'ready in':>9} | {'snapshot hits':>13}")
+        for name in ("cold", "warm"):
+            manager = await _start(snapshot_path)
+            stats = manager.last_discovery_stats
+            print(f"{name:>6} | {stats.total_duration * 1000:>7.1f}ms | {stats.snapshot_hits:>13}")
+        print(f"snapshot size: {os.path.getsize(snapshot_path)} bytes")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
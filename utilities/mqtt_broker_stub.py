@@ -0,0 +1,171 @@
+"""
+Minimal in-process MQTT 3.1.1 broker, used as a stand-in for the Meross broker by tests and benchmarks.
+It only implements what the library relies upon: CONNECT, SUBSCRIBE on exact topics, QoS 0/1 PUBLISH,
+PINGREQ and DISCONNECT. An optional responder can reply to the published messages, emulating the devices.
+"""
+import asyncio
+import json
+import ssl
+import struct
+import threading
+import time
+from hashlib import md5
+from typing import Callable, Iterable, Optional, Tuple, List, Dict, Set
+
+Responder = Callable[[str, bytes], Iterable[Tuple[str, bytes]]]
+
+_CONNECT, _PUBLISH, _PUBACK, _SUBSCRIBE, _PINGREQ, _DISCONNECT = 1, 3, 4, 8, 12, 14
+
+
+def _encode_packet(first_byte: int, body: bytes) -> bytes:
+    length = len(body)
+    encoded = bytearray([first_byte])
+    while True:
+        digit = length % 128
+        length //= 128
+        encoded.append(digit | 0x80 if length > 0 else digit)
+        if length == 0:
+            break
+    return bytes(encoded) + body
+
+
+def _encode_publish(topic: str, payload: bytes) -> bytes:
+    topic_data = topic.encode("utf8")
+    return _encode_packet(_PUBLISH << 4, struct.pack("!H", len(topic_data)) + topic_data + payload)
+
+
+def meross_device_responder(cloud_key: str) -> Responder:
+    """
+    Builds a responder that acknowledges every GET/SET command sent to a device, echoing the command payload
+    back to the topic specified in the "from" header, as real devices do.
+    :param cloud_key: key used to sign the responses
+    """
+    def _respond(topic: str, payload: bytes) -> Iterable[Tuple[str, bytes]]:
+        if not topic.startswith("/appliance/") or not topic.endswith("/subscribe"):
+            return ()
+        message = json.loads(payload)
+        header = message["header"]
+        timestamp = int(time.time())
+        signature = md5(f"{header['messageId']}{cloud_key}{timestamp}".encode("utf8")).hexdigest()
+        response = {
+            "header": dict(header,
+                           method=f"{header['method']}ACK",
+                           timestamp=timestamp,
+                           sign=signature,
+                           **{"from": topic.replace("/subscribe", "/publish")}),
+            "payload": message.get("payload", {})
+        }
+        return (header["from"], json.dumps(response).encode("utf8")),
+    return _respond
+
+
+class MqttBrokerStub(object):
+    """
+    Broker running on its own thread and event loop, so that it does not interfere with the code under test.
+    """
+    def __init__(self, ssl_context: Optional[ssl.SSLContext] = None, responder: Optional[Responder] = None):
+        self._ssl_context = ssl_context
+        self._responder = responder
+        self._loop = asyncio.new_event_loop()
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscriptions: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self._writers: List[asyncio.StreamWriter] = []
+        self.port: Optional[int] = None
+        self.received_publishes = 0
+
+    def start(self) -> int:
+        """
+        Starts the broker on a random local port and returns the port
+        """
+        started = threading.Event()
+
+        def _run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, "127.0.0.1", 0, ssl=self._ssl_context))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self) -> None:
+        async def _stop():
+            self._server.close()
+            self._drop_connections()
+        asyncio.run_coroutine_threadsafe(_stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def drop_connections(self) -> None:
+        """
+        Abruptly closes every client connection, as a broker failure would do
+        """
+        self._loop.call_soon_threadsafe(self._drop_connections)
+
+    def _drop_connections(self) -> None:
+        for writer in list(self._writers):
+            writer.close()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.append(writer)
+        try:
+            while True:
+                first_byte = (await reader.readexactly(1))[0]
+                length, multiplier = 0, 1
+                while True:
+                    digit = (await reader.readexactly(1))[0]
+                    length += (digit & 0x7F) * multiplier
+                    multiplier *= 128
+                    if digit & 0x80 == 0:
+                        break
+                body = await reader.readexactly(length)
+                if not self._handle_packet(first_byte, body, writer):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            self._writers.remove(writer)
+            for subscribers in self._subscriptions.values():
+                subscribers.discard(writer)
+            writer.close()
+
+    def _handle_packet(self, first_byte: int, body: bytes, writer: asyncio.StreamWriter) -> bool:
+        packet_type = first_byte >> 4
+        if packet_type == _CONNECT:
+            writer.write(b"\x20\x02\x00\x00")
+        elif packet_type == _SUBSCRIBE:
+            packet_id, pos, granted = body[:2], 2, bytearray()
+            while pos < len(body):
+                topic_len = struct.unpack("!H", body[pos:pos + 2])[0]
+                topic = body[pos + 2:pos + 2 + topic_len].decode("utf8")
+                granted.append(min(body[pos + 2 + topic_len], 1))
+                pos += 3 + topic_len
+                self._subscriptions.setdefault(topic, set()).add(writer)
+            writer.write(_encode_packet(0x90, packet_id + bytes(granted)))
+        elif packet_type == _PUBLISH:
+            qos = (first_byte >> 1) & 0x03
+            topic_len = struct.unpack("!H", body[:2])[0]
+            topic = body[2:2 + topic_len].decode("utf8")
+            pos = 2 + topic_len
+            if qos > 0:
+                writer.write(_encode_packet(_PUBACK << 4, body[pos:pos + 2]))
+                pos += 2
+            self._publish(topic, body[pos:])
+        elif packet_type == _PINGREQ:
+            writer.write(b"\xd0\x00")
+        elif packet_type == _DISCONNECT:
+            return False
+        return True
+
+    def _publish(self, topic: str, payload: bytes) -> None:
+        self.received_publishes += 1
+        for subscriber in self._subscriptions.get(topic, ()):
+            subscriber.write(_encode_publish(topic, payload))
+        if self._responder is not None:
+            for response_topic, response_payload in self._responder(topic, payload):
+                self._publish(response_topic, response_payload)